@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+""" Histograms kept as numpy arrays, filled a whole array of values
+at a time, for event processing on the python side.
+
+An ArrayHisto has the attributes of a StoredHisto (see histo_store),
+contents and sum of squared weights with the flow bins in float64,
+so it goes wherever the plotting scripts take one: build_histo makes
+the ROOT histogram, write_histos an array store, numpify the arrays.
+
+    h = ArrayHisto.uniform('w_CTOF', [(200, 0.6, 4.7)])
+    h.fill(kin['w'])
+    h2 = ArrayHisto.uniform('w_q2', [(200, 0.6, 4.7), (200, 1.2, 4.5)])
+    h2.fill((kin['w'], kin['q2']), weights)
+
+Histograms filled by different workers are added with merge, in any
+order and grouping.
+"""
+
+import numpy as np
+
+from histo_utils import array_digest
+
+class ArrayHisto(object):
+    """ One to three dimensional histogram with the given bin edges
+    of each axis.  values and sumw2 are shaped (nx+2, ny+2, ...),
+    index 0 and -1 of each axis being the under and overflow. """
+
+    has_sumw2 = True
+
+    def __init__(self, name, edges, title=None):
+        self.name = name
+        self.title = name if title is None else title
+        self.edges = [np.ascontiguousarray(e, dtype=np.float64) for e in edges]
+        self.entries = 0.0
+
+        shape = tuple(len(e) + 1 for e in self.edges)
+        self.values = np.zeros(shape)
+        self.sumw2 = np.zeros(shape)
+
+        # (low, high, bins) of evenly binned axes, None for the others.
+        self.uniform_axes = []
+        for e in self.edges:
+            even = np.allclose(np.diff(e), (e[-1] - e[0]) / (len(e) - 1), rtol=1e-9, atol=0)
+            self.uniform_axes.append((e[0], e[-1], len(e) - 1) if even else None)
+
+    @classmethod
+    def uniform(cls, name, binning, title=None):
+        """ Evenly binned axes, binning being [(bins, low, high), ...]. """
+        return cls(name, [np.linspace(low, high, bins + 1) for bins, low, high in binning], title)
+
+    @property
+    def dim(self):
+        return len(self.edges)
+
+    @property
+    def class_name(self):
+        return 'TH{}D'.format(self.dim)
+
+    @property
+    def digest(self):
+        """ histo_digest of the ROOT histogram build_histo makes of this. """
+        return array_digest(self.class_name, self.edges, self.values, self.sumw2)
+
+    def find_bins(self, values, axis=0):
+        """ Bin numbers along an axis, like TAxis::FindBin: 0 below
+        the range, bins + 1 at or above it (and for nan). """
+        values = np.asarray(values, dtype=np.float64)
+        if self.uniform_axes[axis] is None:
+            return np.searchsorted(self.edges[axis], values, side='right')
+
+        low, high, bins = self.uniform_axes[axis]
+        with np.errstate(invalid='ignore'):
+            inside = (values >= low) & (values < high)
+            below = values < low
+        index = (bins * (np.where(inside, values, low) - low) / (high - low)).astype(np.int64) + 1
+        index = np.minimum(index, bins)
+        return np.where(inside, index, np.where(below, 0, bins + 1))
+
+    def fill(self, coords, weights=None):
+        """ Fill every value of coords at once, coords being an array
+        for one dimension and a tuple of arrays (x, y, ...) otherwise.
+        weights, one per value, default to 1. """
+
+        if self.dim == 1:
+            coords = (coords,)
+        indices = [self.find_bins(c, axis) for axis, c in enumerate(coords)]
+        indices = np.broadcast_arrays(*indices)
+        flat = np.ravel_multi_index([i.ravel() for i in indices], self.values.shape)
+
+        size = self.values.size
+        if weights is None:
+            counts = np.bincount(flat, minlength=size)
+            self.values += counts.reshape(self.values.shape)
+            self.sumw2 += counts.reshape(self.values.shape)
+        else:
+            weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), indices[0].shape).ravel()
+            self.values += np.bincount(flat, weights, minlength=size).reshape(self.values.shape)
+            self.sumw2 += np.bincount(flat, weights**2, minlength=size).reshape(self.values.shape)
+        self.entries += len(flat)
+        return self
+
+    def compatible(self, other):
+        return (self.dim == other.dim and
+                all(len(a) == len(b) and np.array_equal(a, b) for a, b in zip(self.edges, other.edges)))
+
+    def merge(self, other):
+        """ Add the contents of a histogram with the same binning. """
+        if not self.compatible(other):
+            raise ValueError('Can not merge {} into {}, the binning differs'.format(other.name, self.name))
+        self.values += other.values
+        self.sumw2 += other.sumw2
+        self.entries += other.entries
+        return self
+
+    def copy(self, name=None):
+        histo = ArrayHisto(self.name if name is None else name, self.edges, self.title)
+        histo.merge(self)
+        return histo
+
+    def numpify(self):
+        """ Same arrays as histo_utils.numpify of the ROOT histogram,
+        views on this one. """
+        inner = tuple([slice(1, -1)] * self.dim)
+        values = self.values[inner]
+        errors = np.sqrt(self.sumw2[inner])
+
+        if self.dim == 1:
+            return self.edges[0][:-1], self.edges[0][1:], values, errors
+
+        return tuple(self.edges) + (values, errors)
+
+    def to_root(self):
+        from lazy_histos import build_histo
+        return build_histo(self)
+
+def merge_histos(*groups):
+    """ Sum of dictionaries of histograms (the results of each
+    worker), name by name.  The inputs are left as they are. """
+    merged = {}
+    for histos in groups:
+        for name, histo in histos.items():
+            if name in merged:
+                merged[name].merge(histo)
+            else:
+                merged[name] = histo.copy()
+    return merged
+
+def write_root(histos, path):
+    """ Write a dictionary of histograms to a new ROOT file. """
+    from ROOT import TFile
+
+    rootfile = TFile(path, 'RECREATE')
+    for name in sorted(histos):
+        histos[name].to_root().Write(name)
+    rootfile.Close()
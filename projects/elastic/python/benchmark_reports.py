@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+""" Wall time and peak memory of the whole report chain, run on the
+files of synthetic_inputs.py.
+
+    python synthetic_inputs.py -o=synthetic
+    python benchmark_reports.py -i=synthetic -o=reports.json -j=4
+
+Each script runs in the input directory as its own process, one
+stage after the other.  The peak RSS of a stage is the largest of the
+script and the workers it waited for.  Runs go to the same history
+file format as benchmarks.py, and stages slower than their baseline
+are reported the same way.
+"""
+
+import argparse
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from collections import OrderedDict
+
+from benchmarks import load_history, regressions, save_history
+
+# name: (script, its arguments, the options it takes from the driver).
+stages = OrderedDict([
+    ('es', ('es.py', ['-d=es-rga.root', '-s=es-esepp.root', '-o=es'], ['-j', '-t', '-b'])),
+    ('mon', ('mon.py', ['-i=rga.root', '-o=rga'], ['-j', '-t', '-b'])),
+    ('monrad', ('monrad.py', ['-i=rga-rad.root', '-o=rga-rad'], ['-j', '-t', '-b'])),
+    ('data_sim', ('data_sim.py', ['-d=rga.root', '-s=esepp.root', '-o=compare'], ['-c', '-m', '-j', '-t', '-b'])),
+    ('pres', ('pres.py', ['-i=rga.root', '-o=pres'], []))
+])
+
+def stage_command(name, options):
+    """ argv of a stage, with the driver options the script takes. """
+    script, arguments, takes = stages[name]
+    here = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.join(here, script)] + arguments
+    for flag in takes:
+        if options.get(flag) is not None:
+            command.append('{}={}'.format(flag, options[flag]))
+    return command
+
+def run_stage(command, cwd, log):
+    """ (wall seconds, peak RSS in MB, exit status) of one script. """
+    start = time.time()
+    process = subprocess.Popen(command, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.time() - start
+    process.returncode = status
+
+    # ru_maxrss is in kB on Linux and bytes on macOS.
+    scale = 1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0
+    return wall, usage.ru_maxrss / scale, os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-i', '--input_dir', default='synthetic',
+                    help='Directory of synthetic_inputs.py, the scripts run there')
+    ap.add_argument('-o', '--output', default='reports.json',
+                    help='History of the runs, appended to')
+    ap.add_argument('-k', '--only', default=None,
+                    help='Comma separated stages to run, all by default')
+    ap.add_argument('-r', '--repeat', default=1, type=int)
+    ap.add_argument('-l', '--log', default='benchmark_reports.log',
+                    help='Output of the scripts, in the input directory')
+    ap.add_argument('-m', '--fit_method', default=None,
+                    help='Passed to the scripts that fit')
+    ap.add_argument('-c', '--cache_dir', default=None)
+    ap.add_argument('-j', '--jobs', default=None, type=int)
+    ap.add_argument('-t', '--store_dir', default=None)
+    ap.add_argument('-b', '--build_dir', default=None)
+    ap.add_argument('--tolerance', default=0.1, type=float,
+                    help='Slowdown, as a fraction, reported as a regression')
+    ap.add_argument('-n', '--no_record', action='store_true',
+                    help='Compare with the history without adding to it')
+    args = ap.parse_args()
+
+    options = {'-m':args.fit_method, '-c':args.cache_dir, '-j':args.jobs,
+               '-t':args.store_dir, '-b':args.build_dir}
+    names = args.only.split(',') if args.only else list(stages)
+
+    run = {
+        'time':time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host':platform.node(),
+        'python':platform.python_version(),
+        'options':dict((flag, value) for flag, value in options.items() if value is not None),
+        'results':OrderedDict()
+    }
+
+    failed = []
+    with open(os.path.join(args.input_dir, args.log), 'w') as log:
+        for name in names:
+            command = stage_command(name, options)
+            rounds, peak = [], 0.0
+            for _ in range(args.repeat):
+                wall, rss, status = run_stage(command, args.input_dir, log)
+                rounds.append(wall)
+                peak = max(peak, rss)
+                if status != 0:
+                    failed.append(name)
+                    break
+
+            rounds.sort()
+            run['results'][name] = {'best':rounds[0], 'median':rounds[len(rounds) // 2],
+                                    'max_rss_mb':peak, 'repeat':len(rounds)}
+            print('{0:10s} {1:10.2f} s {2:10.1f} MB'.format(name, rounds[0], peak))
+
+    total = sum(result['best'] for result in run['results'].values())
+    print('{0:10s} {1:10.2f} s {2:10.1f} MB'.format(
+        'total', total, max(result['max_rss_mb'] for result in run['results'].values())))
+
+    for name in failed:
+        print('{} failed, see {}'.format(name, os.path.join(args.input_dir, args.log)))
+
+    history = load_history(args.output)
+    slower = regressions(history, run, args.tolerance)
+    for name, old, new in slower:
+        print('Regression: {0} {1:.2f} s -> {2:.2f} s'.format(name, old, new))
+
+    # Failed runs are no baseline.
+    if not args.no_record and not failed:
+        save_history(args.output, history + [run])
+
+    sys.exit(1 if slower or failed else 0)
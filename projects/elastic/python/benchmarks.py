@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+
+""" Timings of the helpers on the plotting path, on synthetic
+histograms of production size: six sectors of 200x200 bins with a
+gaussian peak, drifting along x, on a flat background.
+
+    python benchmarks.py -o=benchmarks.json
+
+Each run is appended to the history file (json) and compared with
+the previous run from the same host and python; a benchmark slower
+than that by more than the tolerance is reported as a regression,
+and the exit status is 1.  Benchmarks that need ROOT are skipped
+when it cannot be imported.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from collections import OrderedDict
+
+import numpy as np
+
+from array_histo import ArrayHisto
+from elastic_kinematics import elastic_events, predict_beam_energy, predict_proton, proton_kinematics
+from gaus_fit import estimate_gaussians, fast_fit_gaussians, fit_gaussians
+from slice_projector import SliceProjector
+
+# Layout of the fixtures and of the slice fits run on them.
+n_sectors = 6
+x_bins = 200
+y_bins = 200
+x_limits = (0.0, 10.0)
+y_limits = (-1.0, 1.0)
+x_range = [1.0, 9.0]
+x_bin_step = 6
+y_fit_range = [-0.5, 0.5]
+
+# Events of the kinematics benchmark.
+n_events = 200000
+beam_energy = 10.646
+
+class Fixture(object):
+    """ A TH2F worth of arrays, laid out like a StoredHisto so that
+    lazy_histos.build_histo can turn it into the real thing. """
+
+    def __init__(self, name, values, sumw2, x_edges, y_edges):
+        self.name = name
+        self.title = name
+        self.class_name = 'TH2F'
+        self.has_sumw2 = True
+        self.entries = values.sum()
+        self.values = values
+        self.sumw2 = sumw2
+        self.edges = [x_edges, y_edges]
+
+def make_fixture(sector, seed=0, peak_events=1000000, background_events=200000):
+    """ Counts of one sector, flow bins included. """
+
+    rng = np.random.RandomState(seed + sector)
+    x_edges = np.linspace(x_limits[0], x_limits[1], x_bins + 1)
+    y_edges = np.linspace(y_limits[0], y_limits[1], y_bins + 1)
+
+    # The peak moves and widens along x, a little differently per sector.
+    x = rng.uniform(x_limits[0], x_limits[1], peak_events)
+    mu = 0.02 * sector * (x - 5.0) / 5.0
+    sigma = 0.05 + 0.01 * x
+    y = rng.normal(mu, sigma)
+
+    x = np.concatenate([x, rng.uniform(x_limits[0], x_limits[1], background_events)])
+    y = np.concatenate([y, rng.uniform(y_limits[0], y_limits[1], background_events)])
+
+    # Out of range entries go to the flow bins, as in a filled TH2.
+    inner, _, _ = np.histogram2d(x, y, bins=[x_edges, y_edges])
+    values = np.zeros((x_bins + 2, y_bins + 2))
+    values[1:-1, 1:-1] = inner
+
+    return Fixture('bench_sector_{}'.format(sector), values, values.copy(), x_edges, y_edges)
+
+def make_fixtures(seed=0):
+    return [make_fixture(sector, seed) for sector in range(1, n_sectors + 1)]
+
+def root_histos(fixtures):
+    from lazy_histos import build_histo
+    return [build_histo(fixture) for fixture in fixtures]
+
+def projectors(fixtures):
+    return [SliceProjector(f.values, f.sumw2, f.edges[0], f.edges[1]) for f in fixtures]
+
+def project_slices(fixtures):
+    """ The projection step of the slice fits: cumulative sums, then
+    every slice of every sector. """
+    for projector in projectors(fixtures):
+        bins, _ = projector.slices(x_range, x_bin_step)
+        projector.project(bins, bins + x_bin_step)
+
+def slice_stack(fixtures):
+    """ (sectors, slices, y bins) counts and errors, with the y centers. """
+    counts, errors = [], []
+    for projector in projectors(fixtures):
+        bins, _ = projector.slices(x_range, x_bin_step)
+        c, e = projector.project(bins, bins + x_bin_step)
+        counts.append(c)
+        errors.append(e)
+    return projector.y_centers, np.array(counts), np.array(errors)
+
+def fit_points(fixtures):
+    """ (x, mu, sigma) per sector, some slices emptied so that
+    remove_bad_points has something to remove. """
+    y_centers, counts, errors = slice_stack(fixtures)
+    fit = fit_gaussians(y_centers, counts, errors, fit_range=y_fit_range)
+    x = np.linspace(x_range[0], x_range[1], counts.shape[1])
+
+    points = []
+    for mu, sigma in zip(np.nan_to_num(fit.mu), np.nan_to_num(fit.sigma)):
+        mu, sigma = mu.copy(), sigma.copy()
+        mu[::7] = 0.0
+        sigma[::5] = 10.0
+        points.append((x, mu, sigma))
+    return points
+
+def benchmarks(fixtures):
+    """ name: (function to time, what it needs).  Setup that is not
+    part of the timing happens here. """
+
+    bench = OrderedDict()
+
+    bench['project_slices'] = (lambda: project_slices(fixtures), 'numpy')
+
+    y_centers, counts, errors = slice_stack(fixtures)
+    bench['gaus_fit_batch'] = (
+        lambda: fit_gaussians(y_centers, counts, errors, fit_range=y_fit_range), 'numpy')
+    bench['gaus_estimate_batch'] = (
+        lambda: estimate_gaussians(y_centers, counts, errors, fit_range=y_fit_range), 'numpy')
+    bench['gaus_fast_fit_batch'] = (
+        lambda: fast_fit_gaussians(y_centers, counts, errors, fit_range=y_fit_range), 'numpy')
+
+    # Smeared elastic events, as a skim would hold them.
+    rng = np.random.RandomState(0)
+    ele, pro = elastic_events(beam_energy, rng.uniform(0.1, 0.6, n_events), rng.uniform(-np.pi, np.pi, n_events))
+    ele, pro = ele * rng.normal(1, 0.02, ele.shape), pro * rng.normal(1, 0.02, pro.shape)
+
+    def kinematics():
+        proton_kinematics(beam_energy, ele, pro)
+        predict_proton(ele)
+        predict_beam_energy(ele, pro)
+
+    bench['elastic_kinematics'] = (kinematics, 'numpy')
+
+    kin = proton_kinematics(beam_energy, ele, pro)
+    bench['array_histo_fill'] = (
+        lambda: ArrayHisto.uniform('w_q2', [(200, 0.6, 4.7), (200, 1.2, 4.5)]).fill((kin['w'], kin['q2'])),
+        'numpy')
+
+    try:
+        import ROOT
+    except ImportError:
+        return bench
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.gErrorIgnoreLevel = ROOT.kWarning
+    histos = root_histos(fixtures)
+
+    from histo_utils import numpify
+    bench['numpify'] = (lambda: [numpify(h) for h in histos], 'ROOT')
+
+    import slice_fits
+    from fit_cache import FitCache
+
+    # A new cache each time, or only the first call would fit.
+    def fit_all(method):
+        cache = FitCache()
+        for h in histos:
+            slice_fits.fit_slices(h, x_range, x_bin_step, y_fit_range, cache=cache, method=method)
+
+    bench['fit_slices_root'] = (lambda: fit_all('root'), 'ROOT')
+    bench['fit_slices_ordered'] = (lambda: fit_all('ordered'), 'ROOT')
+    bench['fit_slices_numpy'] = (lambda: fit_all('numpy'), 'ROOT')
+
+    points = fit_points(fixtures)
+    bench['remove_bad_points'] = (
+        lambda: [slice_fits.remove_bad_points(x, mu, sig, 0.5) for x, mu, sig in points], 'ROOT')
+
+    return bench
+
+def time_function(function, repeat=5, min_time=0.2):
+    """ Seconds per call: best and median of repeat rounds, each of
+    as many calls as take at least min_time. """
+
+    number = 1
+    while True:
+        start = time.time()
+        for _ in range(number):
+            function()
+        elapsed = time.time() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.time()
+        for _ in range(number):
+            function()
+        rounds.append((time.time() - start) / number)
+
+    return {'best':min(rounds), 'median':float(np.median(rounds)), 'number':number, 'repeat':repeat}
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as history_file:
+        return json.load(history_file)
+
+def save_history(path, history):
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as history_file:
+        json.dump(history, history_file, indent=1)
+    os.rename(tmp_path, path)
+
+def baseline(history, run, name):
+    """ The last earlier result of benchmark name from the same
+    host and python, or None. """
+    for old in reversed(history):
+        if (old['host'] == run['host'] and old['python'] == run['python']
+            and name in old['results']):
+            return old['results'][name]
+    return None
+
+def regressions(history, run, tolerance):
+    """ (name, old, new) of every benchmark whose best time grew by
+    more than tolerance (a fraction) since its baseline. """
+    slower = []
+    for name, result in run['results'].items():
+        old = baseline(history, run, name)
+        if old is not None and result['best'] > old['best'] * (1.0 + tolerance):
+            slower.append((name, old['best'], result['best']))
+    return slower
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-o', '--output', default='benchmarks.json',
+                    help='History of the runs, appended to')
+    ap.add_argument('-k', '--only', default=None,
+                    help='Run the benchmarks whose name contains this')
+    ap.add_argument('-r', '--repeat', default=5, type=int)
+    ap.add_argument('-t', '--tolerance', default=0.1, type=float,
+                    help='Slowdown, as a fraction, reported as a regression')
+    ap.add_argument('-s', '--seed', default=0, type=int)
+    ap.add_argument('-n', '--no_record', action='store_true',
+                    help='Compare with the history without adding to it')
+    args = ap.parse_args()
+
+    run = {
+        'time':time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host':platform.node(),
+        'python':platform.python_version(),
+        'numpy':np.__version__,
+        'results':OrderedDict()
+    }
+
+    bench = benchmarks(make_fixtures(args.seed))
+    for name, (function, needs) in bench.items():
+        if args.only and args.only not in name:
+            continue
+        run['results'][name] = time_function(function, repeat=args.repeat)
+        print('{0:20s} {1:10.3f} ms  ({2})'.format(name, 1e3 * run['results'][name]['best'], needs))
+
+    if 'fit_slices_root' not in bench:
+        print('ROOT not found, skipped the benchmarks that need it')
+
+    history = load_history(args.output)
+    slower = regressions(history, run, args.tolerance)
+    for name, old, new in slower:
+        print('Regression: {0} {1:.3f} ms -> {2:.3f} ms'.format(name, 1e3 * old, 1e3 * new))
+
+    if not args.no_record:
+        save_history(args.output, history + [run])
+
+    sys.exit(1 if slower else 0)
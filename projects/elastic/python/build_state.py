@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+""" Records of what each output was drawn from, so that a rerun
+only redraws the outputs whose inputs or parameters changed. """
+
+import hashlib
+import json
+import os
+
+# Bump this to draw every output again for a reason the sources
+# do not show (a new ROOT, ...).
+build_version = 2
+
+# The modules that read, fit and draw for every script, next to this
+# one.  A change to any of them invalidates every output.
+shared_sources = ['build_state', 'fit_cache', 'gaus_fit', 'histo_store', 'histo_utils',
+                  'lazy_histos', 'plot_jobs', 'slice_fits', 'slice_projector', 'stage_timers']
+
+def build_sources(script):
+    """ The sources of a script's outputs: itself and the shared modules. """
+    here = os.path.dirname(os.path.abspath(__file__))
+    return [script] + [os.path.join(here, name + '.py') for name in shared_sources]
+
+def file_digest(path):
+    """ Hash of the contents of a file, the source for a .pyc. """
+    if path.endswith('.pyc'):
+        path = path[:-1]
+
+    sha = hashlib.sha1()
+    with open(path, 'rb') as source:
+        sha.update(source.read())
+    return sha.hexdigest()
+
+class BuildState(object):
+    """ One json record per output file in build_dir, holding the
+    key it was last drawn with.
+
+    Keys hash the build version, the settings of the run (options
+    that change the outputs, like the fit method), the contents of
+    the sources (see build_sources) and whatever the caller passes,
+    typically the page and the digests of its input histograms.
+    """
+
+    def __init__(self, build_dir, settings=None, sources=()):
+        self.build_dir = build_dir
+        self.built = 0
+        self.skipped = 0
+
+        sha = hashlib.sha1()
+        sha.update('v{}'.format(build_version).encode('utf-8'))
+        sha.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        for source in sources:
+            sha.update(file_digest(source).encode('utf-8'))
+        self.salt = sha.hexdigest()
+
+    def key(self, *parts):
+        sha = hashlib.sha1()
+        sha.update(self.salt.encode('utf-8'))
+        sha.update(json.dumps(parts, sort_keys=True).encode('utf-8'))
+        return sha.hexdigest()
+
+    def is_current(self, output, key):
+        """ Whether output exists and was drawn with key. """
+        path = self.record_path(output)
+        if not os.path.exists(output) or not os.path.exists(path):
+            return False
+
+        try:
+            with open(path) as record_file:
+                return json.load(record_file)['key'] == key
+        except (ValueError, KeyError):
+            return False
+
+    def record(self, output, key):
+        """ Remember that output was just drawn with key. """
+        if not os.path.isdir(self.build_dir):
+            os.makedirs(self.build_dir)
+
+        # Write then rename, scripts may run side by side.
+        path = self.record_path(output)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'w') as record_file:
+            json.dump({'output':os.path.abspath(output), 'key':key}, record_file)
+        os.rename(tmp_path, path)
+
+    def record_path(self, output):
+        name = hashlib.sha1(os.path.abspath(output).encode('utf-8')).hexdigest()
+        return os.path.join(self.build_dir, name + '.json')
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+""" The cuts of event-selection.groovy as one bitmask per event: each
+cut is evaluated once over a whole chunk, bit i set when cut i is
+passed.  Any combination of cuts is then a mask and a comparison, so
+one pass over the skims gives, for every histogram,
+
+    w_CTOF                   every candidate
+    w_pass_angle_CTOF        passing one cut (as in the groovy)
+    w_pass_isr_CTOF          passing every cut of a selection
+    w_eep_isr_CTOF           passing every cut of a selection that is
+                             not on w (everything else passed, N-1)
+
+and the histogram of the masks themselves (cut_patterns_CTOF), from
+which cut_flow_table counts any combination after the fact.
+
+    flow = CutFlow(elastic_cuts)
+    mask = flow.evaluate(values)
+    elastic = flow.passes(mask, ['w_elastic', 'angle'])
+
+    python cut_flow.py -s=skims -o=cut-flow.root
+"""
+
+import argparse
+import os
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+import stage_timers
+from array_histo import ArrayHisto
+from elastic_kinematics import proton_kinematics
+from event_loop import (beam_energy, elastic_builders, h1, momenta, print_summary,
+                        read_file_list, run, skim_path, write_output)
+from stage_timers import stage
+
+# low < variable < high, None for no bound.
+Cut = namedtuple('Cut', ['name', 'variable', 'low', 'high'])
+
+# Masks bigger than this are not histogrammed.
+max_pattern_cuts = 16
+
+class CutFlow(object):
+    """ Named cuts, bit i of a mask for cuts[i]. """
+
+    def __init__(self, cuts):
+        if len(cuts) > 64:
+            raise ValueError('At most 64 cuts fit a mask, got {}'.format(len(cuts)))
+        self.cuts = list(cuts)
+        self.bits = OrderedDict((cut.name, 1 << i) for i, cut in enumerate(self.cuts))
+
+        for dtype in [np.uint8, np.uint16, np.uint32, np.uint64]:
+            if len(self.cuts) <= 8 * np.dtype(dtype).itemsize:
+                self.dtype = dtype
+                break
+
+    def names(self):
+        return list(self.bits)
+
+    def required(self, names):
+        """ The mask of a list of cut names. """
+        required = 0
+        for name in names:
+            if name not in self.bits:
+                raise KeyError('No cut named {}'.format(name))
+            required |= self.bits[name]
+        return required
+
+    def evaluate(self, values):
+        """ The mask of every event, values holding an array for
+        the variable of every cut.  nan passes nothing. """
+        mask = None
+        with np.errstate(invalid='ignore'):
+            for cut in self.cuts:
+                column = np.asarray(values[cut.variable])
+                passed = np.ones(column.shape, dtype=bool)
+                if cut.low is not None:
+                    passed &= column > cut.low
+                if cut.high is not None:
+                    passed &= column < cut.high
+
+                if mask is None:
+                    mask = np.zeros(column.shape, dtype=self.dtype)
+                mask |= passed.astype(self.dtype) * self.dtype(self.bits[cut.name])
+        return mask
+
+    def passes(self, mask, names):
+        """ Events passing every cut in names. """
+        required = self.dtype(self.required(names))
+        return (mask & required) == required
+
+    def others(self, names, variable):
+        """ The cuts in names that are not on variable, those of the
+        N-1 (eep) distribution of variable. """
+        on_variable = set(cut.name for cut in self.cuts if cut.variable == variable)
+        return [name for name in names if name not in on_variable]
+
+    def pattern_builder(self):
+        """ Histogram of the masks, one bin per combination. """
+        if len(self.cuts) > max_pattern_cuts:
+            raise ValueError('{} cuts give too many patterns to histogram'.format(len(self.cuts)))
+        size = 1 << len(self.cuts)
+        return lambda title: ArrayHisto.uniform(title, [(size, 0, size)])
+
+def pattern_counts(patterns):
+    """ Events (or weights) of each mask, from a cut_patterns histogram. """
+    _, _, values, _ = patterns.numpify()
+    return np.asarray(values)
+
+def count_passing(flow, counts, names):
+    """ Events passing every cut in names, out of the pattern counts. """
+    required = flow.required(names)
+    masks = np.arange(len(counts))
+    return counts[(masks & required) == required].sum()
+
+def cut_flow_table(flow, patterns, selection):
+    """ One row per cut of a selection, in order: events passing it
+    and every cut before it, it alone, and every cut of the
+    selection but it (N-1). """
+    counts = pattern_counts(patterns)
+
+    rows = []
+    for i, name in enumerate(selection):
+        rows.append({'cut':name,
+                     'cumulative':count_passing(flow, counts, selection[:i + 1]),
+                     'alone':count_passing(flow, counts, [name]),
+                     'n_minus_1':count_passing(flow, counts, [other for other in selection if other != name])})
+    return rows
+
+def print_cut_flow(title, flow, patterns, selection):
+    total = pattern_counts(patterns).sum()
+    print('{0} ({1:.0f} events)'.format(title, total))
+    print('{0:20s} {1:>12s} {2:>8s} {3:>12s} {4:>12s}'.format('cut', 'cumulative', 'eff.', 'alone', 'n-1'))
+
+    previous = total
+    for row in cut_flow_table(flow, patterns, selection):
+        efficiency = row['cumulative'] / previous if previous > 0 else 0.0
+        print('{0:20s} {1:12.0f} {2:8.3f} {3:12.0f} {4:12.0f}'.format(
+            row['cut'], row['cumulative'], efficiency, row['alone'], row['n_minus_1']))
+        previous = row['cumulative']
+
+def fill_flow(histos, flow, mask, values, builders, variables, selections, suffix=''):
+    """ Fill each histogram (builders[name] of values[variables[name]])
+    for every candidate, after each cut, and after every cut and N-1
+    of each selection, then the masks themselves. """
+
+    with stage('fill_flow'):
+        passed = dict((name, flow.passes(mask, [name])) for name in flow.names())
+
+        for histo, variable in variables.items():
+            column = values[variable]
+            histos.fill(histo + suffix, builders[histo], column)
+
+            for name in flow.names():
+                histos.fill(histo + '_pass_' + name + suffix, builders[histo], column[passed[name]])
+
+            for selection, names in selections.items():
+                histos.fill(histo + '_pass_' + selection + suffix, builders[histo],
+                            column[flow.passes(mask, names)])
+                others = flow.others(names, variable)
+                if len(others) < len(names):
+                    histos.fill(histo + '_eep_' + selection + suffix, builders[histo],
+                                column[flow.passes(mask, others)])
+
+        if len(flow.cuts) <= max_pattern_cuts:
+            histos.fill('cut_patterns' + suffix, flow.pattern_builder(), mask)
+
+# The cuts and selections of event-selection.groovy.
+elastic_cuts = [
+    Cut('p_ele', 'p_ele', 1.5, None),
+    Cut('w_elastic', 'w', None, 1.15),
+    Cut('high_w', 'w', 1.15, None),
+    Cut('angle', 'angle', 178, 180),
+    Cut('theta_gamma', 'theta_gamma', None, 3),
+    Cut('missing_mass', 'missing_mass', -0.4, 0.4),
+    Cut('missing_mass_ftof', 'missing_mass', -0.1, 0.1),
+    Cut('missing_pt', 'missing_pt', None, 0.2)
+]
+
+elastic_flow = CutFlow(elastic_cuts)
+
+selections = OrderedDict([
+    ('elastic', ['p_ele', 'w_elastic', 'angle', 'theta_gamma', 'missing_mass', 'missing_pt']),
+    ('isr', ['p_ele', 'high_w', 'angle', 'theta_gamma', 'missing_mass_ftof'])
+])
+
+# Histogram name: variable.
+flow_variables = OrderedDict([
+    ('w', 'w'),
+    ('angle_ep', 'angle'),
+    ('theta_gamma', 'theta_gamma'),
+    ('missing_mass', 'missing_mass'),
+    ('missing_pt', 'missing_pt'),
+    ('p_ele', 'p_ele')
+])
+
+flow_builders = dict(elastic_builders)
+flow_builders['missing_pt'] = h1(200, 0, 1)
+flow_builders['p_ele'] = h1(200, 0.1, 10.5)
+
+def candidate_values(chunk):
+    """ The variables of the cuts for a chunk of a skim. """
+    values = proton_kinematics(beam_energy, momenta(chunk, 'ele'), momenta(chunk, 'pro'))
+    values['p_ele'] = np.asarray(chunk['ele_p'], dtype=np.float64)
+    return values
+
+def cut_flow_histos(chunk, histos):
+    values = candidate_values(chunk)
+    with stage('evaluate_cuts'):
+        mask = elastic_flow.evaluate(values)
+
+    ctof = chunk['ctof'].astype(bool)
+    for tof, in_tof in [('CTOF', ctof), ('FTOF', ~ctof)]:
+        tof_values = dict((variable, values[variable][in_tof]) for variable in set(flow_variables.values()))
+        fill_flow(histos, elastic_flow, mask[in_tof], tof_values, flow_builders, flow_variables,
+                  selections, '_' + tof)
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-i', '--file_list', default='../smallFiles.txt',
+                    help='Files to process, one per line, as for run.py')
+    ap.add_argument('-s', '--skim_dir', default='skims',
+                    help='Read the skim of each listed file from here, empty to read '
+                    'the listed files themselves')
+    ap.add_argument('-e', '--extension', default='.skim')
+    ap.add_argument('-o', '--output', default='cut-flow.root',
+                    help='ROOT file, or array store directory')
+    ap.add_argument('-j', '--jobs', default=16, type=int)
+    ap.add_argument('-c', '--chunk_size', default=100000, type=int)
+    ap.add_argument('-p', '--profile', action='store_true')
+    args = ap.parse_args()
+
+    if args.profile:
+        stage_timers.enable()
+
+    paths = read_file_list(args.file_list)
+    if args.skim_dir:
+        paths = [skim_path(path, args.skim_dir, args.extension) for path in paths]
+
+    histos, summary = run(paths, cut_flow_histos, jobs=args.jobs, chunk_size=args.chunk_size)
+    print_summary(summary)
+
+    for tof in ['CTOF', 'FTOF']:
+        for selection, names in selections.items():
+            print('')
+            print_cut_flow('{} {}'.format(selection, tof), elastic_flow,
+                           histos['cut_patterns_' + tof], names)
+
+    write_output(histos, args.output)
+    print('Saved: ', args.output)
+
+    if args.profile:
+        stage_timers.print_summary()
+        print('Profile: ', stage_timers.write_report(os.path.splitext(args.output)[0]))
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+""" Systematic variations of the elastic cuts, all in one pass over
+the skims.  Every cut has a list of windows, the variations are every
+combination of them.  Each cut is evaluated once per window, and the
+pass matrix (variation, event) is made by picking rows, so a chunk
+costs a few comparisons per window instead of a pass per variation.
+
+For each variation the W distribution is filled into one 2D
+histogram (variation, W), from which come the elastic yield, the W
+peak (one gaussian fit of all variations at once) and, with
+simulation, the data/sim yield ratio, also relative to the nominal
+cuts.
+
+    python cut_scan.py -d=../dataFiles.txt -s=skims -m=../simFiles.txt -k=sim-skims -o=scan
+
+writes scan.json with a record per variation and tof, and the
+histograms to scan-data and scan-sim (array stores).  -g takes a json
+grid like {"angle": ["angle", [[177, 180], [178, 180]]], ...}.
+"""
+
+import argparse
+import itertools
+import json
+
+from collections import OrderedDict, namedtuple
+from functools import partial
+
+import numpy as np
+
+from array_histo import ArrayHisto
+from cut_flow import candidate_values
+from event_loop import print_summary, read_file_list, run, skim_path, write_output
+from gaus_fit import fast_fit_gaussians, status_ok
+from stage_timers import stage
+
+# windows: [(low, high), ...], low < variable < high, None for no bound.
+ScanCut = namedtuple('ScanCut', ['name', 'variable', 'windows'])
+
+class CutScan(object):
+    """ Every combination of the windows of the cuts. """
+
+    def __init__(self, cuts):
+        self.cuts = list(cuts)
+
+        # Window of each cut for every variation, (variations, cuts).
+        self.choices = np.array(list(itertools.product(*[range(len(cut.windows)) for cut in self.cuts])),
+                                dtype=np.int64).reshape(-1, len(self.cuts))
+
+    def __len__(self):
+        return len(self.choices)
+
+    def variation(self, index):
+        """ {cut name: window} of a variation. """
+        return OrderedDict((cut.name, list(cut.windows[choice]))
+                           for cut, choice in zip(self.cuts, self.choices[index]))
+
+    def find(self, windows):
+        """ Index of the variation with the given window of each cut
+        (the first window for cuts not given), None if not scanned. """
+        choice = []
+        for cut in self.cuts:
+            window = tuple(windows.get(cut.name, cut.windows[0]))
+            matches = [i for i, w in enumerate(cut.windows) if tuple(w) == window]
+            if not matches:
+                return None
+            choice.append(matches[0])
+        found = np.flatnonzero(np.all(self.choices == choice, axis=1))
+        return int(found[0])
+
+    def passes(self, values):
+        """ (variations, events), which events pass every cut of each
+        variation.  nan passes nothing. """
+        passed = None
+        with np.errstate(invalid='ignore'):
+            for c, cut in enumerate(self.cuts):
+                column = np.asarray(values[cut.variable])
+                by_window = np.ones((len(cut.windows),) + column.shape, dtype=bool)
+                for w, (low, high) in enumerate(cut.windows):
+                    if low is not None:
+                        by_window[w] &= column > low
+                    if high is not None:
+                        by_window[w] &= column < high
+
+                if passed is None:
+                    passed = by_window[self.choices[:, c]]
+                else:
+                    passed &= by_window[self.choices[:, c]]
+        return passed
+
+# The W binning of the scan, finer than event-selection's around the peak.
+w_binning = (160, 0.6, 1.4)
+yield_window = [0.8, 1.15]
+peak_range = [0.85, 1.05]
+
+def scan_builder(scan):
+    return lambda title: ArrayHisto.uniform(title, [(len(scan), 0, len(scan)), w_binning])
+
+def scan_histos(scan, chunk, histos):
+    values = candidate_values(chunk)
+    with stage('cut_scan'):
+        passed = scan.passes(values)
+
+        ctof = chunk['ctof'].astype(bool)
+        for tof, in_tof in [('CTOF', ctof), ('FTOF', ~ctof)]:
+            variation, event = np.nonzero(passed & in_tof)
+            histos.fill('w_scan_' + tof, scan_builder(scan), (variation + 0.5, values['w'][event]))
+
+def scan_results(histo):
+    """ Elastic yield and W peak of each variation of a w_scan histogram. """
+    _, w_edges, counts, errors = histo.numpify()
+    centers = 0.5 * (w_edges[:-1] + w_edges[1:])
+    in_window = (centers > yield_window[0]) & (centers < yield_window[1])
+
+    with stage('fit_peaks'):
+        fits = fast_fit_gaussians(centers, counts, errors, fit_range=peak_range)
+
+    return {'yield':counts[:, in_window].sum(axis=1),
+            'yield_err':np.sqrt((errors[:, in_window]**2).sum(axis=1)),
+            'mu':fits.mu, 'mu_err':fits.mu_err, 'sigma':np.abs(fits.sigma), 'sigma_err':fits.sigma_err,
+            'fit_ok':fits.status == status_ok}
+
+def ratio(a, a_err, b, b_err):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = a / b
+        return r, np.abs(r) * np.sqrt((a_err / a)**2 + (b_err / b)**2)
+
+def scan_table(scan, data, sim=None, nominal=None):
+    """ One record per variation, sim and nominal optional. """
+    results = scan_results(data)
+    if sim is not None:
+        sim_results = scan_results(sim)
+        results['sim_yield'] = sim_results['yield']
+        results['ratio'], results['ratio_err'] = ratio(results['yield'], results['yield_err'],
+                                                       sim_results['yield'], sim_results['yield_err'])
+        if nominal is not None:
+            results['relative_ratio'] = results['ratio'] / results['ratio'][nominal]
+
+    records = []
+    for i in range(len(scan)):
+        record = OrderedDict([('variation', i), ('cuts', scan.variation(i)), ('nominal', i == nominal)])
+        for key, values in results.items():
+            record[key] = values[i].item()
+        records.append(record)
+    return records
+
+def print_scan(title, scan, records):
+    """ The records, showing the cuts that are varied. """
+    varied = [cut.name for cut in scan.cuts if len(cut.windows) > 1]
+    print(title)
+    columns = [key for key in ['yield', 'mu', 'sigma', 'ratio', 'relative_ratio'] if key in records[0]]
+    print('{0:>4s} {1:50s} '.format('', 'cuts') + ' '.join('{0:>12s}'.format(key) for key in columns))
+    for record in records:
+        cuts = ' '.join('{}={}'.format(name, record['cuts'][name]) for name in varied)
+        print('{0:4d} {1:50s} '.format(record['variation'], cuts.replace('None', '-')) +
+              ' '.join('{0:12.4g}'.format(record[key]) for key in columns) +
+              (' *' if record['nominal'] else ''))
+
+# Each window of event-selection.groovy and es.py, with variations
+# around it; 5 x 5 x 4 = 100.
+default_grid = [
+    ScanCut('p_ele', 'p_ele', [(1.5, None)]),
+    ScanCut('angle', 'angle', [(178, 180), (177, 180), (177.5, 180), (178.5, 180), (179, 180)]),
+    ScanCut('theta_gamma', 'theta_gamma', [(None, 3), (None, 2), (None, 2.5), (None, 3.5), (None, 4)]),
+    ScanCut('missing_mass', 'missing_mass', [(-0.4, 0.4), (-0.2, 0.2), (-0.3, 0.3), (-0.5, 0.5)])
+]
+
+def read_grid(path):
+    """ A grid from json, {name: [variable, [[low, high], ...]]}. """
+    with open(path) as grid_file:
+        grid = json.load(grid_file, object_pairs_hook=OrderedDict)
+    return [ScanCut(name, variable, [tuple(w) for w in windows]) for name, (variable, windows) in grid.items()]
+
+def skim_paths(file_list, skim_dir, extension):
+    paths = read_file_list(file_list)
+    if skim_dir:
+        paths = [skim_path(path, skim_dir, extension) for path in paths]
+    return paths
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-d', '--data_list', required=True, help='Data files, one per line')
+    ap.add_argument('-s', '--data_skim_dir', default='skims',
+                    help='Skims of the data files, empty to read the listed files')
+    ap.add_argument('-m', '--sim_list', default=None, help='Simulated files, one per line')
+    ap.add_argument('-k', '--sim_skim_dir', default='sim-skims',
+                    help='Skims of the simulated files, empty to read the listed files')
+    ap.add_argument('-e', '--extension', default='.skim')
+    ap.add_argument('-g', '--grid', default=None, help='Cut windows to scan (json)')
+    ap.add_argument('-o', '--output_prefix', default='cut-scan')
+    ap.add_argument('-j', '--jobs', default=16, type=int)
+    ap.add_argument('-c', '--chunk_size', default=100000, type=int)
+    args = ap.parse_args()
+
+    scan = CutScan(read_grid(args.grid) if args.grid else default_grid)
+    nominal = scan.find({})
+    print('Scanning {} variations'.format(len(scan)))
+
+    samples = [('data', args.data_list, args.data_skim_dir)]
+    if args.sim_list:
+        samples.append(('sim', args.sim_list, args.sim_skim_dir))
+
+    histos = {}
+    for sample, file_list, skim_dir in samples:
+        paths = skim_paths(file_list, skim_dir, args.extension)
+        histos[sample], summary = run(paths, partial(scan_histos, scan), jobs=args.jobs,
+                                      chunk_size=args.chunk_size)
+        print_summary(summary)
+        write_output(histos[sample], '{}-{}'.format(args.output_prefix, sample))
+
+    output = OrderedDict()
+    for tof in ['CTOF', 'FTOF']:
+        name = 'w_scan_' + tof
+        if name not in histos['data']:
+            continue
+        sim = histos['sim'][name] if 'sim' in histos else None
+        output[tof] = scan_table(scan, histos['data'][name], sim, nominal)
+        print('')
+        print_scan(tof, scan, output[tof])
+
+    with open(args.output_prefix + '.json', 'w') as output_file:
+        json.dump(output, output_file, indent=1)
+    print('Saved: ', args.output_prefix + '.json')
@@ -9,63 +9,26 @@ import matplotlib
 matplotlib.use('agg')
 import matplotlib.pyplot as plt 
 
-from scipy.optimize import minimize 
-
 from array import array 
-from ROOT import (TH1F, TH2F, TH1D, TF1, TFile, TCanvas,
+from ROOT import (TH1F, TH2F, TF1, TFile, TCanvas,
                   gPad, gStyle, TLatex, TGraphErrors)
 
-allowed_types = (TH1F, TH1D)
+from gaus_fit import fit_gaussians
+from histo_utils import numpify
+from lazy_histos import LazyHistos
+from slice_projector import SliceProjector
+import stage_timers
+from stage_timers import stage
+
 default_histo = TH1F('default', '', 100, 0, 1)
 default_histo2d = TH2F('default', '', 100, 0, 1, 100, 0, 1)
 
-def load_histos(file):
-    ''' Use the ROOT file structure to load a dictionary of histograms. '''
-    h = {}
-    for k in file.GetListOfKeys():
-        h[k.GetName()] = file.Get(k.GetName())
-    return h
-
-def numpify(histo):
-    """ TH1F to np.arrays. """
-
-    if type(histo) not in allowed_types:
-        raise NotImplementedError('Can not numpify type {}'.format(type(histo)))
-
-    nbins = histo.GetNbinsX()
-
-    # Setup output 
-    x_lows = np.zeros(nbins)
-    x_highs = np.zeros(nbins)
-    values = np.zeros(nbins)
-    errors = np.zeros(nbins)
-    
-    for i in range(1, nbins + 1):
-        x_lows[i-1] = histo.GetBinLowEdge(i)
-        x_highs[i-1] = histo.GetBinLowEdge(i) + histo.GetBinWidth(i)
-        values[i-1] = histo.GetBinContent(i)
-        errors[i-1] = histo.GetBinError(i)
-
-    return x_lows, x_highs, values, errors
-
-def chi2(data, theory, err):
-    return np.sum((data-theory)**2 / (0.00001 + err**2)) 
-
 def model(x,p):
     return p[0] * np.exp( -0.5 * (x - p[1])**2 / p[2]**2 )
 
-def scipy_fit_slice(x, y, err, bounds):        
-    
-    p0 = np.random.uniform(-1, 1, 3)    
-    p0[0] = np.max(y)
-    p0[1] = np.mean(x*y)
-    p0[2] = np.std(x*y)
-    
-    res = minimize(lambda p: chi2(y, model(x,p), err), x0=p0, bounds=bounds, method='Nelder-Mead')
-    return res.x
-
 def fit_slices(histo, x_range, x_bin_step):
 
+    projector = SliceProjector.from_histo(histo)
     x_start = histo.GetXaxis().FindBin(x_range[0])
     x_stop =  histo.GetXaxis().FindBin(x_range[1])
 
@@ -73,7 +36,7 @@ def fit_slices(histo, x_range, x_bin_step):
     slices = []
     fits = []
     for i, x_bin in enumerate(range(x_start, x_stop + 1, x_bin_step)):
-        projec = histo.ProjectionY(histo.GetTitle() + '_proj{}'.format(i) , x_bin, x_bin + x_bin_step)
+        projec = projector.histogram(histo.GetTitle() + '_proj{}'.format(i), x_bin, x_bin + x_bin_step, histo.GetTitle())
         
         fmin = projec.GetMean() - 3 * projec.GetStdDev()
         fmax = projec.GetMean() + 3 * projec.GetStdDev() 
@@ -118,24 +81,27 @@ def plot_slices(slices, fits, output_name):
     fig, axes = plt.subplots(nrows=nrows, ncols=ncols,
                              figsize=(ncols * 4, nrows * 3))
 
+    # All slices share the binning, fit them in one go.
+    arrays = [numpify(current_slice) for current_slice in slices]
+    x_cents = np.array([0.5 * (x_low + x_high) for x_low, x_high, _, __ in arrays])
+    fit_range = (np.array([[fit.GetXmin()] for fit in fits]), np.array([[fit.GetXmax()] for fit in fits]))
+    gaus = fit_gaussians(x_cents,
+                         np.array([vals for _, __, vals, ___ in arrays]),
+                         np.array([errs for _, __, ___, errs in arrays]),
+                         fit_range=fit_range)
+
     i,j = 0, 0
-    for current_slice, current_fit in zip(slices, fits):
-        x_low, x_high, vals, errs = numpify(current_slice)
-        x_cent = 0.5 * (x_low + x_high)
+    for k, (current_slice, current_fit) in enumerate(zip(slices, fits)):
+        x_low, x_high, vals, errs = arrays[k]
+        x_cent = x_cents[k]
         width = x_high[0] - x_low[0]
         #y_fit = np.array([current_fit.Eval(xc) for xc in x_cent])
 
         mu = np.mean(x_cent * vals)
         std = np.std(x_cent * vals)
 
-        bounds = [] 
-        bounds.append([0, 2*np.max(vals)])
-        bounds.append([mu - 2 * std, mu + 2 * std])
-        bounds.append([0, 5 * std])
-
-        pars = scipy_fit_slice(x_cent, vals, errs, bounds)
+        pars = [gaus.amplitude[k], gaus.mu[k], gaus.sigma[k]]
         y_fit = model(x_cent, pars)
-        print(pars)
          
         axes[i,j].bar(x_cent, vals, width=width, edgecolor='')
         axes[i,j].plot(x_cent, y_fit, linestyle='-', linewidth=1, color='red')
@@ -149,7 +115,8 @@ def plot_slices(slices, fits, output_name):
             i += 1 
 
     fig.tight_layout()
-    fig.savefig(output_name, bbox_inches='tight')
+    with stage('print'):
+        fig.savefig(output_name, bbox_inches='tight')
         
 def plot_fits_mpl(histos1, histos2, config1, config2,
                   x_range, x_bin_step, title_formatter,
@@ -206,7 +173,8 @@ def plot_fits_mpl(histos1, histos2, config1, config2,
             ax.set_ylabel(ytitle)
             
     fig.tight_layout()
-    fig.savefig(save_name, bbox_inches='tight')
+    with stage('print'):
+        fig.savefig(save_name, bbox_inches='tight')
 
     
 def remove_bad_points(x, mu, sig, max_errorbar):
@@ -221,19 +189,25 @@ if __name__ == '__main__':
     ap.add_argument('-d', '--data_file', required=True)
     ap.add_argument('-s', '--sim_file', required=True)
     ap.add_argument('-o', '--output_prefix', required=True)
+    ap.add_argument('-p', '--profile', action='store_true',
+                    help='Time the stages into <output_prefix>.profile.json and .folded')
     args = ap.parse_args()
 
+    if args.profile:
+        stage_timers.enable()
+
     # Setup files
     files = {}
-    files['data'] = TFile(args.data_file)
-    files['sim'] = TFile(args.sim_file)
+    with stage('open_histos'):
+        files['data'] = TFile(args.data_file)
+        files['sim'] = TFile(args.sim_file)
 
     output_pdfname = args.output_prefix + '.pdf'
 
     # Load histograms
     histos = {}
     for config_type, file in files.items():
-        histos[config_type] = load_histos(file)
+        histos[config_type] = LazyHistos(file)
     
     # Plot fits to the resolutions
     """
@@ -302,8 +276,8 @@ if __name__ == '__main__':
         width_dat = x_high_dat[1] - x_high_dat[0]
         width_sim = x_high_sim[1] - x_high_sim[0]
         
-        val_dat /= np.max(val_dat)
-        val_sim /= np.max(val_sim)
+        val_dat = val_dat / np.max(val_dat)
+        val_sim = val_sim / np.max(val_sim)
 
         plt.subplot(2,3,i)
         plt.step(x_low_dat, val_dat, where='post', label='Data', color='k')
@@ -313,7 +287,8 @@ if __name__ == '__main__':
         plt.legend(frameon=False)
          
     plt.tight_layout()
-    plt.savefig('p_ele_compare-in.pdf')
+    with stage('print'):
+        plt.savefig('p_ele_compare-in.pdf')
 
     plt.close()
     plt.figure(figsize=(16,9))
@@ -327,8 +302,8 @@ if __name__ == '__main__':
         width_dat = x_high_dat[1] - x_high_dat[0]
         width_sim = x_high_sim[1] - x_high_sim[0]
         
-        val_dat /= np.max(val_dat)
-        val_sim /= np.max(val_sim)
+        val_dat = val_dat / np.max(val_dat)
+        val_sim = val_sim / np.max(val_sim)
 
         plt.subplot(2,3,i)
         plt.step(x_low_dat, val_dat, where='post', label='Data', color='k')
@@ -338,7 +313,8 @@ if __name__ == '__main__':
         plt.legend(frameon=False)
         
     plt.tight_layout()
-    plt.savefig('theta_ele_compare-in.pdf')
+    with stage('print'):
+        plt.savefig('theta_ele_compare-in.pdf')
 
     
     plt.close()
@@ -353,8 +329,8 @@ if __name__ == '__main__':
         width_dat = x_high_dat[1] - x_high_dat[0]
         width_sim = x_high_sim[1] - x_high_sim[0]
         
-        val_dat /= np.max(val_dat)
-        val_sim /= np.max(val_sim)
+        val_dat = val_dat / np.max(val_dat)
+        val_sim = val_sim / np.max(val_sim)
 
         plt.subplot(2,3,i)
         plt.step(x_low_dat, val_dat, where='post', label='Data', color='k')
@@ -364,7 +340,8 @@ if __name__ == '__main__':
         plt.legend(frameon=False)
         
     plt.tight_layout()
-    plt.savefig('theta_pro_compare-in.pdf')
+    with stage('print'):
+        plt.savefig('theta_pro_compare-in.pdf')
 
     
     plt.close()
@@ -379,8 +356,8 @@ if __name__ == '__main__':
         width_dat = x_high_dat[1] - x_high_dat[0]
         width_sim = x_high_sim[1] - x_high_sim[0]
         
-        val_dat /= np.max(val_dat)
-        val_sim /= np.max(val_sim)
+        val_dat = val_dat / np.max(val_dat)
+        val_sim = val_sim / np.max(val_sim)
 
         plt.subplot(2,3,i)
         plt.step(x_low_dat, val_dat, where='post', label='Data', color='k')
@@ -390,4 +367,9 @@ if __name__ == '__main__':
         plt.legend(frameon=False)
         
     plt.tight_layout()
-    plt.savefig('p_pro_compare-in.pdf')
+    with stage('print'):
+        plt.savefig('p_pro_compare-in.pdf')
+
+    if args.profile:
+        stage_timers.print_summary()
+        print('Profile: ', stage_timers.write_report(args.output_prefix))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+""" The kinematics of event-selection.groovy (and the predictions of
+monitor.groovy) on whole arrays of events at once.
+
+Particles are arrays of momenta shaped (..., 3), px, py and pz in GeV
+like the REC::Particle bank, every function works along the leading
+axes.  Energies come from the PDG masses, as for new Particle(pid,
+px, py, pz).  Angles are in radians unless the groovy gave them in
+degrees (angle, theta_gamma, theta_egamma).
+
+    ele = np.stack([px[e], py[e], pz[e]], axis=-1)
+    pro = np.stack([px[p], py[p], pz[p]], axis=-1)
+    kin = proton_kinematics(10.646, ele, pro)
+    elastic = (kin['w'] < 1.15) & (kin['angle'] > 178)
+"""
+
+import numpy as np
+
+# PDGDatabase.getParticleMass
+electron_mass = 0.000511
+proton_mass = 0.938272
+
+def four_vectors(momenta, mass):
+    """ (..., 4) px, py, pz, E. """
+    momenta = np.asarray(momenta, dtype=np.float64)
+    energy = np.sqrt(np.sum(momenta**2, axis=-1) + mass**2)
+    return np.concatenate([momenta, energy[..., None]], axis=-1)
+
+def beam_vector(beam_energy):
+    """ The beam, new Particle(11, 0, 0, beam_energy). """
+    return four_vectors([0.0, 0.0, beam_energy], electron_mass)
+
+def target_vector():
+    return np.array([0.0, 0.0, 0.0, proton_mass])
+
+def mass2(vectors):
+    return vectors[..., 3]**2 - np.sum(vectors[..., :3]**2, axis=-1)
+
+def mass(vectors):
+    """ Like LorentzVector.mass, negative for spacelike vectors. """
+    m2 = mass2(vectors)
+    return np.sign(m2) * np.sqrt(np.abs(m2))
+
+def momentum(momenta):
+    return np.sqrt(np.sum(np.asarray(momenta)**2, axis=-1))
+
+def theta(momenta):
+    momenta = np.asarray(momenta)
+    return np.arctan2(np.hypot(momenta[..., 0], momenta[..., 1]), momenta[..., 2])
+
+def phi(momenta):
+    momenta = np.asarray(momenta)
+    return np.arctan2(momenta[..., 1], momenta[..., 0])
+
+def angle_between(a, b):
+    """ Angle between vectors, in degrees (Vector3.theta(other)). """
+    norm = np.sqrt(np.sum(a**2, axis=-1) * np.sum(b**2, axis=-1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos = np.sum(a * b, axis=-1) / norm
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+def kinematics(beam_energy, ele):
+    """ x, y, w, nu and q2 of the electrons (getKin). """
+
+    beam = beam_vector(beam_energy)
+    ele = four_vectors(ele, electron_mass)
+
+    w = mass(beam + target_vector() - ele)
+    q2 = -mass2(beam - ele)
+    nu = beam[3] - ele[..., 3]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = q2 / (2 * nu * proton_mass)
+    return {'x':x, 'y':nu / beam[3], 'w':w, 'nu':nu, 'q2':q2}
+
+def proton_kinematics(beam_energy, ele, pro):
+    """ getPKin: the kinematics of the electrons, plus the missing
+    momentum of each electron and proton pair.  angle is the angle
+    between their planes with the beam (180 for elastic), theta_gamma
+    the angle of the missing momentum to the beam and theta_egamma its
+    angle to the electron, all in degrees. """
+
+    ele = np.asarray(ele, dtype=np.float64)
+    pro = np.asarray(pro, dtype=np.float64)
+    kin = kinematics(beam_energy, ele)
+
+    missing = (beam_vector(beam_energy) + target_vector()
+               - four_vectors(ele, electron_mass) - four_vectors(pro, proton_mass))
+
+    # electron x z-axis and proton x z-axis, (py, -px, 0) each.
+    zaxis = np.array([0.0, 0.0, 1.0])
+    kin['angle'] = angle_between(np.cross(ele, zaxis), np.cross(pro, zaxis))
+    kin['missing_mass'] = mass2(missing)
+    kin['missing_energy'] = missing[..., 3]
+    kin['missing_pt'] = np.hypot(missing[..., 0], missing[..., 1])
+    kin['theta_gamma'] = np.degrees(theta(missing[..., :3]))
+    kin['theta_egamma'] = angle_between(missing[..., :3], ele)
+    return kin
+
+def predict_proton(ele):
+    """ Momentum and angle (radians) of the proton elastically
+    recoiling from each electron (predictProton). """
+    p, th = momentum(ele), theta(ele)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        beam_energy = p / (1 + p / proton_mass * (np.cos(th) - 1))
+        beta = np.arctan(p * np.sin(th) / (beam_energy - p * np.cos(th)))
+        return p * np.sin(th) / np.sin(beta), beta
+
+def predict_electron(pro):
+    """ Momentum and angle (radians, negative like the groovy) of the
+    electron elastically scattered with each proton (predictElectron). """
+    p, th = momentum(pro), theta(pro)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        num = proton_mass * (p + (-proton_mass + np.sqrt(proton_mass**2 + p**2)) * np.cos(th))
+        den = 2 * proton_mass * np.cos(th) - p * np.sin(th)**2
+        beam_energy = num / den
+
+        alpha = np.arctan2(p * np.sin(-th), beam_energy - p * np.cos(th))
+        return p * np.sin(-th) / np.sin(alpha), alpha
+
+def predict_from_electron_angle(beam_energy, alpha):
+    """ Electron momentum, proton angle and proton momentum of elastic
+    scattering at electron angle alpha (predictElasticBasedOnElectronAngle). """
+    cos_alpha, sin_alpha = np.cos(alpha), np.sin(alpha)
+    ele_p = beam_energy / (1 + (beam_energy / proton_mass) * (1 - cos_alpha))
+    pro_p = np.sqrt(beam_energy**2 - 2 * beam_energy * ele_p * cos_alpha + ele_p**2)
+    return ele_p, np.arcsin(ele_p * sin_alpha / pro_p), pro_p
+
+def predict_beam_energy(ele, pro):
+    """ Beam energy of elastic scattering from the electron alone and
+    from the two angles (predictBeamEnergy). """
+    p, th_e, th_p = momentum(ele), theta(ele), theta(pro)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        from_electron = p / (1 + (p / proton_mass) * (np.cos(th_e) - 1))
+        a0 = 1 - 1 / (np.cos(th_e) - np.sin(th_e) / np.tan(-th_p))
+        a1 = np.sin(th_e) / np.sin(th_e + th_p)
+        return from_electron, 2 * proton_mass * a0 / (a1**2 - a0**2)
+
+def elastic_events(beam_energy, theta_ele, phi_ele):
+    """ (electron, proton) momenta of exact elastic scattering at the
+    given electron angles (radians), for checks and benchmarks. """
+    theta_ele, phi_ele = np.asarray(theta_ele), np.asarray(phi_ele)
+    ele_p, beta, pro_p = predict_from_electron_angle(beam_energy, theta_ele)
+
+    def momenta(p, th, ph):
+        return np.stack([p * np.sin(th) * np.cos(ph), p * np.sin(th) * np.sin(ph),
+                         p * np.cos(th)], axis=-1)
+
+    return momenta(ele_p, theta_ele, phi_ele), momenta(pro_p, beta, phi_ele + np.pi)
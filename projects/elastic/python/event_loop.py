@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+
+""" The event loop of event-selection.groovy on columnar skims: the
+chunks of all the files are split into runs, and each worker process
+reads the chunks of a run as arrays (one per column, e.g. ele_px)
+and fills its own ArrayHistos, which are merged pairwise at the end.
+Runs cross file boundaries, so all workers are busy however few the
+files.
+
+    def process(chunk, histos):
+        kin = proton_kinematics(beam_energy, momenta(chunk, 'ele'), momenta(chunk, 'pro'))
+        histos.fill('w', w_builder, kin['w'])
+
+    histos, summary = run(['a.npz', 'b.npz'], process, jobs=16)
+
+The files are those of run.py (smallFiles.txt), each looked up as a
+skim in skim_dir.  Readers of each skim format, by extension, are in
+readers.  process must be a module level function so that the
+workers can be given it.
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import stage_timers
+from array_histo import ArrayHisto, merge_histos, write_root
+from elastic_kinematics import proton_kinematics
+from histo_store import write_histos
+from skim import Skim, skim_chunks
+from stage_timers import count, stage
+
+class Histos(dict):
+    """ The histograms of one worker, by name. """
+
+    def fill(self, name, builder, coords, weights=None):
+        """ Like histos.computeIfAbsent(name, builder).fill(x) in the
+        groovy, for every value of coords at once. """
+        if name not in self:
+            self[name] = builder(name)
+        self[name].fill(coords, weights)
+
+def npz_chunks(path, chunk_size):
+    """ Chunks of a .npz of equal length columns. """
+    with np.load(path) as columns:
+        columns = dict((name, columns[name]) for name in columns.files)
+
+    size = len(next(iter(columns.values()))) if columns else 0
+    for start in range(0, size, chunk_size):
+        yield dict((name, values[start:start + chunk_size]) for name, values in columns.items())
+
+def npz_rows(path):
+    with np.load(path) as columns:
+        return len(columns[columns.files[0]]) if columns.files else 0
+
+def skim_rows(path):
+    return len(Skim(path))
+
+# Chunk readers, (path, chunk_size) -> dicts of column arrays, and
+# the number of rows of a file for each.
+readers = {
+    '.npz':npz_chunks,
+    '.skim':skim_chunks
+}
+
+row_counters = {
+    '.npz':npz_rows,
+    '.skim':skim_rows
+}
+
+def read_file_list(path):
+    """ The files named in a list like smallFiles.txt, one per line. """
+    with open(path) as list_file:
+        return [line.strip() for line in list_file if line.strip()]
+
+def skim_path(path, skim_dir, extension):
+    """ The skim in skim_dir of a file from the list (a .hipo). """
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(skim_dir, name + extension)
+
+def file_reader(path, registry):
+    extension = os.path.splitext(path)[1]
+    if extension not in registry:
+        raise ValueError('No reader for {} files ({})'.format(extension, path))
+    return registry[extension]
+
+def read_chunks(path, chunk_size, first=0, stop=None):
+    """ Chunks first..stop-1 of a file. """
+    return itertools.islice(file_reader(path, readers)(path, chunk_size), first, stop)
+
+def count_chunks(path, chunk_size):
+    return -(-file_reader(path, row_counters)(path) // chunk_size)
+
+def split_chunks(paths, chunk_size, tasks):
+    """ The chunks of all files cut into about tasks runs of
+    consecutive chunks, each a list of (path, first, stop) pieces.
+    A run can span files, and a file can be split between runs, so
+    the number of runs does not depend on the number of files. """
+    sizes = [count_chunks(path, chunk_size) for path in paths]
+    per_task = max(1, -(-sum(sizes) // max(tasks, 1)))
+
+    runs = [[]]
+    room = per_task
+    for path, size in zip(paths, sizes):
+        first = 0
+        while first < size:
+            if room == 0:
+                runs.append([])
+                room = per_task
+            stop = min(size, first + room)
+            runs[-1].append((path, first, stop))
+            room -= stop - first
+            first = stop
+    return [run for run in runs if run]
+
+def process_pieces(pieces, process, chunk_size):
+    """ One Histos filled from every (path, first, stop) piece, and
+    the (path, events, seconds) of each piece. """
+    histos = Histos()
+    done = []
+    for path, first, stop in pieces:
+        start = time.time()
+        events = 0
+        with stage('process_file'):
+            for chunk in read_chunks(path, chunk_size, first, stop):
+                with stage('process'):
+                    process(chunk, histos)
+                size = len(next(iter(chunk.values()))) if chunk else 0
+                events += size
+                count('events', size)
+        done.append((path, events, time.time() - start))
+    return histos, done
+
+def init_worker(profile):
+    stage_timers.forget()
+    if profile:
+        stage_timers.enable()
+
+# Workers send their stage timings back with the results.
+def process_pieces_worker(args):
+    return process_pieces(*args), stage_timers.drain()
+
+def merge_worker(pair):
+    with stage('merge'):
+        merged = merge_histos(*pair)
+    return merged, stage_timers.drain()
+
+def tree_merge(results, pool=None):
+    """ One dictionary of histograms from many, merged in pairs
+    (in the pool if given) until one is left. """
+    if not results:
+        return Histos()
+
+    while len(results) > 1:
+        pairs = [results[i:i + 2] for i in range(0, len(results) - 1, 2)]
+        left = [results[-1]] if len(results) % 2 else []
+        if pool is None:
+            merged = [merge_histos(*pair) for pair in pairs]
+        else:
+            merged = []
+            for histos, events in pool.map(merge_worker, pairs):
+                merged.append(histos)
+                stage_timers.merge(events)
+        results = merged + left
+
+    return Histos(results[0])
+
+def unpack_events(done):
+    for result, events in done:
+        stage_timers.merge(events)
+        yield result
+
+def run(paths, process, jobs=1, chunk_size=100000):
+    """ Histograms of process over every file, and a summary: events,
+    wall seconds and events/s, in total and per file (the seconds of
+    a file split between workers being summed over its pieces).
+
+    The chunks of all files are split into runs, twice as many as
+    workers so that a slow run does not hold up the rest, each run
+    filling one set of histograms in a worker. """
+
+    start = time.time()
+    runs = split_chunks(paths, chunk_size, 2 * jobs if jobs > 1 else 1)
+    results = []
+    pool = None
+    if jobs > 1 and len(runs) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(runs)), initializer=init_worker,
+                                    initargs=(stage_timers.enabled,))
+    try:
+        if pool is None:
+            done = (process_pieces(run, process, chunk_size) for run in runs)
+        else:
+            done = unpack_events(pool.imap(process_pieces_worker,
+                                           [(run, process, chunk_size) for run in runs]))
+
+        by_path = dict((path, [0, 0.0]) for path in paths)
+        for histos, pieces in done:
+            results.append(histos)
+            for path, events, seconds in pieces:
+                by_path[path][0] += events
+                by_path[path][1] += seconds
+
+        histos = tree_merge(results, pool)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    files = []
+    for path in paths:
+        events, seconds = by_path[path]
+        files.append({'path':path, 'events':events, 'seconds':seconds,
+                      'rate':events / seconds if seconds > 0 else 0.0})
+
+    wall = time.time() - start
+    events = sum(f['events'] for f in files)
+    summary = {'events':events, 'seconds':wall, 'rate':events / wall if wall > 0 else 0.0,
+               'files':files}
+    return histos, summary
+
+def print_summary(summary):
+    for f in summary['files']:
+        print('{0:50s} {1:10d} events {2:8.2f} s {3:12.0f} events/s'.format(
+            os.path.basename(f['path']), f['events'], f['seconds'], f['rate']))
+    print('{0:50s} {1:10d} events {2:8.2f} s {3:12.0f} events/s'.format(
+        'total', summary['events'], summary['seconds'], summary['rate']))
+
+def write_output(histos, output):
+    """ To a ROOT file for .root, otherwise an array store directory. """
+    if output.endswith('.root'):
+        write_root(histos, output)
+    else:
+        write_histos([histos[name] for name in sorted(histos)], output)
+
+# The elastic histograms of event-selection.groovy, filled from
+# skims with the momenta of an electron and a proton (ele_px, ...,
+# pro_pz) and whether the proton is in the CTOF, see skim.py.
+beam_energy = 10.646
+
+def h1(bins, low, high):
+    return lambda title: ArrayHisto.uniform(title, [(bins, low, high)])
+
+elastic_builders = {
+    'w':h1(200, 0.6, 4.7),
+    'angle_ep':h1(200, 120, 180),
+    'theta_gamma':h1(200, 0, 35),
+    'missing_mass':h1(200, -1, 1)
+}
+
+elastic_cuts = {
+    'w':[0.8, 1.15],
+    'angle':[178, 180],
+    'theta_gamma':[0, 3]
+}
+
+def momenta(chunk, particle):
+    return np.stack([chunk[particle + '_px'], chunk[particle + '_py'], chunk[particle + '_pz']], axis=-1)
+
+def elastic_histos(chunk, histos):
+    kin = proton_kinematics(beam_energy, momenta(chunk, 'ele'), momenta(chunk, 'pro'))
+    ctof = chunk['ctof'].astype(bool)
+
+    pass_angle_ep = (kin['angle'] > elastic_cuts['angle'][0]) & (kin['angle'] < elastic_cuts['angle'][1])
+    pass_w_elastic = kin['w'] < elastic_cuts['w'][1]
+
+    for tof, in_tof in [('CTOF', ctof), ('FTOF', ~ctof)]:
+        histos.fill('w_' + tof, elastic_builders['w'], kin['w'][in_tof])
+        histos.fill('angle_ep_' + tof, elastic_builders['angle_ep'], kin['angle'][in_tof])
+        histos.fill('theta_gamma_' + tof, elastic_builders['theta_gamma'], kin['theta_gamma'][in_tof])
+        histos.fill('missing_mass_' + tof, elastic_builders['missing_mass'], kin['missing_mass'][in_tof])
+
+        passed = in_tof & pass_w_elastic
+        histos.fill('angle_ep_pass_w_elastic_' + tof, elastic_builders['angle_ep'], kin['angle'][passed])
+        passed = in_tof & pass_angle_ep
+        histos.fill('w_pass_angle_' + tof, elastic_builders['w'], kin['w'][passed])
+        histos.fill('theta_gamma_pass_angle_' + tof, elastic_builders['theta_gamma'], kin['theta_gamma'][passed])
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-i', '--file_list', default='../smallFiles.txt',
+                    help='Files to process, one per line, as for run.py')
+    ap.add_argument('-s', '--skim_dir', default='skims',
+                    help='Read the skim of each listed file from here, empty to read '
+                    'the listed files themselves')
+    ap.add_argument('-e', '--extension', default='.skim',
+                    help='Skim format, one of the readers')
+    ap.add_argument('-o', '--output', default='event-loop.root',
+                    help='ROOT file, or array store directory')
+    ap.add_argument('-j', '--jobs', default=16, type=int)
+    ap.add_argument('-c', '--chunk_size', default=100000, type=int,
+                    help='Events read and processed at a time')
+    ap.add_argument('-p', '--profile', action='store_true',
+                    help='Time the stages into <output>.profile.json and .folded')
+    args = ap.parse_args()
+
+    if args.profile:
+        stage_timers.enable()
+
+    paths = read_file_list(args.file_list)
+    if args.skim_dir:
+        paths = [skim_path(path, args.skim_dir, args.extension) for path in paths]
+
+    histos, summary = run(paths, elastic_histos, jobs=args.jobs, chunk_size=args.chunk_size)
+    print_summary(summary)
+
+    write_output(histos, args.output)
+    print('Saved: ', args.output)
+
+    if args.profile:
+        stage_timers.print_summary()
+        print('Profile: ', stage_timers.write_report(os.path.splitext(args.output)[0]))
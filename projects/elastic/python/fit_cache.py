@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+""" Memoization of slice fits, keyed by histogram content. """
+
+import errno
+import hashlib
+import json
+import os
+
+from collections import OrderedDict
+
+from histo_utils import histo_digest
+
+# Bump this when the fitting code changes, so that
+# old records on disk are not picked up.
+cache_version = 4
+
+class FitCache(object):
+    """ In-memory LRU of fit results with an optional on-disk store.
+
+    The memory side holds whatever the fitter returned (including
+    ROOT objects).  The disk side holds a plain json record per key,
+    one file each in cache_dir, which the caller knows how to turn
+    back into a result.
+    """
+
+    def __init__(self, maxsize=64, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, histo, *params):
+        """ Hash of the histogram content and the fit parameters. """
+        sha = hashlib.sha1()
+        sha.update('v{}'.format(cache_version).encode('utf-8'))
+        sha.update(histo_digest(histo).encode('utf-8'))
+        sha.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        return sha.hexdigest()
+
+    def get(self, key):
+        """ Result from memory, or None. """
+        if key not in self.entries:
+            return None
+
+        # Move to the most recently used end.
+        value = self.entries.pop(key)
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def load(self, key):
+        """ Record from disk, or None. """
+        path = self.record_path(key)
+        if path is None or not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        try:
+            with open(path) as record_file:
+                record = json.load(record_file)
+        except ValueError:
+            # Half-written file from an interrupted run.
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        return record
+
+    def has_record(self, key):
+        """ Whether load would find a record, without reading it. """
+        path = self.record_path(key)
+        return path is not None and os.path.exists(path)
+
+    def put(self, key, value, record=None):
+        """ Keep value in memory and, if given, record on disk. """
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+        path = self.record_path(key)
+        if record is not None and path is not None:
+            # Another worker may create it between a check and makedirs.
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+
+            # Write then rename, parallel runs may share the directory.
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            with open(tmp_path, 'w') as record_file:
+                json.dump(record, record_file)
+            os.rename(tmp_path, path)
+
+    def record_path(self, key):
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+""" Gaussian fits to a whole stack of binned distributions at once. """
+
+from collections import namedtuple
+
+import numpy as np
+
+# Status codes of each fit.
+status_ok = 0
+status_not_converged = 1
+status_empty = 2
+
+# Every field has the shape of the input minus its last (bin) axis.
+GausFit = namedtuple('GausFit', ['amplitude', 'mu', 'sigma',
+                                 'amplitude_err', 'mu_err', 'sigma_err',
+                                 'chi2', 'ndf', 'chi2_ndf', 'status'])
+
+def gaussian(x, amplitude, mu, sigma):
+    """ Same parameterization as ROOT's gaus. """
+    return amplitude * np.exp(-0.5 * ((x - mu) / sigma)**2)
+
+def moments(x, y, weights):
+    """ Starting values from the counts: peak height, mean and standard
+    deviation of x weighted by the (positive) content. """
+
+    counts = np.where(weights > 0, np.clip(y, 0, None), 0.0)
+    total = counts.sum(axis=-1)
+    safe_total = np.where(total > 0, total, 1.0)
+
+    mu = np.sum(counts * x, axis=-1) / safe_total
+    var = np.sum(counts * (x - mu[..., None])**2, axis=-1) / safe_total
+    amplitude = counts.max(axis=-1)
+
+    # A single filled bin has no spread, start from a bin width.
+    width = np.abs(np.diff(x, axis=-1)).max(axis=-1) if x.shape[-1] > 1 else np.ones_like(mu)
+    sigma = np.sqrt(np.where(var > 0, var, width**2))
+    return np.stack([amplitude, mu, sigma], axis=-1)
+
+def estimate_gaussians(x, y, err=None, fit_range=None, peak_fraction=0.25,
+                       min_points=4, min_peak=20.0, max_chi2_ndf=2.0):
+    """ Closed form gaussian parameters of every distribution in y,
+    with x, y, err and fit_range as for fit_gaussians.
+
+    Around its highest bin the log of a gaussian is a parabola, so a
+    weighted least squares parabola through ln(y) over the peak (the
+    contiguous bins above peak_fraction of the maximum) gives the
+    parameters directly (Caruana's method).  Each ln(y) is weighted
+    by (y / err)**2, the inverse of its variance.
+
+    Returns (p, good): p has shape (..., 3) holding (amplitude, mu,
+    sigma), nan where there was no parabola, and good says where the
+    estimate can stand in for a fit.  That is, a peak of at least
+    min_peak counts over min_points bins or more, opening downwards,
+    with mu among the bins used and a chi2/ndf over those bins of at
+    most max_chi2_ndf.
+    """
+
+    y = np.asarray(y, dtype=np.float64)
+    x = np.broadcast_to(np.asarray(x, dtype=np.float64), y.shape)
+
+    if err is None:
+        err = np.sqrt(np.abs(y))
+    err = np.broadcast_to(np.asarray(err, dtype=np.float64), y.shape)
+
+    use = err > 0
+    if fit_range is not None:
+        use = use & (x >= fit_range[0]) & (x <= fit_range[1])
+
+    # The peak region, the run of high bins around the maximum.
+    counts = np.where(use, y, -np.inf)
+    top = np.argmax(counts, axis=-1)[..., None]
+    peak = np.take_along_axis(counts, top, axis=-1)
+    index = np.arange(y.shape[-1])
+    low = ~(counts >= peak_fraction * peak) | ~(y > 0)
+    left = np.where(low & (index < top), index, -1).max(axis=-1)[..., None]
+    right = np.where(low & (index > top), index, y.shape[-1]).min(axis=-1)[..., None]
+    region = (index > left) & (index < right) & (y > 0)
+
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        w = np.where(region, (y / np.where(use, err, 1.0))**2, 0.0)
+        log_y = np.where(region, np.log(np.where(region, y, 1.0)), 0.0)
+
+        # Centered and scaled for well conditioned normal equations.
+        total = np.maximum(w.sum(axis=-1), 1e-300)[..., None]
+        x0 = np.sum(w * x, axis=-1)[..., None] / total
+        scale = np.sqrt(np.sum(w * (x - x0)**2, axis=-1))[..., None] / np.sqrt(total)
+        scale = np.where(scale > 0, scale, 1.0)
+        u = (x - x0) / scale
+
+        powers = np.stack([np.ones_like(u), u, u**2], axis=-1)
+        a = np.einsum('...ki,...k,...kj->...ij', powers, w, powers)
+        b = np.einsum('...ki,...k->...i', powers, w * log_y)
+        npoints = region.sum(axis=-1)
+        a[npoints < 3] = np.eye(3)
+        coef = solve(a, b)
+
+        c0, c1, c2 = coef[..., 0], coef[..., 1], coef[..., 2]
+        mu = x0[..., 0] - scale[..., 0] * c1 / (2.0 * c2)
+        sigma = scale[..., 0] * np.sqrt(-0.5 / c2)
+        amplitude = np.exp(c0 - c1**2 / (4.0 * c2))
+
+        p = np.stack([amplitude, mu, sigma], axis=-1)
+        p[(npoints < 3) | ~(c2 < 0)] = np.nan
+
+        # The gate: how well the gaussian follows the counts of the
+        # bins it came from.  Tails and background are left to the fits.
+        weights = np.where(region, 1.0 / np.where(use, err, 1.0)**2, 0.0)
+        model = gaussian(x, p[..., 0:1], p[..., 1:2], p[..., 2:3])
+        chi2 = np.sum(weights * (y - model)**2, axis=-1)
+        ndf = npoints - 3
+
+        good = (np.all(np.isfinite(p), axis=-1) & (npoints >= min_points)
+                & (peak[..., 0] >= min_peak) & (ndf > 0)
+                & (mu >= np.where(region, x, np.inf).min(axis=-1))
+                & (mu <= np.where(region, x, -np.inf).max(axis=-1))
+                & (chi2 <= max_chi2_ndf * np.maximum(ndf, 1)))
+
+    return p, good
+
+def jacobian(x, p):
+    """ Model value and derivatives with respect to (amplitude, mu, sigma). """
+
+    amplitude, mu, sigma = p[..., 0:1], p[..., 1:2], p[..., 2:3]
+    z = (x - mu) / sigma
+    g = np.exp(-0.5 * z**2)
+    f = amplitude * g
+    jac = np.stack([g, f * z / sigma, f * z**2 / sigma], axis=-1)
+    return f, jac
+
+def solve(a, b):
+    """ Batched a x = b for 3x3 systems, tolerating singular members. """
+    try:
+        return np.linalg.solve(a, b[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        return np.einsum('...ij,...j->...i', np.linalg.pinv(a), b)
+
+def fit_gaussians(x, y, err=None, fit_range=None, p0=None, fixed=None,
+                  max_iter=200, tol=1e-7, min_points=4):
+    """ Chi2 fit of a gaussian to every distribution in y.
+
+    y has shape (..., nbins), for example (sectors, slices, nbins),
+    and x holds the bin centers, either (nbins,) or the shape of y.
+    err defaults to sqrt(y).  Like ROOT, bins with zero error are
+    left out of the fit, and only bins with center inside
+    fit_range = (low, high) are used, low and high being numbers or
+    shaped (..., 1) for a range per fit.
+
+    All fits are advanced together with Levenberg-Marquardt steps,
+    each one keeping its own damping and stopping on its own once its
+    chi2 stops improving.  Fits with fewer than min_points usable bins
+    are not attempted and come back as nan with status_empty.  Fits
+    that stall, or end with mu outside fit_range, get
+    status_not_converged.
+
+    Where fixed (shaped like y without its last axis) is set, p0 is
+    taken as the answer, only its errors and chi2 are worked out.
+    """
+
+    y = np.asarray(y, dtype=np.float64)
+    x = np.broadcast_to(np.asarray(x, dtype=np.float64), y.shape)
+
+    if err is None:
+        err = np.sqrt(np.abs(y))
+    err = np.broadcast_to(np.asarray(err, dtype=np.float64), y.shape)
+
+    use = err > 0
+    if fit_range is not None:
+        use = use & (x >= fit_range[0]) & (x <= fit_range[1])
+    weights = np.where(use, 1.0 / np.where(use, err, 1.0)**2, 0.0)
+
+    npoints = use.sum(axis=-1)
+    empty = (npoints < min_points) | (np.where(use, y, 0).sum(axis=-1) <= 0)
+
+    if p0 is None:
+        p = moments(x, y, weights)
+    else:
+        p = np.array(np.broadcast_to(p0, y.shape[:-1] + (3,)), dtype=np.float64)
+    p[empty] = [1.0, 0.0, 1.0]
+
+    # Work on a flat (fits, bins) view from here on.
+    batch_shape = y.shape[:-1]
+    nbins = y.shape[-1]
+    x, y, weights = [a.reshape(-1, nbins) for a in (x, y, weights)]
+    p, empty = p.reshape(-1, 3), empty.reshape(-1)
+
+    def chi2_of(params, idx):
+        model = gaussian(x[idx], params[:, 0:1], params[:, 1:2], params[:, 2:3])
+        return np.sum(weights[idx] * (y[idx] - model)**2, axis=-1)
+
+    lam = np.full(len(p), 1e-3)
+    chi2 = chi2_of(p, np.arange(len(p)))
+    converged = np.zeros(len(p), dtype=bool)
+    if fixed is not None:
+        fixed = np.broadcast_to(fixed, batch_shape).reshape(-1) & ~empty
+        converged[fixed] = True
+        empty_or_fixed = empty | fixed
+    else:
+        empty_or_fixed = empty
+    active = np.flatnonzero(~empty_or_fixed)
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for iteration in range(max_iter):
+            if len(active) == 0:
+                break
+
+            # Only the fits still running take part in the step.
+            w = weights[active]
+            f, jac = jacobian(x[active], p[active])
+            jtj = np.einsum('nki,nk,nkj->nij', jac, w, jac)
+            jtr = np.einsum('nki,nk->ni', jac, w * (y[active] - f))
+
+            diag = np.einsum('nii->ni', jtj)
+            damped = jtj + (lam[active, None] * diag + 1e-12)[..., None] * np.eye(3)
+
+            trial = p[active] + solve(damped, jtr)
+            trial_chi2 = chi2_of(trial, active)
+            better = np.isfinite(trial_chi2) & (trial_chi2 <= chi2[active])
+            change = np.abs(chi2[active] - trial_chi2) / np.maximum(chi2[active], 1e-300)
+
+            accepted = active[better]
+            p[accepted] = trial[better]
+            chi2[accepted] = trial_chi2[better]
+            lam[active] = np.clip(np.where(better, lam[active] * 0.1, lam[active] * 10.0), 1e-12, 1e12)
+
+            # Converged when an accepted step barely moves chi2.  A fit
+            # whose damping reached its ceiling has stalled, it stops
+            # without converging.
+            done = better & (change < tol)
+            stalled = ~done & (lam[active] >= 1e12)
+            converged[active[done]] = True
+            active = active[~(done | stalled)]
+
+        # Uncertainties from the curvature at the minimum, as MIGRAD
+        # reports them for a chi2 fit (no chi2/ndf scaling).
+        f, jac = jacobian(x, p)
+        jtj = np.einsum('nki,nk,nkj->nij', jac, weights, jac)
+        jtj[empty] = np.eye(3)
+        cov = np.linalg.pinv(jtj)
+        errors = np.sqrt(np.abs(np.einsum('nii->ni', cov)))
+
+    p[:, 2] = np.abs(p[:, 2])
+    p[empty] = np.nan
+    errors[empty] = np.nan
+    chi2[empty] = np.nan
+
+    # A peak outside the fit range is not a fit of the data in it.
+    if fit_range is not None:
+        low, high = [np.broadcast_to(np.asarray(bound, dtype=np.float64), batch_shape + (1,)).reshape(-1)
+                     for bound in fit_range]
+        with np.errstate(invalid='ignore'):
+            converged &= (p[:, 1] >= low) & (p[:, 1] <= high)
+
+    status = np.where(converged, status_ok, status_not_converged)
+    status[empty] = status_empty
+
+    p = p.reshape(batch_shape + (3,))
+    errors = errors.reshape(batch_shape + (3,))
+    chi2 = chi2.reshape(batch_shape)
+    status = status.reshape(batch_shape)
+
+    ndf = npoints - 3
+    with np.errstate(invalid='ignore', divide='ignore'):
+        chi2_ndf = np.where(ndf > 0, chi2 / np.maximum(ndf, 1), np.nan)
+
+    return GausFit(p[..., 0], p[..., 1], p[..., 2],
+                   errors[..., 0], errors[..., 1], errors[..., 2],
+                   chi2, ndf, chi2_ndf, status)
+
+def fast_fit_gaussians(x, y, err=None, fit_range=None, max_chi2_ndf=2.0, **gate):
+    """ fit_gaussians, the closed form estimate (estimate_gaussians,
+    gate options as there) being the answer wherever it passes the
+    gate and still has a chi2/ndf of at most max_chi2_ndf over the
+    whole fit range.  Elsewhere the fit starts from the estimate, or
+    from the moments of y if that has no peak in the range.  Same
+    results every run. """
+
+    y = np.asarray(y, dtype=np.float64)
+    p0, good = estimate_gaussians(x, y, err, fit_range=fit_range, max_chi2_ndf=max_chi2_ndf, **gate)
+
+    x = np.broadcast_to(np.asarray(x, dtype=np.float64), y.shape)
+    use = np.abs(y) > 0 if err is None else np.asarray(err) > 0
+    if fit_range is not None:
+        use = use & (x >= fit_range[0]) & (x <= fit_range[1])
+
+    with np.errstate(invalid='ignore'):
+        inside = ((p0[..., 1] >= np.where(use, x, np.inf).min(axis=-1))
+                  & (p0[..., 1] <= np.where(use, x, -np.inf).max(axis=-1)))
+    seeded = np.all(np.isfinite(p0), axis=-1) & inside
+    p0 = np.where(seeded[..., None], p0, moments(x, y, use.astype(np.float64)))
+
+    fit = fit_gaussians(x, y, err, fit_range=fit_range, p0=p0, fixed=good)
+
+    # The gate only saw the peak, the tails can still disagree.
+    with np.errstate(invalid='ignore'):
+        refit = good & ~(fit.chi2_ndf <= max_chi2_ndf)
+    if np.any(refit):
+        fit = fit_gaussians(x, y, err, fit_range=fit_range, p0=p0, fixed=good & ~refit)
+    return fit
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+
+""" Histograms of a ROOT file written once into a flat array store,
+then memory-mapped by the plotting scripts.
+
+A store is a directory holding data.npy, every array of every
+histogram back to back as float64, and index.json with the name,
+class, title, shape, offsets and content digest (histo_digest) of
+each histogram.  Reading it needs
+numpy only, ROOT is imported just to write one.  Objects that are not
+plain histograms (TProfiles, graphs, ...) are not stored, the index
+lists their names under 'skipped' so that readers can take them from
+the ROOT file instead.
+
+    python histo_store.py -i=es-rga.root -o=.stores/es-rga
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+from collections import OrderedDict, namedtuple
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+import numpy as np
+
+from histo_utils import axis_edges, bin_buffers, histo_digest
+
+# Bump when the layout changes, old stores are then rewritten.
+store_version = 3
+
+def source_stamp(path):
+    """ What a store remembers of the file it was written from. """
+    stat = os.stat(path)
+    return {'path':os.path.abspath(path), 'size':stat.st_size,
+            'mtime':stat.st_mtime, 'version':store_version}
+
+# What write_histos needs of a histogram, the same as a StoredHisto.
+HistoArrays = namedtuple('HistoArrays', ['name', 'class_name', 'title', 'entries', 'has_sumw2',
+                                         'digest', 'edges', 'values', 'sumw2'])
+
+def root_histos(rootfile, skipped=None):
+    """ HistoArrays of every TH1/TH2/TH3 of an open TFile, the
+    arrays being views on the histograms.  Other objects (and
+    TProfiles) are skipped, their names added to skipped. """
+
+    names = set()
+    for k in rootfile.GetListOfKeys():
+        name = k.GetName()
+        if name in names:
+            continue
+
+        names.add(name)
+        histo = rootfile.Get(name)
+        try:
+            values, sumw2 = bin_buffers(histo)
+        except (NotImplementedError, AttributeError):
+            print('Not storing {} ({}), not a TH1/TH2/TH3'.format(name, k.GetClassName()))
+            if skipped is not None:
+                skipped.append(name)
+            continue
+
+        axes = [histo.GetXaxis(), histo.GetYaxis(), histo.GetZaxis()][:values.ndim]
+        yield HistoArrays(name, histo.ClassName(), histo.GetTitle(), histo.GetEntries(),
+                          histo.GetSumw2N() > 0, histo_digest(histo),
+                          [axis_edges(axis) for axis in axes], values, sumw2)
+
+def write_store(rootfile, store_dir, stamp=None):
+    """ Write every histogram of an open TFile to store_dir. """
+    skipped = []
+    write_histos(root_histos(rootfile, skipped), store_dir, stamp, skipped)
+
+def write_histos(histos, store_dir, stamp=None, skipped=()):
+    """ Write histograms (HistoArrays, StoredHisto or ArrayHisto) to
+    store_dir, the first of each name.  skipped names the objects of
+    the source that are not in the store. """
+
+    index = OrderedDict()
+    arrays = []
+    offset = 0
+
+    for histo in histos:
+        if histo.name in index:
+            continue
+
+        entry = {
+            'class':histo.class_name,
+            'title':histo.title,
+            'entries':histo.entries,
+            'shape':list(histo.values.shape),
+            'sumw2':bool(histo.has_sumw2),
+            'digest':histo.digest
+        }
+
+        # Edges of each axis, then contents and sumw2 in ROOT
+        # (x fastest) order so they reshape like bin_buffers.
+        parts = list(histo.edges)
+        parts += [histo.values.T.ravel(), histo.sumw2.T.ravel()]
+
+        entry['offsets'] = []
+        for part in parts:
+            entry['offsets'].append([offset, len(part)])
+            arrays.append(np.asarray(part, dtype=np.float64))
+            offset += len(part)
+
+        index[histo.name] = entry
+
+    # Write next to the target and swap in, so that readers
+    # never see half a store.
+    tmp_dir = '{}.{}.tmp'.format(store_dir.rstrip('/'), os.getpid())
+    if os.path.isdir(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    data = np.concatenate(arrays) if arrays else np.zeros(0)
+    np.save(os.path.join(tmp_dir, 'data.npy'), data)
+    with open(os.path.join(tmp_dir, 'index.json'), 'w') as index_file:
+        json.dump({'source':stamp, 'histos':index, 'skipped':list(skipped)}, index_file)
+
+    swap_dir(tmp_dir, store_dir)
+
+def swap_dir(tmp_dir, target):
+    """ Put the directory tmp_dir in place of target.  A directory
+    cannot be renamed over another, so the old one is renamed aside
+    first and deleted after: readers see the old or the new one, or
+    for a moment none, never a mix. """
+    old_dir = '{}.{}.old'.format(target.rstrip('/'), os.getpid())
+    if os.path.isdir(old_dir):
+        shutil.rmtree(old_dir)
+    try:
+        os.rename(target, old_dir)
+    except OSError:
+        # Not there yet, or another run moved it first.
+        pass
+
+    try:
+        os.rename(tmp_dir, target)
+    except OSError:
+        # Another run wrote it in the meantime.
+        shutil.rmtree(tmp_dir)
+
+    if os.path.isdir(old_dir):
+        shutil.rmtree(old_dir)
+
+def store_is_current(store_dir, path):
+    """ Whether store_dir was written from the file at path as it is now. """
+    index_path = os.path.join(store_dir, 'index.json')
+    if not os.path.exists(index_path):
+        return False
+
+    try:
+        with open(index_path) as index_file:
+            source = json.load(index_file)['source']
+    except (ValueError, KeyError):
+        return False
+
+    return source == source_stamp(path)
+
+def convert(path, store_dir):
+    """ Write the store for the ROOT file at path, unless up to date. """
+    if store_is_current(store_dir, path):
+        return
+
+    from ROOT import TFile
+    rootfile = TFile(path)
+    write_store(rootfile, store_dir, stamp=source_stamp(path))
+    rootfile.Close()
+
+class StoredHisto(object):
+    """ One histogram of a store, its arrays are views on the map. """
+
+    def __init__(self, name, entry, data):
+        self.name = name
+        self.class_name = entry['class']
+        self.title = entry['title']
+        self.entries = entry['entries']
+        self.has_sumw2 = entry['sumw2']
+        self.digest = entry['digest']
+
+        shape = entry['shape']
+        parts = [data[start:start + size] for start, size in entry['offsets']]
+        self.edges = parts[:len(shape)]
+        self.values = parts[-2].reshape(shape[::-1]).T
+        self.sumw2 = parts[-1].reshape(shape[::-1]).T
+
+    def numpify(self):
+        """ Same arrays as histo_utils.numpify of the original. """
+        dim = self.values.ndim
+        inner = tuple([slice(1, -1)] * dim)
+        values = self.values[inner]
+        errors = np.sqrt(self.sumw2[inner])
+
+        if dim == 1:
+            return self.edges[0][:-1], self.edges[0][1:], values, errors
+
+        return tuple(self.edges) + (values, errors)
+
+class HistoStore(Mapping):
+    """ Read-only mapping from name to StoredHisto.  The data is
+    mapped once, nothing is read until a histogram is used. """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'index.json')) as index_file:
+            contents = json.load(index_file, object_pairs_hook=OrderedDict)
+        self.index = contents['histos']
+        self.skipped = contents.get('skipped', [])
+        self.data = np.load(os.path.join(store_dir, 'data.npy'), mmap_mode='r')
+
+    def __getitem__(self, name):
+        return StoredHisto(name, self.index[name], self.data)
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def keys(self):
+        return list(self.index)
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-i', '--input_file', required=True)
+    ap.add_argument('-o', '--output_dir', required=True)
+    args = ap.parse_args()
+
+    convert(args.input_file, args.output_dir)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+""" Shared helpers for turning ROOT histograms into numpy arrays. """
+
+import hashlib
+import numpy as np
+
+# Storage type of the bin buffer, keyed on the last
+# letter of the class name (TH1F, TH2D, ...).
+buffer_dtypes = {
+    'C':np.int8,
+    'S':np.int16,
+    'I':np.int32,
+    'F':np.float32,
+    'D':np.float64
+}
+
+def wrap_buffer(buf, size, dtype):
+    """ View a PyROOT pointer buffer of known size as a numpy array,
+    without copying. """
+
+    # Old PyROOT buffers have no length until told, the
+    # cppyy ones (ROOT >= 6.22) are resized with reshape.
+    if hasattr(buf, 'reshape'):
+        buf.reshape((size,))
+    else:
+        buf.SetSize(size)
+
+    return np.frombuffer(buf, dtype=dtype, count=size)
+
+def axis_edges(axis):
+    """ Bin edges of a TAxis (length nbins + 1), computed once. """
+
+    nbins = axis.GetNbins()
+
+    # Variable binning keeps the edges in a TArrayD.
+    if axis.GetXbins().GetSize() > 0:
+        return wrap_buffer(axis.GetXbins().GetArray(), nbins + 1, np.float64)
+
+    return np.linspace(axis.GetXmin(), axis.GetXmax(), nbins + 1)
+
+def bin_buffers(histo):
+    """ Contents and sum of squared weights of every cell (flow
+    bins included), shaped (nx+2, ny+2, nz+2) for TH3 and
+    similarly for TH1/TH2.  The contents are a view on the
+    histogram memory, so writing to them changes the histogram. """
+
+    class_name = histo.ClassName()
+    if not histo.InheritsFrom('TH1') or class_name.startswith('TProfile') \
+       or class_name[-1] not in buffer_dtypes:
+        raise NotImplementedError('Can not numpify type {}'.format(class_name))
+
+    dim = histo.GetDimension()
+    ncells = histo.GetNcells()
+    values = wrap_buffer(histo.GetArray(), ncells, buffer_dtypes[class_name[-1]])
+
+    if histo.GetSumw2N() > 0:
+        sumw2 = wrap_buffer(histo.GetSumw2().GetArray(), ncells, np.float64)
+    else:
+        sumw2 = np.abs(values)
+
+    # ROOT stores global bin = x + (nx+2) * (y + (ny+2) * z),
+    # so x runs fastest.  Reverse the shape then transpose.
+    shape = [histo.GetNbinsX() + 2, histo.GetNbinsY() + 2, histo.GetNbinsZ() + 2][:dim]
+    values = values.reshape(shape[::-1]).T
+    sumw2 = sumw2.reshape(shape[::-1]).T
+
+    return values, sumw2
+
+def numpify(histo):
+    """ TH1, TH2 or TH3 to np.arrays, without per-bin calls.
+
+    TH1 returns x_lows, x_highs, values, errors.
+    TH2 returns x_edges, y_edges, values, errors with values[ix, iy].
+    TH3 returns x_edges, y_edges, z_edges, values, errors.
+
+    The under and overflow bins are dropped.  values is a view on
+    the histogram contents, errors are sqrt(sumw2) like GetBinError.
+    """
+
+    values, sumw2 = bin_buffers(histo)
+    dim = values.ndim
+
+    inner = tuple([slice(1, -1)] * dim)
+    values = values[inner]
+    errors = np.sqrt(sumw2[inner])
+
+    axes = [histo.GetXaxis(), histo.GetYaxis(), histo.GetZaxis()][:dim]
+    edges = [axis_edges(axis) for axis in axes]
+
+    if dim == 1:
+        return edges[0][:-1], edges[0][1:], values, errors
+
+    return tuple(edges) + (values, errors)
+
+def histo_digest(histo):
+    """ Content hash of a histogram: binning, contents and
+    errors (flow bins included), but not its name or style. """
+
+    values, sumw2 = bin_buffers(histo)
+    axes = [histo.GetXaxis(), histo.GetYaxis(), histo.GetZaxis()][:values.ndim]
+    return array_digest(histo.ClassName(), [axis_edges(axis) for axis in axes], values, sumw2)
+
+def array_digest(class_name, edges, values, sumw2):
+    """ histo_digest of a histogram given as arrays, flow bins included. """
+
+    sha = hashlib.sha1()
+    sha.update(class_name.encode('utf-8'))
+    for bins in edges:
+        sha.update(np.ascontiguousarray(bins, dtype=np.float64).tobytes())
+    sha.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    sha.update(np.ascontiguousarray(sumw2, dtype=np.float64).tobytes())
+    return sha.hexdigest()
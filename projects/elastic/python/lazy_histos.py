@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+""" Read-on-demand access to the objects of a ROOT file, or of
+the array store written from it (see histo_store.py). """
+
+import os
+
+from array import array
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+import ROOT
+from ROOT import TFile, SetOwnership
+
+from histo_store import HistoStore, convert
+from histo_utils import bin_buffers, histo_digest
+from stage_timers import count, stage
+
+def open_histos(path, store_dir=None, keep=True):
+    """ LazyHistos of the ROOT file at path.  With a store_dir, the
+    file is converted there once and read back from the store. """
+    with stage('open_histos'):
+        if store_dir is None:
+            return LazyHistos(TFile(path), keep=keep)
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        store_path = os.path.join(store_dir, name)
+        convert(path, store_path)
+        return StoreHistos(HistoStore(store_path), keep=keep, path=path)
+
+def build_histo(stored):
+    """ ROOT histogram of the same class, binning and contents
+    as a StoredHisto. """
+
+    binning = []
+    for edges in stored.edges:
+        binning += [len(edges) - 1, array('d', edges)]
+
+    histo = getattr(ROOT, stored.class_name)(stored.name, stored.title, *binning)
+    histo.SetDirectory(0)
+    if stored.has_sumw2:
+        histo.Sumw2()
+
+    values, sumw2 = bin_buffers(histo)
+    values[...] = stored.values
+    if stored.has_sumw2:
+        sumw2[...] = stored.sumw2
+
+    histo.ResetStats()
+    histo.SetEntries(stored.entries)
+    return histo
+
+class LazyHistos(Mapping):
+    """ Dictionary of the objects in a ROOT file, keyed by name.
+
+    Only the key names are read up front, an object is read from
+    the file the first time it is asked for.  Iterating gives the
+    names without reading anything, but values() and items() read
+    every object, like the old load_histos did.
+
+    With keep=False, release() deletes the histograms read since
+    the last release, which the page executor (plot_jobs) does once
+    a page has been printed, keeping those later pages still draw.
+    Asking for one again reads it again.
+    """
+
+    def __init__(self, file, keep=True):
+        self.file = file
+        self.keep = keep
+        self.objects = {}
+        self.digests = {}
+
+        # A name appears once per cycle, Get gives the latest.
+        self.names = []
+        self.name_set = set()
+        for k in file.GetListOfKeys():
+            name = k.GetName()
+            if name not in self.name_set:
+                self.name_set.add(name)
+                self.names.append(name)
+
+    def __getitem__(self, name):
+        if name not in self.objects:
+            if name not in self:
+                raise KeyError(name)
+            with stage('load_histos'):
+                self.objects[name] = self.read(name)
+                count('histos')
+        return self.objects[name]
+
+    def read(self, name):
+        return self.file.Get(name)
+
+    def digest(self, name):
+        """ histo_digest of a histogram as read from the file. """
+        if name not in self.digests:
+            self.digests[name] = histo_digest(self[name])
+        return self.digests[name]
+
+    def __contains__(self, name):
+        return name in self.name_set
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def release(self, needed=()):
+        """ Forget the objects read so far but those named in needed,
+        unless keeping them all. """
+        if self.keep:
+            return
+
+        for name in [name for name in self.objects if name not in needed]:
+            obj = self.objects.pop(name)
+            # Histograms belong to the file, hand them to python
+            # so that dropping the reference deletes them.  ROOT
+            # takes them off any pad they were drawn on.
+            if obj and obj.InheritsFrom('TH1'):
+                obj.SetDirectory(0)
+                SetOwnership(obj, True)
+
+class StoreHistos(LazyHistos):
+    """ LazyHistos backed by a HistoStore, each histogram is built
+    from the mapped arrays on first access.  The objects the store
+    skipped are read from the ROOT file at path, opened when first
+    needed, so the keys are the same as those of the file. """
+
+    def __init__(self, store, keep=True, path=None):
+        self.file = store
+        self.keep = keep
+        self.objects = {}
+        self.digests = {}
+        self.path = path
+        self.rootfile = None
+        self.names = store.keys()
+        if path is not None:
+            self.names += store.skipped
+        self.name_set = set(self.names)
+
+    def read(self, name):
+        if name in self.file:
+            return build_histo(self.file[name])
+
+        if self.rootfile is None:
+            self.rootfile = TFile(self.path)
+        return self.rootfile.Get(name)
+
+    def digest(self, name):
+        if name not in self.file:
+            return LazyHistos.digest(self, name)
+
+        # Worked out when the store was written.
+        return self.file[name].digest
@@ -10,20 +10,20 @@ matplotlib.use('agg')
 import matplotlib.pyplot as plt 
 
 from array import array 
-from ROOT import (TH1F, TH2F, TF1, TFile, TCanvas,
+from ROOT import (TH1F, TH2F, TF1, TCanvas,
                   gPad, gStyle, TLatex, TGraphErrors,
                   TLine)
 
+from build_state import BuildState, build_sources
+from lazy_histos import open_histos
+from plot_jobs import page_options, run_pages, run_pdf
+from slice_projector import SliceProjector
+import stage_timers
+from stage_timers import count, stage
+
 default_histo = TH1F('default', '', 100, 0, 1)
 default_histo2d = TH2F('default', '', 100, 0, 1, 100, 0, 1)
 
-def load_histos(file):
-    ''' Use the ROOT file structure to load a dictionary of histograms. '''
-    h = {}
-    for k in file.GetListOfKeys():
-        h[k.GetName()] = file.Get(k.GetName())
-    return h
-
 def setup_global_options():
     gStyle.SetOptTitle(0)
     gStyle.SetOptStat(0)
@@ -99,7 +99,8 @@ def plot_sector_page(canvas, histos, title_formatter, label, save_name,
             label.DrawLatex(0.04, 0.5, ytitle)
             label.SetTextAngle(0)
 
-    canvas.Print(save_name)
+    with stage('print'):
+        canvas.Print(save_name)
 
 def plot_page(canvas, histos, histo_title, label, save_name,
                      xtitle=None, ytitle=None, title=None, log=False):
@@ -127,50 +128,61 @@ def plot_page(canvas, histos, histo_title, label, save_name,
         label.DrawLatex(0.04, 0.5, ytitle)
         label.SetTextAngle(0)
 
-    canvas.Print(save_name)
+    with stage('print'):
+        canvas.Print(save_name)
 
 
-def fit_slices(histo, x_range, x_bin_step, y_fit_range):
+def fit_slices(histo, x_range, x_bin_step, y_fit_range, slice_entries=None):
+    """ Slices of x_bin_step x-bins, or of about slice_entries entries each. """
 
+    projector = SliceProjector.from_histo(histo)
     x_start = histo.GetXaxis().FindBin(x_range[0])
     x_stop =  histo.GetXaxis().FindBin(x_range[1])
 
+    if slice_entries:
+        x_firsts, x_lasts, _, _ = projector.adaptive_slices(x_range, slice_entries, y_range=y_fit_range)
+    else:
+        x_firsts = np.arange(x_start, x_stop + 1, x_bin_step)
+        x_lasts = x_firsts + x_bin_step
+
     x_values = array('d')
+    x_errors = array('d')
     slices = []
     fits = []
-    for i, x_bin in enumerate(range(x_start, x_stop + 1, x_bin_step)):
-        projec = histo.ProjectionY(histo.GetTitle() + '_proj{}'.format(i) , x_bin, x_bin + x_bin_step)
+    with stage('fit_slices'):
+        for i, (x_bin, x_last) in enumerate(zip(x_firsts, x_lasts)):
+            projec = projector.histogram(histo.GetTitle() + '_proj{}'.format(i), x_bin, x_last, histo.GetTitle())
 
-        fit = TF1(histo.GetTitle() + '_fit{}'.format(i), 'gaus')
-        fit.SetTitle(histo.GetTitle() + '_fit{}'.format(i))
-        fit.SetName(histo.GetTitle() + '_fit{}'.format(i))
+            fit = TF1(histo.GetTitle() + '_fit{}'.format(i), 'gaus')
+            fit.SetTitle(histo.GetTitle() + '_fit{}'.format(i))
+            fit.SetName(histo.GetTitle() + '_fit{}'.format(i))
 
-        if y_fit_range:
-            fit.SetParameter(1, 0.5 * (y_fit_range[0] + y_fit_range[1]))
+            if y_fit_range:
+                fit.SetParameter(1, 0.5 * (y_fit_range[0] + y_fit_range[1]))
  
-        projec.Fit(fit, 'R', '',  y_fit_range[0], y_fit_range[1])
+            projec.Fit(fit, 'R', '',  y_fit_range[0], y_fit_range[1])
 
-        slices.append(projec)
-        fits.append(fit)
+            slices.append(projec)
+            fits.append(fit)
 
-        x_low = histo.GetXaxis().GetBinCenter(x_bin)
-        x_high = histo.GetXaxis().GetBinCenter(x_bin + x_bin_step)
-        x_values.append(0.5 * (x_high + x_low))
+            x_low = histo.GetXaxis().GetBinCenter(int(x_bin))
+            x_high = histo.GetXaxis().GetBinCenter(int(x_last))
+            x_values.append(0.5 * (x_high + x_low))
+            x_errors.append(0.5 * (x_high - x_low) if slice_entries else 0.0)
+        count('fits', len(fits))
 
     means = array('d')
     means_err = array('d')
     stds = array('d')
     stds_err = array('d')
-    zeros = array('d')
 
     for f in fits:
         means.append(f.GetParameter(1))
         means_err.append(f.GetParError(1))
         stds.append(f.GetParameter(2))
         stds_err.append(f.GetParError(2))
-        zeros.append(0.0)
 
-    graph = TGraphErrors(len(x_values), x_values, means, zeros, stds)
+    graph = TGraphErrors(len(x_values), x_values, means, x_errors, stds)
     graph.SetName('g_' + histo.GetName())
 
     return graph, slices, fits
@@ -179,7 +191,8 @@ def fit_slices(histo, x_range, x_bin_step, y_fit_range):
  
 def plot_fits(canvas, histos, x_range, x_bin_step, title_formatter,
               save_name, label, y_fit_range, y_range=None,
-              title=None, xtitle=None, ytitle=None, hline=None):
+              title=None, xtitle=None, ytitle=None, hline=None,
+              slice_entries=None):
 
     canvas.Clear()
     canvas.Divide(2,3)
@@ -189,7 +202,8 @@ def plot_fits(canvas, histos, x_range, x_bin_step, title_formatter,
         canvas.cd(i)
 
         title = title_formatter.format(i)
-        graph, slices, fits = fit_slices(histos.get(title, default_histo2d), x_range, x_bin_step, y_fit_range=y_fit_range)
+        graph, slices, fits = fit_slices(histos.get(title, default_histo2d), x_range, x_bin_step,
+                                          y_fit_range=y_fit_range, slice_entries=slice_entries)
         graph.SetMarkerStyle(8)
         graph.SetMarkerSize(1)
         
@@ -220,15 +234,18 @@ def plot_fits(canvas, histos, x_range, x_bin_step, title_formatter,
             label.DrawLatex(0.035, 0.5, ytitle)
             label.SetTextAngle(0)
 
-    canvas.Print(save_name)
+    with stage('print'):
+        canvas.Print(save_name)
 
     # For the slices 
     slice_can = TCanvas('slice_can', 'slice_can', 1200, 1600)
     slice_pdfname = title_formatter.split('_{}')[0] + '_slices.pdf'
-    slice_can.Print(slice_pdfname + '[')
+    with stage('print'):
+        slice_can.Print(slice_pdfname + '[')
     for i in range(1,7):
         title = title_formatter.format(i)
-        graph, slices, fits = fit_slices(histos.get(title, default_histo2d), x_range, x_bin_step, y_fit_range)
+        graph, slices, fits = fit_slices(histos.get(title, default_histo2d), x_range, x_bin_step, y_fit_range,
+                                          slice_entries)
 
         # Size of slices page
         nrows = 5
@@ -238,10 +255,12 @@ def plot_fits(canvas, histos, x_range, x_bin_step, title_formatter,
         for j, (s,f) in enumerate(zip(slices, fits)):
             slice_can.cd(j+1)
             s.Draw()
-            lab.DrawLatex(0.15, 0.88, '#mu = {0:6.4f}, #sigma = {1:6.4f}'.format(f.GetParameter(1), f.GetParameter(2)))
+            label.DrawLatex(0.15, 0.88, '#mu = {0:6.4f}, #sigma = {1:6.4f}'.format(f.GetParameter(1), f.GetParameter(2)))
             
-        slice_can.Print(slice_pdfname)
-    slice_can.Print(slice_pdfname + ']')
+        with stage('print'):
+            slice_can.Print(slice_pdfname)
+    with stage('print'):
+        slice_can.Print(slice_pdfname + ']')
 
     
 def plot_fits_mpl(histos, x_range, x_bin_step, title_formatter,
@@ -292,220 +311,307 @@ def plot_fits_mpl(histos, x_range, x_bin_step, title_formatter,
             ax.set_ylabel(ytitle)
             
     fig.tight_layout()
-    fig.savefig(save_name, bbox_inches='tight')
+    with stage('print'):
+        fig.savefig(save_name, bbox_inches='tight')
 
 def add_text_page(can, label, text, save_name):
     """ Write some text onto a page. """
     can.Clear()
     can.cd(1)
     label.DrawLatex(0.1, 0.5, text)
-    can.Print(save_name)
+    with stage('print'):
+        can.Print(save_name)
     
     
-if __name__ == '__main__':
-
-    ap = argparse.ArgumentParser()
-    ap.add_argument(
-        '-i',
-        '--input_file',
-        required=True
-    )
-    ap.add_argument(
-        '-o',
-        '--output_prefix',
-        required=True
-    )
-    args = ap.parse_args()
-
-    input_rootfile = args.input_file 
-    output_pdfname = args.output_prefix + '.pdf'
-    rootfile = TFile(input_rootfile)
-    histos = load_histos(rootfile)
-
-    for k,v in histos.items():
-        print(k, v)
-        
-    setup_global_options() 
-
-    can = TCanvas('can', 'can', 800, 1100)
-
+def monitor_label():
+    """ The label the pages are annotated with. """
     lab = TLatex()
     lab.SetNDC()
     lab.SetTextFont(42)
     lab.SetTextSize(0.05)
     lab.SetTextColor(1)
+    return lab
 
-    can.Print('{}['.format(output_pdfname))
+# Renderers of the page kinds, see plot_jobs.
+def draw_sector(canvas, histos, page):
+    plot_sector_page(canvas, histos['data'], page['inputs'][0][1], monitor_label(),
+                     **page_options(page))
 
-    add_text_page(can, lab, text='W Monitoring Plots', save_name=output_pdfname)
+def draw_single(canvas, histos, page):
+    plot_page(canvas, histos['data'], page['inputs'][0][1], monitor_label(),
+              **page_options(page))
 
-    plot_sector_page(can, histos, 'histos_w_inclusive_{}', lab, save_name=output_pdfname,
-                     title='Electron (Forward)', xtitle='W', y_fit_range=[0.85, 1.05])
-    
-    plot_sector_page(can, histos, 'histos_w_{}', lab, save_name=output_pdfname,
-                     title='Electron (Forward) and Proton (CTOF)', xtitle='W',
-                     y_fit_range=[0.85, 1.08])
+def draw_fits(canvas, histos, page):
+    plot_fits(canvas, histos['data'], title_formatter=page['inputs'][0][1],
+              label=monitor_label(), **page_options(page))
 
-    plot_sector_page(can, histos, 'histos_w_pass_angle_in_ctof_{}', lab, save_name=output_pdfname,
-                     title='Electron and Proton w/ #phi_{ep} > 178', xtitle='W', y_fit_range=[0.85, 1.02])
- 
-    plot_sector_page(can, histos, 'histos_w_q2_inclusive_{}', lab, save_name=output_pdfname,
-                     title='Electron (Forward)', xtitle='W', ytitle='Q^{2}', log=True)
+def draw_text(canvas, histos, page):
+    add_text_page(canvas, monitor_label(), **page_options(page))
 
-    plot_sector_page(can, histos, 'histos_w_q2_{}', lab, save_name=output_pdfname,
-                     title='Electron (Forward) and Proton (CTOF)', xtitle='W', ytitle='Q^{2}', log=True)
+monitor_renderers = {
+    'sector':draw_sector,
+    'single':draw_single,
+    'root_fits':draw_fits,
+    'text':draw_text
+}
 
-    plot_sector_page(can, histos, 'histos_w_q2_pass_angle_in_ctof_{}', lab, save_name=output_pdfname,
-                     title='Electron and Proton w/ #phi_{ep} > 178', xtitle='W', ytitle='Q^{2}', log=True)
+def monitor_pages():
+    """ Pages of the report, in order. """
+    return [
+        {'kind':'text', 'text':'W Monitoring Plots'},
 
-    plot_page(can, histos, 'histos_phi_electron_w', lab, save_name=output_pdfname,
-                     title='W vs. #phi_{e}', xtitle='#phi_{e}', ytitle='W', log=True)
- 
-    plot_sector_page(can, histos, 'histos_p_w_ele_{}', lab, save_name=output_pdfname,
-                     title='W vs. P_{e}', ytitle='W',
-                     xtitle='P_{e}', log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_w_inclusive_{}')], 'title':'Electron (Forward)',
+         'xtitle':'W', 'y_fit_range':[0.85, 1.05]},
 
-    plot_sector_page(can, histos, 'histos_theta_w_ele_{}', lab, save_name=output_pdfname,
-                     title='W vs. #theta_{e}', ytitle='W',
-                     xtitle='#theta_{e}', log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_w_{}')],
+         'title':'Electron (Forward) and Proton (CTOF)', 'xtitle':'W', 'y_fit_range':[0.85, 1.08]},
 
-    plot_fits(can, histos, x_range=[8.8,10.0], x_bin_step=6, title_formatter='histos_p_w_ele_{}',
-              save_name=output_pdfname, label=lab, y_range=[0.6, 1.5],
-              title='W vs. p_{e}', xtitle='p_{e}', ytitle='W', hline=0.938, y_fit_range=[0.85, 1.1])
+        {'kind':'sector', 'inputs':[('data', 'histos_w_pass_angle_in_ctof_{}')],
+         'title':'Electron and Proton w/ #phi_{ep} > 178', 'xtitle':'W', 'y_fit_range':[0.85, 1.02]},
 
-    plot_fits(can, histos, x_range=[6.0,12.0], x_bin_step=6, title_formatter='histos_theta_w_ele_{}',
-              save_name=output_pdfname, label=lab, y_range=[0.6, 1.5],
-              title='W vs. #theta_{e}', xtitle='#theta_{e}', ytitle='W', hline=0.938, y_fit_range=[0.85, 1.1])
+        {'kind':'sector', 'inputs':[('data', 'histos_w_q2_inclusive_{}')],
+         'title':'Electron (Forward)', 'xtitle':'W', 'ytitle':'Q^{2}', 'log':True},
 
-    add_text_page(can, lab, text='Vertex Monitoring Plots', save_name=output_pdfname)
-    
-    plot_sector_page(can, histos, 'histos_theta_electron_vz_electron_{}', lab, save_name=output_pdfname,
-                     title='v_{z} (e) vs. #theta_{e}', xtitle='#theta_{e}', ytitle='v_{z} (e)', log=False)
+        {'kind':'sector', 'inputs':[('data', 'histos_w_q2_{}')],
+         'title':'Electron (Forward) and Proton (CTOF)', 'xtitle':'W', 'ytitle':'Q^{2}', 'log':True},
 
-    plot_sector_page(can, histos, 'histos_theta_electron_vz_electron_{}', lab, save_name=output_pdfname,
-                     title='v_{z} (e) vs #theta_{e}', xtitle='#theta_{e}', ytitle='v_{z} (e)', log=False)
+        {'kind':'sector', 'inputs':[('data', 'histos_w_q2_pass_angle_in_ctof_{}')],
+         'title':'Electron and Proton w/ #phi_{ep} > 178', 'xtitle':'W', 'ytitle':'Q^{2}', 'log':True},
 
-    plot_page(can, histos, 'histos_phi_electron_vz_electron', lab, save_name=output_pdfname,
-                     title='v_{z} (e) vs. #phi_{e}', xtitle='#phi_{e}', ytitle='v_{z} (e)', log=False)
+        {'kind':'single', 'inputs':[('data', 'histos_phi_electron_w')], 'title':'W vs. #phi_{e}',
+         'xtitle':'#phi_{e}', 'ytitle':'W', 'log':True},
 
-    plot_sector_page(can, histos, 'histos_vz_electron_{}', lab, save_name=output_pdfname,
-                     title='v_{z} (e)', xtitle='v_{z} (e)', log=False)
+        {'kind':'sector', 'inputs':[('data', 'histos_p_w_ele_{}')], 'title':'W vs. P_{e}',
+         'ytitle':'W', 'xtitle':'P_{e}', 'log':True},
 
-    plot_sector_page(can, histos, 'histos_theta_proton_vz_proton_{}', lab, save_name=output_pdfname,
-                     title='v_{z} (p) vs #theta_{p}', xtitle='#theta_{p}', ytitle='v_{z} (p)', log=False)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_w_ele_{}')], 'title':'W vs. #theta_{e}',
+         'ytitle':'W', 'xtitle':'#theta_{e}', 'log':True},
 
-    plot_page(can, histos, 'histos_phi_proton_vz_proton', lab, save_name=output_pdfname,
-                     title='v_{z} (p) vs. #phi_{p}', xtitle='#phi_{p}', ytitle='v_{z} (p)', log=False)
+        {'kind':'root_fits', 'inputs':[('data', 'histos_p_w_ele_{}')], 'x_range':[8.8,10.0],
+         'x_bin_step':6, 'y_range':[0.6, 1.5], 'title':'W vs. p_{e}', 'xtitle':'p_{e}', 'ytitle':'W',
+         'hline':0.938, 'y_fit_range':[0.85, 1.1]},
 
-    plot_sector_page(can, histos, 'histos_vz_proton_{}', lab, save_name=output_pdfname,
-                     title='v_{z} (p)', xtitle='v_{z} (p)', log=False)
+        {'kind':'root_fits', 'inputs':[('data', 'histos_theta_w_ele_{}')], 'x_range':[6.0,12.0],
+         'x_bin_step':6, 'y_range':[0.6, 1.5], 'title':'W vs. #theta_{e}', 'xtitle':'#theta_{e}',
+         'ytitle':'W', 'hline':0.938, 'y_fit_range':[0.85, 1.1]},
 
-    plot_page(can, histos, 'histos_phi_electron_delta_vz', lab, save_name=output_pdfname,
-                     title='#Delta v_{z} vs. #phi_{e}', xtitle='#phi_{e}', ytitle='#Delta v_{z}', log=False)
+        {'kind':'text', 'text':'Vertex Monitoring Plots'},
 
-    plot_page(can, histos, 'histos_phi_proton_delta_vz', lab, save_name=output_pdfname,
-                     title='#Delta v_{z} vs. #phi_{p}', xtitle='#phi_{p}', ytitle='#Delta v_{z}', log=False)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_electron_vz_electron_{}')],
+         'title':'v_{z} (e) vs. #theta_{e}', 'xtitle':'#theta_{e}', 'ytitle':'v_{z} (e)', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_delta_vz_{}', lab, save_name=output_pdfname,
-                     title='#Delta v_{z}', xtitle='#Delta v_{z}', log=False)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_electron_vz_electron_{}')],
+         'title':'v_{z} (e) vs #theta_{e}', 'xtitle':'#theta_{e}', 'ytitle':'v_{z} (e)', 'log':False},
 
-    add_text_page(can, lab, text='Resolution Monitoring Plots', save_name=output_pdfname)
+        {'kind':'single', 'inputs':[('data', 'histos_phi_electron_vz_electron')],
+         'title':'v_{z} (e) vs. #phi_{e}', 'xtitle':'#phi_{e}', 'ytitle':'v_{z} (e)', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_delta_p_electron_{}', lab, save_name=output_pdfname,
-                     title='#Delta P_{e} from #theta_{e}', xtitle='#Delta P_{e}', log=False, y_fit_range=[-0.15, 0.15])
+        {'kind':'sector', 'inputs':[('data', 'histos_vz_electron_{}')], 'title':'v_{z} (e)',
+         'xtitle':'v_{z} (e)', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_theta_electron_delta_p_electron_{}', lab, save_name=output_pdfname,
-                     title='#Delta P_{e} vs #theta_{e} from #theta_{e}', xtitle='#theta_{e}', ytitle='#Delta P_{e}', log=False)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_proton_vz_proton_{}')],
+         'title':'v_{z} (p) vs #theta_{p}', 'xtitle':'#theta_{p}', 'ytitle':'v_{z} (p)', 'log':False},
 
-    plot_page(can, histos, 'histos_phi_electron_delta_p_electron', lab, save_name=output_pdfname,
-                     title='#Delta P_{e} vs. #phi_{e} from #theta_{e}', xtitle='#phi_{e}', ytitle='#Delta P_{e}', log=False)
+        {'kind':'single', 'inputs':[('data', 'histos_phi_proton_vz_proton')],
+         'title':'v_{z} (p) vs. #phi_{p}', 'xtitle':'#phi_{p}', 'ytitle':'v_{z} (p)', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_delta_p_proton_{}', lab, save_name=output_pdfname,
-                     title='#Delta P_{p} from #theta_{e}', xtitle='#Delta P_{p}', log=False, y_fit_range=[-0.5, 0.5])
+        {'kind':'sector', 'inputs':[('data', 'histos_vz_proton_{}')], 'title':'v_{z} (p)',
+         'xtitle':'v_{z} (p)', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_theta_proton_delta_p_proton_{}', lab, save_name=output_pdfname,
-                     title='#Delta P_{p} vs #theta_{p} from #theta_{e}', xtitle='#theta_{p}', ytitle='#Delta P_{p}', log=False)
+        {'kind':'single', 'inputs':[('data', 'histos_phi_electron_delta_vz')],
+         'title':'#Delta v_{z} vs. #phi_{e}', 'xtitle':'#phi_{e}', 'ytitle':'#Delta v_{z}', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_p_proton_delta_p_proton_{}', lab, save_name=output_pdfname,
-                     title='#Delta P_{p} vs P_{p} from #theta_{e}', xtitle='P_{p}', ytitle='#Delta P_{p}', log=False)
-    
-    plot_sector_page(can, histos, 'histos_delta_theta_proton_{}', lab, save_name=output_pdfname,
-                     title='#Delta #theta_{p} from #theta_{e}', xtitle='#Delta #theta_{p}', log=False, y_fit_range=[-2,2])
+        {'kind':'single', 'inputs':[('data', 'histos_phi_proton_delta_vz')],
+         'title':'#Delta v_{z} vs. #phi_{p}', 'xtitle':'#phi_{p}', 'ytitle':'#Delta v_{z}', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_theta_electron_delta_theta_proton_{}', lab, save_name=output_pdfname,
-                     title='#Delta #theta_{p} vs #theta_{e} from #theta_{e}', xtitle='#theta_{e}', ytitle='#Delta #theta_{p}', log=False)
+        {'kind':'sector', 'inputs':[('data', 'histos_delta_vz_{}')], 'title':'#Delta v_{z}',
+         'xtitle':'#Delta v_{z}', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_theta_proton_delta_theta_proton_{}', lab, save_name=output_pdfname,
-                     title='#Delta #theta_{p} vs #theta_{p} from #theta_{e}', xtitle='#theta_{p}', ytitle='#Delta #theta_{p}', log=False)
+        {'kind':'text', 'text':'Resolution Monitoring Plots'},
 
-    plot_sector_page(can, histos, 'histos_de_beam_{}', lab, save_name=output_pdfname,
-                     title='#Delta E_{beam} from (#theta_{e}, P_{e})', xtitle='#Delta E_{beam}', log=False,
-                     y_fit_range=[-0.4, 0.4])
+        {'kind':'sector', 'inputs':[('data', 'histos_delta_p_electron_{}')],
+         'title':'#Delta P_{e} from #theta_{e}', 'xtitle':'#Delta P_{e}', 'log':False,
+         'y_fit_range':[-0.15, 0.15]},
 
-    plot_sector_page(can, histos, 'histos_de_beam_from_angles{}', lab, save_name=output_pdfname,
-                     title='#Delta E_{beam} from (#theta_{e}, #theta_{p})', xtitle='#Delta E_{beam}', log=False)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_electron_delta_p_electron_{}')],
+         'title':'#Delta P_{e} vs #theta_{e} from #theta_{e}', 'xtitle':'#theta_{e}',
+         'ytitle':'#Delta P_{e}', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_de_beam_de_beam_from_angles{}', lab, save_name=output_pdfname,
-                     title='#Delta E_{beam}', xtitle='#Delta E (#theta_{e}, P_{e})',
-                     ytitle='#Delta E (#theta_{e}, #theta_{p})', log=False)
+        {'kind':'single', 'inputs':[('data', 'histos_phi_electron_delta_p_electron')],
+         'title':'#Delta P_{e} vs. #phi_{e} from #theta_{e}', 'xtitle':'#phi_{e}',
+         'ytitle':'#Delta P_{e}', 'log':False},
 
-    plot_sector_page(can, histos, 'histos_theta_ele_de_beam_{}', lab, save_name=output_pdfname,
-                     title='#Delta E_{beam} vs #theta_{e}', xtitle='#theta_{e}',
-                     ytitle='#Delta E (#theta_{e}, P_{e})', log=False)
-    
-    # Close the sucker 
-    can.Print('{}]'.format(output_pdfname))
+        {'kind':'sector', 'inputs':[('data', 'histos_delta_p_proton_{}')],
+         'title':'#Delta P_{p} from #theta_{e}', 'xtitle':'#Delta P_{p}', 'log':False,
+         'y_fit_range':[-0.5, 0.5]},
 
-    # single plots on landscape canvas 
-    lcan = TCanvas('can', 'can', 1100, 800)
-    plot_sector_page(lcan, histos, 'histos_w_inclusive_{}', lab, save_name='w_inclusive_{}.pdf'.format(args.output_prefix),
-                     title='Electron (Forward)', xtitle='W', y_fit_range=[0.85, 1.05], landscape=True, vline=0.938)
-    
-    plot_sector_page(lcan, histos, 'histos_w_{}', lab, save_name='w_ctof_proton_{}.pdf'.format(args.output_prefix),
-                     title='Electron (Forward) and Proton (CTOF)', xtitle='W',
-                     y_fit_range=[0.85, 1.08], landscape=True, vline=0.938)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_proton_delta_p_proton_{}')],
+         'title':'#Delta P_{p} vs #theta_{p} from #theta_{e}', 'xtitle':'#theta_{p}',
+         'ytitle':'#Delta P_{p}', 'log':False},
 
-    plot_sector_page(lcan, histos, 'histos_w_pass_angle_in_ctof_{}', lab, save_name='w_ctof_proton_pass_angle_{}.pdf'.format(args.output_prefix),
-                     title='Electron and Proton w/ #phi_{ep} > 178', xtitle='W', y_fit_range=[0.85, 1.02],
-                     landscape=True, vline=0.938)
+        {'kind':'sector', 'inputs':[('data', 'histos_p_proton_delta_p_proton_{}')],
+         'title':'#Delta P_{p} vs P_{p} from #theta_{e}', 'xtitle':'P_{p}', 'ytitle':'#Delta P_{p}',
+         'log':False},
 
-    plot_sector_page(lcan, histos, 'histos_w_q2_pass_angle_in_ctof_{}', lab, save_name='w_q2_pass_angle_{}.png'.format(args.output_prefix),
-                     title='Electron and Proton w/ #phi_{ep} > 178', xtitle='W', ytitle='Q^{2}', log=True,
-                     landscape=True, vline=0.938)
+        {'kind':'sector', 'inputs':[('data', 'histos_delta_theta_proton_{}')],
+         'title':'#Delta #theta_{p} from #theta_{e}', 'xtitle':'#Delta #theta_{p}', 'log':False,
+         'y_fit_range':[-2,2]},
 
-    plot_sector_page(lcan, histos, 'histos_angle_ep_pass_w_in_ctof_{}', lab, save_name='angle_ep_pass_w_{}.pdf'.format(args.output_prefix),
-                     title='Events Passing W Cut', xtitle='#phi_{ep} (deg)',
-                     landscape=True, x_range=[174, 180], vline=178)
- 
-    plot_sector_page(lcan, histos, 'histos_theta_proton_delta_theta_proton_{}', lab,
-                     save_name='theta_proton_delta_theta_proton_{}.pdf'.format(args.output_prefix),
-                     title='#Delta #theta_{p} vs #theta_{p} from #theta_{e}', xtitle='#theta_{p}', ytitle='#Delta #theta_{p}', log=False,
-                     landscape=True, hline=0.0001)
-
-    plot_sector_page(lcan, histos, 'histos_theta_electron_delta_theta_electron_{}', lab,
-                     save_name='theta_electron_delta_theta_electron_{}.pdf'.format(args.output_prefix),
-                     title='#Delta #theta_{e} vs #theta_{e} from P_{e}', xtitle='#theta_{e}', ytitle='#Delta #theta_{e}', log=False,
-                     landscape=True, hline=0.0001)
-
-    plot_sector_page(lcan, histos, 'histos_p_proton_delta_p_proton_{}', lab,
-                     save_name='p_proton_delta_p_proton_{}.pdf'.format(args.output_prefix),
-                     title='#Delta P_{p} vs P_{p} from #theta_{e}', xtitle='P_{p}', ytitle='#Delta P_{p}', log=False,
-                     landscape=True, hline=0.00001)
- 
-    plot_sector_page(lcan, histos, 'histos_p_electron_delta_p_electron_{}', lab,
-                     save_name='p_electron_delta_p_electron_{}.pdf'.format(args.output_prefix),
-                     title='#Delta P_{e} vs P_{e} from #theta_{e}', xtitle='P_{e}', ytitle='#Delta P_{e}', log=False,
-                     landscape=True, hline=0.00001)
-
-    plot_sector_page(lcan, histos, 'histos_p_w_ele_{}', lab, save_name='p_w_electron_{}.pdf'.format(args.output_prefix), 
-                     title='W vs. P_{e}', ytitle='W',
-                     xtitle='P_{e}', log=True, landscape=True, hline=0.938)
-
-    plot_sector_page(lcan, histos, 'histos_theta_w_ele_{}', lab, save_name='theta_w_electron_{}.pdf'.format(args.output_prefix), 
-                     title='W vs. #theta_{e}', ytitle='W',
-                     xtitle='#theta_{e}', log=True, landscape=True, hline=0.938)
-
-    plot_sector_page(lcan, histos, 'histos_p_theta_ele_pass_angle_in_ctof_{}', lab,
-                     save_name='p_theta_electron_{}.png'.format(args.output_prefix), 
-                     title='#theta_{e} vs p_{e}', ytitle='#theta_{e}',
-                     xtitle='p_{e}', log=True, landscape=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_electron_delta_theta_proton_{}')],
+         'title':'#Delta #theta_{p} vs #theta_{e} from #theta_{e}', 'xtitle':'#theta_{e}',
+         'ytitle':'#Delta #theta_{p}', 'log':False},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_proton_delta_theta_proton_{}')],
+         'title':'#Delta #theta_{p} vs #theta_{p} from #theta_{e}', 'xtitle':'#theta_{p}',
+         'ytitle':'#Delta #theta_{p}', 'log':False},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_de_beam_{}')],
+         'title':'#Delta E_{beam} from (#theta_{e}, P_{e})', 'xtitle':'#Delta E_{beam}', 'log':False,
+         'y_fit_range':[-0.4, 0.4]},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_de_beam_from_angles{}')],
+         'title':'#Delta E_{beam} from (#theta_{e}, #theta_{p})', 'xtitle':'#Delta E_{beam}',
+         'log':False},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_de_beam_de_beam_from_angles{}')],
+         'title':'#Delta E_{beam}', 'xtitle':'#Delta E (#theta_{e}, P_{e})',
+         'ytitle':'#Delta E (#theta_{e}, #theta_{p})', 'log':False},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_ele_de_beam_{}')],
+         'title':'#Delta E_{beam} vs #theta_{e}', 'xtitle':'#theta_{e}',
+         'ytitle':'#Delta E (#theta_{e}, P_{e})', 'log':False}
+    ]
+
+def landscape_pages():
+    """ Single plots, each saved on its own. """
+    return [
+        {'kind':'sector', 'inputs':[('data', 'histos_w_inclusive_{}')],
+         'save_name':'w_inclusive_{}.pdf', 'title':'Electron (Forward)', 'xtitle':'W',
+         'y_fit_range':[0.85, 1.05], 'landscape':True, 'vline':0.938},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_w_{}')], 'save_name':'w_ctof_proton_{}.pdf',
+         'title':'Electron (Forward) and Proton (CTOF)', 'xtitle':'W', 'y_fit_range':[0.85, 1.08],
+         'landscape':True, 'vline':0.938},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_w_pass_angle_in_ctof_{}')],
+         'save_name':'w_ctof_proton_pass_angle_{}.pdf',
+         'title':'Electron and Proton w/ #phi_{ep} > 178', 'xtitle':'W', 'y_fit_range':[0.85, 1.02],
+         'landscape':True, 'vline':0.938},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_w_q2_pass_angle_in_ctof_{}')],
+         'save_name':'w_q2_pass_angle_{}.png', 'title':'Electron and Proton w/ #phi_{ep} > 178',
+         'xtitle':'W', 'ytitle':'Q^{2}', 'log':True, 'landscape':True, 'vline':0.938},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_angle_ep_pass_w_in_ctof_{}')],
+         'save_name':'angle_ep_pass_w_{}.pdf', 'title':'Events Passing W Cut',
+         'xtitle':'#phi_{ep} (deg)', 'landscape':True, 'x_range':[174, 180], 'vline':178},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_proton_delta_theta_proton_{}')],
+         'save_name':'theta_proton_delta_theta_proton_{}.pdf',
+         'title':'#Delta #theta_{p} vs #theta_{p} from #theta_{e}', 'xtitle':'#theta_{p}',
+         'ytitle':'#Delta #theta_{p}', 'log':False, 'landscape':True, 'hline':0.0001},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_electron_delta_theta_electron_{}')],
+         'save_name':'theta_electron_delta_theta_electron_{}.pdf',
+         'title':'#Delta #theta_{e} vs #theta_{e} from P_{e}', 'xtitle':'#theta_{e}',
+         'ytitle':'#Delta #theta_{e}', 'log':False, 'landscape':True, 'hline':0.0001},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_proton_delta_p_proton_{}')],
+         'save_name':'p_proton_delta_p_proton_{}.pdf',
+         'title':'#Delta P_{p} vs P_{p} from #theta_{e}', 'xtitle':'P_{p}', 'ytitle':'#Delta P_{p}',
+         'log':False, 'landscape':True, 'hline':0.00001},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_electron_delta_p_electron_{}')],
+         'save_name':'p_electron_delta_p_electron_{}.pdf',
+         'title':'#Delta P_{e} vs P_{e} from #theta_{e}', 'xtitle':'P_{e}', 'ytitle':'#Delta P_{e}',
+         'log':False, 'landscape':True, 'hline':0.00001},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_w_ele_{}')], 'save_name':'p_w_electron_{}.pdf',
+         'title':'W vs. P_{e}', 'ytitle':'W', 'xtitle':'P_{e}', 'log':True, 'landscape':True,
+         'hline':0.938},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_w_ele_{}')],
+         'save_name':'theta_w_electron_{}.pdf', 'title':'W vs. #theta_{e}', 'ytitle':'W',
+         'xtitle':'#theta_{e}', 'log':True, 'landscape':True, 'hline':0.938},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_theta_ele_pass_angle_in_ctof_{}')],
+         'save_name':'p_theta_electron_{}.png', 'title':'#theta_{e} vs p_{e}', 'ytitle':'#theta_{e}',
+         'xtitle':'p_{e}', 'log':True, 'landscape':True}
+    ]
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        '-i',
+        '--input_file',
+        required=True
+    )
+    ap.add_argument(
+        '-o',
+        '--output_prefix',
+        required=True
+    )
+    ap.add_argument(
+        '-r',
+        '--release',
+        action='store_true',
+        help='Delete histograms once no later page draws them'
+    )
+    ap.add_argument(
+        '-t',
+        '--store_dir',
+        default=None,
+        help='Convert the ROOT file once to an array store here and read that'
+    )
+    ap.add_argument(
+        '-j',
+        '--jobs',
+        default=1,
+        type=int,
+        help='Worker processes drawing the pages'
+    )
+    ap.add_argument(
+        '-b',
+        '--build_dir',
+        default=None,
+        help='Only redraw outputs whose inputs or options changed, keeping records here'
+    )
+    ap.add_argument(
+        '-p',
+        '--profile',
+        action='store_true',
+        help='Time the stages into <output_prefix>.profile.json and .folded'
+    )
+    args = ap.parse_args()
+
+    if args.profile:
+        stage_timers.enable()
+
+    input_rootfile = args.input_file 
+    output_pdfname = args.output_prefix + '.pdf'
+    histos = open_histos(input_rootfile, store_dir=args.store_dir, keep=not args.release)
+
+    for k in histos:
+        print(k)
+        
+    setup_global_options() 
+
+    state = None
+    if args.build_dir:
+        state = BuildState(args.build_dir, sources=build_sources(__file__))
+
+    run_pdf(monitor_pages(), {'data':histos}, {'data':input_rootfile}, output_pdfname,
+            store_dir=args.store_dir, jobs=args.jobs, canvas_size=(800, 1100),
+            extra_renderers=monitor_renderers, keep=not args.release,
+            setup=setup_global_options, state=state)
+
+    # single plots on landscape canvas
+    run_pages(landscape_pages(), {'data':histos}, {'data':input_rootfile}, args.output_prefix,
+              store_dir=args.store_dir, jobs=args.jobs, canvas_size=(1100, 800),
+              extra_renderers=monitor_renderers, keep=not args.release,
+              setup=setup_global_options, state=state)
+
+    if args.profile:
+        stage_timers.print_summary()
+        print('Profile: ', stage_timers.write_report(args.output_prefix))
@@ -10,20 +10,20 @@ matplotlib.use('agg')
 import matplotlib.pyplot as plt 
 
 from array import array 
-from ROOT import (TH1F, TH2F, TF1, TFile, TCanvas,
+from ROOT import (TH1F, TH2F, TF1, TCanvas,
                   gPad, gStyle, TLatex, TGraphErrors,
                   TLine)
 
+from build_state import BuildState, build_sources
+from lazy_histos import open_histos
+from plot_jobs import page_options, run_pages, run_pdf
+from slice_projector import SliceProjector
+import stage_timers
+from stage_timers import count, stage
+
 default_histo = TH1F('default', '', 100, 0, 1)
 default_histo2d = TH2F('default', '', 100, 0, 1, 100, 0, 1)
 
-def load_histos(file):
-    ''' Use the ROOT file structure to load a dictionary of histograms. '''
-    h = {}
-    for k in file.GetListOfKeys():
-        h[k.GetName()] = file.Get(k.GetName())
-    return h
-
 def setup_global_options():
     gStyle.SetOptTitle(0)
     gStyle.SetOptStat(0)
@@ -99,7 +99,8 @@ def plot_sector_page(canvas, histos, title_formatter, label, save_name,
             label.DrawLatex(0.04, 0.5, ytitle)
             label.SetTextAngle(0)
 
-    canvas.Print(save_name)
+    with stage('print'):
+        canvas.Print(save_name)
 
 def plot_page(canvas, histos, histo_title, label, save_name,
                      xtitle=None, ytitle=None, title=None, log=False):
@@ -127,50 +128,61 @@ def plot_page(canvas, histos, histo_title, label, save_name,
         label.DrawLatex(0.04, 0.5, ytitle)
         label.SetTextAngle(0)
 
-    canvas.Print(save_name)
+    with stage('print'):
+        canvas.Print(save_name)
 
 
-def fit_slices(histo, x_range, x_bin_step, y_fit_range):
+def fit_slices(histo, x_range, x_bin_step, y_fit_range, slice_entries=None):
+    """ Slices of x_bin_step x-bins, or of about slice_entries entries each. """
 
+    projector = SliceProjector.from_histo(histo)
     x_start = histo.GetXaxis().FindBin(x_range[0])
     x_stop =  histo.GetXaxis().FindBin(x_range[1])
 
+    if slice_entries:
+        x_firsts, x_lasts, _, _ = projector.adaptive_slices(x_range, slice_entries, y_range=y_fit_range)
+    else:
+        x_firsts = np.arange(x_start, x_stop + 1, x_bin_step)
+        x_lasts = x_firsts + x_bin_step
+
     x_values = array('d')
+    x_errors = array('d')
     slices = []
     fits = []
-    for i, x_bin in enumerate(range(x_start, x_stop + 1, x_bin_step)):
-        projec = histo.ProjectionY(histo.GetTitle() + '_proj{}'.format(i) , x_bin, x_bin + x_bin_step)
+    with stage('fit_slices'):
+        for i, (x_bin, x_last) in enumerate(zip(x_firsts, x_lasts)):
+            projec = projector.histogram(histo.GetTitle() + '_proj{}'.format(i), x_bin, x_last, histo.GetTitle())
 
-        fit = TF1(histo.GetTitle() + '_fit{}'.format(i), 'gaus')
-        fit.SetTitle(histo.GetTitle() + '_fit{}'.format(i))
-        fit.SetName(histo.GetTitle() + '_fit{}'.format(i))
+            fit = TF1(histo.GetTitle() + '_fit{}'.format(i), 'gaus')
+            fit.SetTitle(histo.GetTitle() + '_fit{}'.format(i))
+            fit.SetName(histo.GetTitle() + '_fit{}'.format(i))
 
-        if y_fit_range:
-            fit.SetParameter(1, 0.5 * (y_fit_range[0] + y_fit_range[1]))
+            if y_fit_range:
+                fit.SetParameter(1, 0.5 * (y_fit_range[0] + y_fit_range[1]))
  
-        projec.Fit(fit, 'R', '',  y_fit_range[0], y_fit_range[1])
+            projec.Fit(fit, 'R', '',  y_fit_range[0], y_fit_range[1])
 
-        slices.append(projec)
-        fits.append(fit)
+            slices.append(projec)
+            fits.append(fit)
 
-        x_low = histo.GetXaxis().GetBinCenter(x_bin)
-        x_high = histo.GetXaxis().GetBinCenter(x_bin + x_bin_step)
-        x_values.append(0.5 * (x_high + x_low))
+            x_low = histo.GetXaxis().GetBinCenter(int(x_bin))
+            x_high = histo.GetXaxis().GetBinCenter(int(x_last))
+            x_values.append(0.5 * (x_high + x_low))
+            x_errors.append(0.5 * (x_high - x_low) if slice_entries else 0.0)
+        count('fits', len(fits))
 
     means = array('d')
     means_err = array('d')
     stds = array('d')
     stds_err = array('d')
-    zeros = array('d')
 
     for f in fits:
         means.append(f.GetParameter(1))
         means_err.append(f.GetParError(1))
         stds.append(f.GetParameter(2))
         stds_err.append(f.GetParError(2))
-        zeros.append(0.0)
 
-    graph = TGraphErrors(len(x_values), x_values, means, zeros, stds)
+    graph = TGraphErrors(len(x_values), x_values, means, x_errors, stds)
     graph.SetName('g_' + histo.GetName())
 
     return graph, slices, fits
@@ -179,7 +191,8 @@ def fit_slices(histo, x_range, x_bin_step, y_fit_range):
  
 def plot_fits(canvas, histos, x_range, x_bin_step, title_formatter,
               save_name, label, y_fit_range, y_range=None,
-              title=None, xtitle=None, ytitle=None, hline=None):
+              title=None, xtitle=None, ytitle=None, hline=None,
+              slice_entries=None):
 
     canvas.Clear()
     canvas.Divide(2,3)
@@ -189,7 +202,8 @@ def plot_fits(canvas, histos, x_range, x_bin_step, title_formatter,
         canvas.cd(i)
 
         title = title_formatter.format(i)
-        graph, slices, fits = fit_slices(histos.get(title, default_histo2d), x_range, x_bin_step, y_fit_range=y_fit_range)
+        graph, slices, fits = fit_slices(histos.get(title, default_histo2d), x_range, x_bin_step,
+                                          y_fit_range=y_fit_range, slice_entries=slice_entries)
         graph.SetMarkerStyle(8)
         graph.SetMarkerSize(1)
         
@@ -220,15 +234,18 @@ def plot_fits(canvas, histos, x_range, x_bin_step, title_formatter,
             label.DrawLatex(0.035, 0.5, ytitle)
             label.SetTextAngle(0)
 
-    canvas.Print(save_name)
+    with stage('print'):
+        canvas.Print(save_name)
 
     # For the slices 
     slice_can = TCanvas('slice_can', 'slice_can', 1200, 1600)
     slice_pdfname = title_formatter.split('_{}')[0] + '_slices.pdf'
-    slice_can.Print(slice_pdfname + '[')
+    with stage('print'):
+        slice_can.Print(slice_pdfname + '[')
     for i in range(1,7):
         title = title_formatter.format(i)
-        graph, slices, fits = fit_slices(histos.get(title, default_histo2d), x_range, x_bin_step, y_fit_range)
+        graph, slices, fits = fit_slices(histos.get(title, default_histo2d), x_range, x_bin_step, y_fit_range,
+                                          slice_entries)
 
         # Size of slices page
         nrows = 5
@@ -238,10 +255,12 @@ def plot_fits(canvas, histos, x_range, x_bin_step, title_formatter,
         for j, (s,f) in enumerate(zip(slices, fits)):
             slice_can.cd(j+1)
             s.Draw()
-            lab.DrawLatex(0.15, 0.88, '#mu = {0:6.4f}, #sigma = {1:6.4f}'.format(f.GetParameter(1), f.GetParameter(2)))
+            label.DrawLatex(0.15, 0.88, '#mu = {0:6.4f}, #sigma = {1:6.4f}'.format(f.GetParameter(1), f.GetParameter(2)))
             
-        slice_can.Print(slice_pdfname)
-    slice_can.Print(slice_pdfname + ']')
+        with stage('print'):
+            slice_can.Print(slice_pdfname)
+    with stage('print'):
+        slice_can.Print(slice_pdfname + ']')
 
     
 def plot_fits_mpl(histos, x_range, x_bin_step, title_formatter,
@@ -292,200 +311,267 @@ def plot_fits_mpl(histos, x_range, x_bin_step, title_formatter,
             ax.set_ylabel(ytitle)
             
     fig.tight_layout()
-    fig.savefig(save_name, bbox_inches='tight')
+    with stage('print'):
+        fig.savefig(save_name, bbox_inches='tight')
 
 def add_text_page(can, label, text, save_name):
     """ Write some text onto a page. """
     can.Clear()
     can.cd(1)
     label.DrawLatex(0.1, 0.5, text)
-    can.Print(save_name)
+    with stage('print'):
+        can.Print(save_name)
     
     
-if __name__ == '__main__':
-
-    ap = argparse.ArgumentParser()
-    ap.add_argument(
-        '-i',
-        '--input_file',
-        required=True
-    )
-    ap.add_argument(
-        '-o',
-        '--output_prefix',
-        required=True
-    )
-    args = ap.parse_args()
-
-    input_rootfile = args.input_file 
-    output_pdfname = args.output_prefix + '.pdf'
-    rootfile = TFile(input_rootfile)
-    histos = load_histos(rootfile)
-
-    for k,v in histos.items():
-        print(k, v)
-        
-    setup_global_options() 
-
-    can = TCanvas('can', 'can', 800, 1100)
-
+def monitor_label():
+    """ The label the pages are annotated with. """
     lab = TLatex()
     lab.SetNDC()
     lab.SetTextFont(42)
     lab.SetTextSize(0.05)
     lab.SetTextColor(1)
+    return lab
 
-    can.Print('{}['.format(output_pdfname))
+# Renderers of the page kinds, see plot_jobs.
+def draw_sector(canvas, histos, page):
+    plot_sector_page(canvas, histos['data'], page['inputs'][0][1], monitor_label(),
+                     **page_options(page))
 
-    # add_text_page(can, lab, text='W Monitoring Plots', save_name=output_pdfname)
+def draw_single(canvas, histos, page):
+    plot_page(canvas, histos['data'], page['inputs'][0][1], monitor_label(),
+              **page_options(page))
 
-    plot_sector_page(can, histos, 'histos_w_CTOF_{}', lab, save_name=output_pdfname,
-                     title='(CTOF)', xtitle='W')
-    
-    plot_sector_page(can, histos, 'histos_w_FTOF_{}', lab, save_name=output_pdfname,
-                     title='(FTOF)', xtitle='W')
+def draw_fits(canvas, histos, page):
+    plot_fits(canvas, histos['data'], title_formatter=page['inputs'][0][1],
+              label=monitor_label(), **page_options(page))
 
-    plot_sector_page(can, histos, 'histos_w_pass_angle_CTOF_{}', lab, save_name=output_pdfname,
-                     title='Pass #Delta #phi Cut (CTOF)', xtitle='W')
-    
-    plot_sector_page(can, histos, 'histos_w_pass_angle_FTOF_{}', lab, save_name=output_pdfname,
-                     title='Pass #Delta #phi Cut (FTOF)', xtitle='W')
+def draw_text(canvas, histos, page):
+    add_text_page(canvas, monitor_label(), **page_options(page))
 
-    plot_sector_page(can, histos, 'histos_w_pass_all_CTOF_{}', lab, save_name=output_pdfname,
-                     title='Pass All (CTOF)', xtitle='W')
-    
-    plot_sector_page(can, histos, 'histos_w_pass_all_FTOF_{}', lab, save_name=output_pdfname,
-                     title='Pass All (FTOF)', xtitle='W')
+monitor_renderers = {
+    'sector':draw_sector,
+    'single':draw_single,
+    'root_fits':draw_fits,
+    'text':draw_text
+}
 
-    #    add_text_page(can, lab, text='Event Selection', save_name=output_pdfname)
-    
-    plot_sector_page(can, histos, 'histos_angle_ep_CTOF_{}', lab, save_name=output_pdfname,
-                     title='Electron (Forward), Proton (CTOF)', xtitle='#phi_{ep}')
-    
-    plot_sector_page(can, histos, 'histos_angle_ep_FTOF_{}', lab, save_name=output_pdfname,
-                     title='Electron (Forward), Proton (FTOF)', xtitle='#phi_{ep}')
+def monitor_pages():
+    """ Pages of the report, in order. """
+    return [
+        # {'kind':'text', 'text':'W Monitoring Plots'},
 
-    plot_sector_page(can, histos, 'histos_angle_ep_pass_theta_gamma_CTOF_{}', lab, save_name=output_pdfname,
-                     title='(CTOF)  Pass #theta_{gamma}', xtitle='#phi_{ep}')
-    
-    plot_sector_page(can, histos, 'histos_angle_ep_pass_theta_gamma_FTOF_{}', lab, save_name=output_pdfname,
-                     title='(FTOF) Pass #theta_{gamma}', xtitle='#phi_{ep}')
+        {'kind':'sector', 'inputs':[('data', 'histos_w_CTOF_{}')], 'title':'(CTOF)', 'xtitle':'W'},
 
-    plot_sector_page(can, histos, 'histos_theta_gamma_CTOF_{}', lab, save_name=output_pdfname,
-                     title='Electron (Forward), Proton (CTOF)', xtitle='#theta_{#gamma}')
-    
-    plot_sector_page(can, histos, 'histos_theta_gamma_FTOF_{}', lab, save_name=output_pdfname,
-                     title='Electron (Forward), Proton (FTOF)', xtitle='#theta_{#gamma}')
-    
-    plot_sector_page(can, histos, 'histos_theta_gamma_pass_angle_CTOF_{}', lab, save_name=output_pdfname,
-                     title='Pass #Delta #phi (CTOF)', xtitle='#theta_{#gamma}')
-     
-    plot_sector_page(can, histos, 'histos_theta_gamma_pass_angle_FTOF_{}', lab, save_name=output_pdfname,
-                     title='Pass #Delta #phi (FTOF)', xtitle='#theta_{#gamma}')
+        {'kind':'sector', 'inputs':[('data', 'histos_w_FTOF_{}')], 'title':'(FTOF)', 'xtitle':'W'},
 
-    plot_sector_page(can, histos, 'histos_p_ele_theta_ele_CTOF_{}', lab, save_name=output_pdfname,
-                     title='(CTOF)', xtitle='p_{e}', ytitle='#theta_{e}', log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_w_pass_angle_CTOF_{}')],
+         'title':'Pass #Delta #phi Cut (CTOF)', 'xtitle':'W'},
 
-    plot_sector_page(can, histos, 'histos_p_ele_theta_ele_FTOF_{}', lab, save_name=output_pdfname,
-                     title='(FTOF)', xtitle='p_{e}', ytitle='#theta_{e}', log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_w_pass_angle_FTOF_{}')],
+         'title':'Pass #Delta #phi Cut (FTOF)', 'xtitle':'W'},
 
-    plot_sector_page(can, histos, 'histos_p_pro_theta_pro_CTOF_{}', lab, save_name=output_pdfname,
-                     title='(CTOF)', xtitle='p_{p}', ytitle='#theta_{p}', log=True)
- 
-    plot_sector_page(can, histos, 'histos_p_pro_theta_pro_FTOF_{}', lab, save_name=output_pdfname,
-                     title='(FTOF)', xtitle='p_{p}', ytitle='#theta_{p}', log=True)
- 
-    plot_sector_page(can, histos, 'histos_theta_e_theta_gamma_pass_angle_CTOF_{}', lab, save_name=output_pdfname,
-                     title='(CTOF)', xtitle='#theta_{e}', ytitle='#theta_{#gamma}', log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_w_pass_all_CTOF_{}')], 'title':'Pass All (CTOF)',
+         'xtitle':'W'},
 
-    plot_sector_page(can, histos, 'histos_theta_e_theta_gamma_pass_angle_FTOF_{}', lab, save_name=output_pdfname,
-                     title='(FTOF)', xtitle='#theta_{e}', ytitle='#theta_{#gamma}', log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_w_pass_all_FTOF_{}')], 'title':'Pass All (FTOF)',
+         'xtitle':'W'},
 
-    add_text_page(can, lab, text='Resolutions', save_name=output_pdfname)
+        # {'kind':'text', 'text':'Event Selection'},
 
-    plot_sector_page(can, histos, 'histos_p_ele_dp_ele_CTOF_{}', lab, save_name=output_pdfname,
-                     title='Momentum Resolution (CTOF)', xtitle='p_{e}', ytitle='#Delta p_{e}',
-                     log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_angle_ep_CTOF_{}')],
+         'title':'Electron (Forward), Proton (CTOF)', 'xtitle':'#phi_{ep}'},
 
-    plot_fits(can, histos, x_range=[1.5, 9.5], x_bin_step=6, title_formatter='histos_p_ele_dp_ele_CTOF_{}',
-              save_name=output_pdfname, label=lab, y_range=[-4, 4],
-              title='#Delta p_{e} vs. p_{e} (CTOF)', xtitle='p_{e}', ytitle='#Delta p_{e}', hline=0.0001, y_fit_range=[-4, 4])
+        {'kind':'sector', 'inputs':[('data', 'histos_angle_ep_FTOF_{}')],
+         'title':'Electron (Forward), Proton (FTOF)', 'xtitle':'#phi_{ep}'},
 
-    plot_sector_page(can, histos, 'histos_p_ele_dp_ele_FTOF_{}', lab, save_name=output_pdfname,
-                     title='Momentum Resolution (FTOF)', xtitle='p_{e}', ytitle='#Delta p_{e}',
-                     log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_angle_ep_pass_theta_gamma_CTOF_{}')],
+         'title':'(CTOF)  Pass #theta_{gamma}', 'xtitle':'#phi_{ep}'},
 
-    plot_fits(can, histos, x_range=[1.5, 9.5], x_bin_step=6, title_formatter='histos_p_ele_dp_ele_FTOF_{}',
-              save_name=output_pdfname, label=lab, y_range=[-4, 4],
-              title='#Delta p_{e} vs. p_{e} (FTOF)', xtitle='p_{e}', ytitle='#Delta p_{e}', hline=0.0001, y_fit_range=[-4, 4])
+        {'kind':'sector', 'inputs':[('data', 'histos_angle_ep_pass_theta_gamma_FTOF_{}')],
+         'title':'(FTOF) Pass #theta_{gamma}', 'xtitle':'#phi_{ep}'},
 
-    plot_sector_page(can, histos, 'histos_p_pro_dp_pro_CTOF_{}', lab, save_name=output_pdfname,
-                     title='Momentum Resolution (CTOF)', xtitle='p_{p}', ytitle='#Delta p_{p}',
-                     log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_gamma_CTOF_{}')],
+         'title':'Electron (Forward), Proton (CTOF)', 'xtitle':'#theta_{#gamma}'},
 
-    plot_fits(can, histos, x_range=[0.0, 5.5], x_bin_step=6, title_formatter='histos_p_pro_dp_pro_CTOF_{}',
-              save_name=output_pdfname, label=lab, y_range=[-4, 4],
-              title='#Delta p_{p} vs. p_{p} (CTOF)', xtitle='p_{p}', ytitle='#Delta p_{p}', hline=0.0001, y_fit_range=[-4, 4])
-    plot_sector_page(can, histos, 'histos_p_pro_dp_pro_FTOF_{}', lab, save_name=output_pdfname,
-                     title='Momentum Resolution (FTOF)', xtitle='p_{p}', ytitle='#Delta p_{p}',
-                     log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_gamma_FTOF_{}')],
+         'title':'Electron (Forward), Proton (FTOF)', 'xtitle':'#theta_{#gamma}'},
 
-    plot_fits(can, histos, x_range=[0.0, 5.5], x_bin_step=6, title_formatter='histos_p_pro_dp_pro_FTOF_{}',
-              save_name=output_pdfname, label=lab, y_range=[-4, 4],
-              title='#Delta p_{p} vs. p_{p} (FTOF)', xtitle='p_{p}', ytitle='#Delta p_{p}', hline=0.0001, y_fit_range=[-4, 4])
-    
-    plot_sector_page(can, histos, 'histos_theta_ele_dtheta_ele_CTOF_{}', lab, save_name=output_pdfname,
-                     title='#Theta Resolution (CTOF)', xtitle='#theta_{e}', ytitle='#Delta #theta_{e}',
-                     log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_gamma_pass_angle_CTOF_{}')],
+         'title':'Pass #Delta #phi (CTOF)', 'xtitle':'#theta_{#gamma}'},
 
-    plot_sector_page(can, histos, 'histos_theta_ele_dtheta_ele_FTOF_{}', lab, save_name=output_pdfname,
-                     title='#Theta Resolution (FTOF)', xtitle='#theta_{e}', ytitle='#Delta #theta_{e}',
-                     log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_gamma_pass_angle_FTOF_{}')],
+         'title':'Pass #Delta #phi (FTOF)', 'xtitle':'#theta_{#gamma}'},
 
-    plot_sector_page(can, histos, 'histos_theta_pro_dtheta_pro_CTOF_{}', lab, save_name=output_pdfname,
-                     title='#Theta Resolution (CTOF)', xtitle='#theta_{p}', ytitle='#Delta #theta_{p}',
-                     log=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_p_ele_theta_ele_CTOF_{}')], 'title':'(CTOF)',
+         'xtitle':'p_{e}', 'ytitle':'#theta_{e}', 'log':True},
 
-    plot_sector_page(can, histos, 'histos_theta_pro_dtheta_pro_FTOF_{}', lab, save_name=output_pdfname,
-                     title='#Theta Resolution (FTOF)', xtitle='#theta_{p}', ytitle='#Delta #theta_{p}',
-                     log=True)
-    
-    #plot_fits(can, histos, x_range=[6.0,12.0], x_bin_step=6, title_formatter='histos_theta_w_ele_{}',
-    #          save_name=output_pdfname, label=lab, y_range=[0.6, 1.5],
-    #          title='W vs. #theta_{e}', xtitle='#theta_{e}', ytitle='W', hline=0.938, y_fit_range=[0.85, 1.1])
-
-    can.Print('{}]'.format(output_pdfname))
-
-
-    # single plots on landscape canvas                                                                                                                                    
-    lcan = TCanvas('can', 'can', 1100, 800)
-    """
-    plot_sector_page(lcan, histos, 'histos_theta_ele_dtheta_ele_CTOF_{}', lab,
-                     save_name='theta_ele_dtheta_ele_CTOF_{}.pdf'.format(args.output_prefix), 
-                     title='#Delta #theta_{e} vs #theta_{e}', ytitle='#Delta #theta_{e}',
-                     xtitle='#theta_{e}', log=True, landscape=True)
-
-    plot_sector_page(lcan, histos, 'histos_theta_pro_dtheta_pro_CTOF_{}', lab,
-                     save_name='theta_pro_dtheta_pro_CTOF_{}.pdf'.format(args.output_prefix), 
-                     title='#Delta #theta_{p} vs #theta_{p}', ytitle='#Delta #theta_{p}',
-                     xtitle='#theta_{p}', log=True, landscape=True)
-    """
-    plot_sector_page(lcan, histos, 'histos_p_ele_dp_ele_from_angles_CTOF_{}', lab,
-                     save_name='p_ele_dp_ele_CTOF_{}.pdf'.format(args.output_prefix), 
-                     title='#Delta p_{e} vs p_{e}', ytitle='#Delta p_{e}',
-                     xtitle='p_{e}', log=True, landscape=True)
-
-    plot_sector_page(lcan, histos, 'histos_p_pro_dp_pro_from_angles_CTOF_{}', lab,
-                     save_name='p_pro_dp_pro_CTOF_{}.pdf'.format(args.output_prefix), 
-                     title='#Delta p_{p} vs p_{p}', ytitle='#Delta p_{p}',
-                     xtitle='p_{p}', log=True, landscape=True)
-
-    plot_sector_page(lcan, histos, 'histos_p_ele_dp_ele_from_angles_CTOF_{}', lab,
-                     save_name='p_ele_dp_ele_from_angles_CTOF_{}.pdf'.format(args.output_prefix), 
-                     title='#Delta p_{e} vs p_{e}', ytitle='#Delta p_{e}',
-                     xtitle='p_{e}', log=True, landscape=True)
-
-    plot_sector_page(lcan, histos, 'histos_p_pro_dp_pro_from_angles_CTOF_{}', lab,
-                     save_name='p_pro_dp_pro_from_angles_CTOF_{}.pdf'.format(args.output_prefix), 
-                     title='#Delta p_{p} vs p_{p}', ytitle='#Delta p_{p}',
-                     xtitle='p_{p}', log=True, landscape=True)
+        {'kind':'sector', 'inputs':[('data', 'histos_p_ele_theta_ele_FTOF_{}')], 'title':'(FTOF)',
+         'xtitle':'p_{e}', 'ytitle':'#theta_{e}', 'log':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_pro_theta_pro_CTOF_{}')], 'title':'(CTOF)',
+         'xtitle':'p_{p}', 'ytitle':'#theta_{p}', 'log':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_pro_theta_pro_FTOF_{}')], 'title':'(FTOF)',
+         'xtitle':'p_{p}', 'ytitle':'#theta_{p}', 'log':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_e_theta_gamma_pass_angle_CTOF_{}')],
+         'title':'(CTOF)', 'xtitle':'#theta_{e}', 'ytitle':'#theta_{#gamma}', 'log':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_e_theta_gamma_pass_angle_FTOF_{}')],
+         'title':'(FTOF)', 'xtitle':'#theta_{e}', 'ytitle':'#theta_{#gamma}', 'log':True},
+
+        {'kind':'text', 'text':'Resolutions'},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_ele_dp_ele_CTOF_{}')],
+         'title':'Momentum Resolution (CTOF)', 'xtitle':'p_{e}', 'ytitle':'#Delta p_{e}', 'log':True},
+
+        {'kind':'root_fits', 'inputs':[('data', 'histos_p_ele_dp_ele_CTOF_{}')], 'x_range':[1.5, 9.5],
+         'x_bin_step':6, 'y_range':[-4, 4], 'title':'#Delta p_{e} vs. p_{e} (CTOF)', 'xtitle':'p_{e}',
+         'ytitle':'#Delta p_{e}', 'hline':0.0001, 'y_fit_range':[-4, 4]},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_ele_dp_ele_FTOF_{}')],
+         'title':'Momentum Resolution (FTOF)', 'xtitle':'p_{e}', 'ytitle':'#Delta p_{e}', 'log':True},
+
+        {'kind':'root_fits', 'inputs':[('data', 'histos_p_ele_dp_ele_FTOF_{}')], 'x_range':[1.5, 9.5],
+         'x_bin_step':6, 'y_range':[-4, 4], 'title':'#Delta p_{e} vs. p_{e} (FTOF)', 'xtitle':'p_{e}',
+         'ytitle':'#Delta p_{e}', 'hline':0.0001, 'y_fit_range':[-4, 4]},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_pro_dp_pro_CTOF_{}')],
+         'title':'Momentum Resolution (CTOF)', 'xtitle':'p_{p}', 'ytitle':'#Delta p_{p}', 'log':True},
+
+        {'kind':'root_fits', 'inputs':[('data', 'histos_p_pro_dp_pro_CTOF_{}')], 'x_range':[0.0, 5.5],
+         'x_bin_step':6, 'y_range':[-4, 4], 'title':'#Delta p_{p} vs. p_{p} (CTOF)', 'xtitle':'p_{p}',
+         'ytitle':'#Delta p_{p}', 'hline':0.0001, 'y_fit_range':[-4, 4]},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_pro_dp_pro_FTOF_{}')],
+         'title':'Momentum Resolution (FTOF)', 'xtitle':'p_{p}', 'ytitle':'#Delta p_{p}', 'log':True},
+
+        {'kind':'root_fits', 'inputs':[('data', 'histos_p_pro_dp_pro_FTOF_{}')], 'x_range':[0.0, 5.5],
+         'x_bin_step':6, 'y_range':[-4, 4], 'title':'#Delta p_{p} vs. p_{p} (FTOF)', 'xtitle':'p_{p}',
+         'ytitle':'#Delta p_{p}', 'hline':0.0001, 'y_fit_range':[-4, 4]},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_ele_dtheta_ele_CTOF_{}')],
+         'title':'#Theta Resolution (CTOF)', 'xtitle':'#theta_{e}', 'ytitle':'#Delta #theta_{e}',
+         'log':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_ele_dtheta_ele_FTOF_{}')],
+         'title':'#Theta Resolution (FTOF)', 'xtitle':'#theta_{e}', 'ytitle':'#Delta #theta_{e}',
+         'log':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_pro_dtheta_pro_CTOF_{}')],
+         'title':'#Theta Resolution (CTOF)', 'xtitle':'#theta_{p}', 'ytitle':'#Delta #theta_{p}',
+         'log':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_theta_pro_dtheta_pro_FTOF_{}')],
+         'title':'#Theta Resolution (FTOF)', 'xtitle':'#theta_{p}', 'ytitle':'#Delta #theta_{p}',
+         'log':True},
+
+        # {'kind':'root_fits', 'inputs':[('data', 'histos_theta_w_ele_{}')], 'x_range':[6.0,12.0],
+        #  'x_bin_step':6, 'y_range':[0.6, 1.5], 'title':'W vs. #theta_{e}', 'xtitle':'#theta_{e}',
+        #  'ytitle':'W', 'hline':0.938, 'y_fit_range':[0.85, 1.1]}
+    ]
+
+def landscape_pages():
+    """ Single plots, each saved on its own. """
+    return [
+        # {'kind':'sector', 'inputs':[('data', 'histos_theta_ele_dtheta_ele_CTOF_{}')],
+        #  'save_name':'theta_ele_dtheta_ele_CTOF_{}.pdf', 'title':'#Delta #theta_{e} vs #theta_{e}',
+        #  'ytitle':'#Delta #theta_{e}', 'xtitle':'#theta_{e}', 'log':True, 'landscape':True},
+
+        # {'kind':'sector', 'inputs':[('data', 'histos_theta_pro_dtheta_pro_CTOF_{}')],
+        #  'save_name':'theta_pro_dtheta_pro_CTOF_{}.pdf', 'title':'#Delta #theta_{p} vs #theta_{p}',
+        #  'ytitle':'#Delta #theta_{p}', 'xtitle':'#theta_{p}', 'log':True, 'landscape':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_ele_dp_ele_from_angles_CTOF_{}')],
+         'save_name':'p_ele_dp_ele_CTOF_{}.pdf', 'title':'#Delta p_{e} vs p_{e}',
+         'ytitle':'#Delta p_{e}', 'xtitle':'p_{e}', 'log':True, 'landscape':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_pro_dp_pro_from_angles_CTOF_{}')],
+         'save_name':'p_pro_dp_pro_CTOF_{}.pdf', 'title':'#Delta p_{p} vs p_{p}',
+         'ytitle':'#Delta p_{p}', 'xtitle':'p_{p}', 'log':True, 'landscape':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_ele_dp_ele_from_angles_CTOF_{}')],
+         'save_name':'p_ele_dp_ele_from_angles_CTOF_{}.pdf', 'title':'#Delta p_{e} vs p_{e}',
+         'ytitle':'#Delta p_{e}', 'xtitle':'p_{e}', 'log':True, 'landscape':True},
+
+        {'kind':'sector', 'inputs':[('data', 'histos_p_pro_dp_pro_from_angles_CTOF_{}')],
+         'save_name':'p_pro_dp_pro_from_angles_CTOF_{}.pdf', 'title':'#Delta p_{p} vs p_{p}',
+         'ytitle':'#Delta p_{p}', 'xtitle':'p_{p}', 'log':True, 'landscape':True}
+    ]
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        '-i',
+        '--input_file',
+        required=True
+    )
+    ap.add_argument(
+        '-o',
+        '--output_prefix',
+        required=True
+    )
+    ap.add_argument(
+        '-r',
+        '--release',
+        action='store_true',
+        help='Delete histograms once no later page draws them'
+    )
+    ap.add_argument(
+        '-t',
+        '--store_dir',
+        default=None,
+        help='Convert the ROOT file once to an array store here and read that'
+    )
+    ap.add_argument(
+        '-j',
+        '--jobs',
+        default=1,
+        type=int,
+        help='Worker processes drawing the pages'
+    )
+    ap.add_argument(
+        '-b',
+        '--build_dir',
+        default=None,
+        help='Only redraw outputs whose inputs or options changed, keeping records here'
+    )
+    ap.add_argument(
+        '-p',
+        '--profile',
+        action='store_true',
+        help='Time the stages into <output_prefix>.profile.json and .folded'
+    )
+    args = ap.parse_args()
+
+    if args.profile:
+        stage_timers.enable()
+
+    input_rootfile = args.input_file 
+    output_pdfname = args.output_prefix + '.pdf'
+    histos = open_histos(input_rootfile, store_dir=args.store_dir, keep=not args.release)
+
+    for k in histos:
+        print(k)
+        
+    setup_global_options() 
+
+    state = None
+    if args.build_dir:
+        state = BuildState(args.build_dir, sources=build_sources(__file__))
+
+    run_pdf(monitor_pages(), {'data':histos}, {'data':input_rootfile}, output_pdfname,
+            store_dir=args.store_dir, jobs=args.jobs, canvas_size=(800, 1100),
+            extra_renderers=monitor_renderers, keep=not args.release,
+            setup=setup_global_options, state=state)
+
+    # single plots on landscape canvas
+    run_pages(landscape_pages(), {'data':histos}, {'data':input_rootfile}, args.output_prefix,
+              store_dir=args.store_dir, jobs=args.jobs, canvas_size=(1100, 800),
+              extra_renderers=monitor_renderers, keep=not args.release,
+              setup=setup_global_options, state=state)
+
+    if args.profile:
+        stage_timers.print_summary()
+        print('Profile: ', stage_timers.write_report(args.output_prefix))
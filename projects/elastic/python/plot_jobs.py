@@ -0,0 +1,461 @@
+#!/usr/bin/env python
+
+""" Pages of plots described as plain data, and the code that draws them.
+
+A page is a dictionary with a 'kind' saying how it is drawn and a
+'save_name' ('{}' is replaced by the output prefix).  The kinds known
+here are
+
+    pads  A ROOT canvas divided into pads.  Each pad draws filled
+          overlays ('fill', a list of (config, name, color)) or a 2D
+          histogram ('colz', one (config, name)), with titles, colored
+          labels and vertical cut lines.
+    fits  plot_fits_mpl of two inputs, each (config, title formatter).
+          The slices go to <save_name stem>_{data,sim}_slices.pdf.
+
+Scripts add their own kinds by passing renderers, see sector_renderer.
+Histograms are named by (config, key), config being 'data' or 'sim'.
+
+run_pages works out which pages depend on each other (they share a
+histogram that one of them changes, e.g. by scaling it) and keeps those
+together in the order given.  The independent groups are drawn in
+separate worker processes, each with its own copy of the inputs.
+
+run_pdf prints pages into one multi-page PDF instead.  Workers draw
+runs of consecutive pages into part files, which are then joined in
+order with pdfunite or qpdf, neither of which touches the pages.
+
+Both take a BuildState (see build_state.py) to skip the outputs whose
+pages and input histograms are the same as when they were last drawn.
+"""
+
+import multiprocessing
+import os
+import subprocess
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+import ROOT
+from ROOT import TCanvas, TLatex, TLine, gPad, gROOT, kBlack
+
+import slice_fits
+import stage_timers
+from lazy_histos import open_histos
+from stage_timers import count, stage
+
+# Kinds that draw without changing the histograms they use.
+read_only_kinds = set(['pads', 'fits'])
+
+# Keys of a page that are not passed on to the plotting function.
+page_keys = set(['kind', 'inputs', 'read_only'])
+
+def color(name):
+    """ ROOT color from a name like 'kRed', or a number. """
+    if isinstance(name, str):
+        return getattr(ROOT, name)
+    return name
+
+def get_min_max(histos):
+    return histos[0].GetMinimum(), max([h.GetMaximum() for h in histos])
+
+def color_draw(histo, color=ROOT.kGray, opts=""):
+    histo.SetLineColor(kBlack)
+    histo.SetFillColorAlpha(color,1.0)
+    histo.Draw(opts)
+
+def page_outputs(page, output_prefix):
+    """ The files a page writes, its save_name first. """
+    save_name = page['save_name'].format(output_prefix)
+    outputs = [save_name]
+    if page['kind'] == 'fits':
+        prefix = page.get('slice_prefix', os.path.splitext(save_name)[0])
+        outputs += [slice_fits.slice_pdf_name(prefix, sub_title) for sub_title in ['data', 'sim']]
+    return outputs
+
+def page_histos(page):
+    """ The (config, key) of every histogram a page draws. """
+
+    used = []
+    for pad in page.get('pads', []):
+        used += [(config, key) for config, key, _ in pad.get('fill', [])]
+        if 'colz' in pad:
+            used.append(tuple(pad['colz']))
+
+    for config, formatter in page.get('inputs', []):
+        used += [(config, formatter.format(sector)) for sector in range(1,7)]
+
+    return set(used)
+
+def later_histos(pages):
+    """ For each page, the histograms of the pages after it. """
+    later = []
+    needed = set()
+    for page in reversed(pages):
+        later.append(needed)
+        needed = needed | page_histos(page)
+    return later[::-1]
+
+def page_groups(pages):
+    """ Split the pages into groups that can be drawn independently.
+
+    A page joins the group of an earlier page when they share a
+    histogram and either of them changes it.  Each group keeps the
+    order of the pages in the list. """
+
+    groups = {}
+    for page, group in zip(pages, group_ids(pages)):
+        groups.setdefault(group, []).append(page)
+
+    return [groups[group] for group in sorted(groups)]
+
+def group_ids(pages):
+    """ For each page, the index of the first page of its group. """
+
+    parent = list(range(len(pages)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    used = [page_histos(page) for page in pages]
+    read_only = [page.get('read_only', page['kind'] in read_only_kinds) for page in pages]
+
+    for j in range(len(pages)):
+        for i in range(j):
+            if (not read_only[i] or not read_only[j]) and used[i] & used[j]:
+                # The first page of a group is its root.
+                a, b = find(i), find(j)
+                parent[max(a, b)] = min(a, b)
+
+    return [find(i) for i in range(len(pages))]
+
+def page_ranges(pages, count):
+    """ Split pages into at most count runs of consecutive pages,
+    of about the same length.  A run only ends where no group of
+    dependent pages carries on past it. """
+
+    ids = group_ids(pages)
+    last = {}
+    for i, group in enumerate(ids):
+        last[group] = i
+
+    size = max(1, -(-len(pages) // count))
+    ranges = [[]]
+    reach = -1
+    for i, page in enumerate(pages):
+        if len(ranges[-1]) >= size and reach < i:
+            ranges.append([])
+        ranges[-1].append(page)
+        reach = max(reach, last[ids[i]])
+
+    return ranges
+
+def draw_pads(canvas, histos, page):
+    """ Renderer of the 'pads' kind. """
+
+    latex = TLatex()
+    latex.SetNDC()
+    latex.SetTextSize(0.045)
+
+    canvas.Clear()
+    canvas.Divide(*page.get('divide', (2,2)))
+
+    root_garbage_can = []
+    for i, pad in enumerate(page['pads']):
+        canvas.cd(i + 1)
+
+        drawn = [histos[config][key] for config, key, _ in pad.get('fill', [])]
+        for j, (histo, (_, __, fill)) in enumerate(zip(drawn, pad.get('fill', []))):
+            color_draw(histo, color(fill), 'same' if j else '')
+
+        if 'colz' in pad:
+            config, key = pad['colz']
+            histos[config][key].Draw('colz')
+            if pad.get('logz', True):
+                gPad.SetLogz()
+
+        if 'xtitle' in pad:
+            latex.DrawLatex(0.45, 0.02, pad['xtitle'])
+
+        if 'ytitle' in pad:
+            x, y = pad.get('ytitle_pos', (0.02, 0.4))
+            latex.SetTextAngle(90.0)
+            latex.DrawLatex(x, y, pad['ytitle'])
+            latex.SetTextAngle(0.0)
+
+        if 'title' in pad:
+            x, y = pad.get('title_pos', (0.3, 0.95))
+            latex.DrawLatex(x, y, pad['title'])
+
+        for x, y, text, text_color in pad.get('labels', []):
+            latex.SetTextColor(color(text_color))
+            latex.DrawLatex(x, y, text)
+            latex.SetTextColor(kBlack)
+
+        # Cut lines span the overlays drawn in the pad.
+        if pad.get('cuts'):
+            ymin, ymax = get_min_max(drawn)
+            for cut in pad['cuts']:
+                line = TLine(cut, ymin, cut, ymax)
+                line.SetLineColor(1)
+                line.SetLineStyle(1)
+                line.Draw('same')
+                root_garbage_can.append(line)
+
+    with stage('print'):
+        canvas.Print(page['save_name'])
+
+def draw_fits(canvas, histos, page):
+    """ Renderer of the 'fits' kind.  An input given with the page
+    title_formatter is passed as the whole dictionary, any other as
+    the list of its six sector histograms. """
+
+    options = page_options(page)
+    options.setdefault('title_formatter', page['inputs'][0][1])
+    options.setdefault('slice_prefix', os.path.splitext(page['save_name'])[0])
+
+    inputs = []
+    for config, formatter in page['inputs']:
+        if formatter == options['title_formatter']:
+            inputs.append(histos[config])
+        else:
+            inputs.append([histos[config][formatter.format(h)] for h in range(1,7)])
+
+    slice_fits.plot_fits_mpl(histos1=inputs[0], histos2=inputs[1], **options)
+
+class SectorRenderer(object):
+    """ Renderer for plotting functions of the form
+    function(canvas, histos[, histos2], title_formatter=..., **options),
+    given the page inputs as (config, title formatter).  A class
+    rather than a closure so that it can be sent to workers. """
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, canvas, histos, page):
+        options = page_options(page)
+        options.setdefault('title_formatter', page['inputs'][0][1])
+        inputs = [histos[config] for config, _ in page['inputs']]
+        self.function(canvas, *inputs, **options)
+
+def sector_renderer(function):
+    return SectorRenderer(function)
+
+def page_options(page):
+    return dict((k, v) for k, v in page.items() if k not in page_keys)
+
+renderers = {
+    'pads':draw_pads,
+    'fits':draw_fits
+}
+
+# Per process state: the inputs, and one canvas per size.
+worker_histos = {}
+worker_canvases = {}
+
+def page_canvas(size):
+    if size not in worker_canvases:
+        name = 'can_{}_{}'.format(*size)
+        worker_canvases[size] = TCanvas(name, name, size[0], size[1])
+    return worker_canvases[size]
+
+def draw_page(page, canvas_size):
+    page = dict(page)
+    canvas = page_canvas(tuple(page.pop('canvas', canvas_size)))
+    with stage('draw'), stage(page['kind']):
+        renderers[page['kind']](canvas, worker_histos, page)
+        count('pages')
+
+def release_histos(needed):
+    """ Once a page is printed, let inputs opened with keep=False
+    drop the histograms no later page (needed, as later_histos)
+    draws.  Those that are needed stay as the page left them, as
+    they would with keep=True, so only the memory use changes. """
+    for config, histos in worker_histos.items():
+        if hasattr(histos, 'release'):
+            histos.release(set(name for c, name in needed if c == config))
+
+def draw_group(group, output_prefix, canvas_size):
+    """ Draw the pages of one group in order, return the saved names. """
+
+    saved = []
+    for page, needed in zip(group, later_histos(group)):
+        draw_page(dict(page, save_name=page['save_name'].format(output_prefix)), canvas_size)
+        release_histos(needed)
+        saved += page_outputs(page, output_prefix)
+
+    return saved
+
+def draw_pdf(pages, pdf_name, canvas_size):
+    """ Print the pages, in order, into one PDF file. """
+
+    canvas = page_canvas(canvas_size)
+    with stage('print'):
+        canvas.Print(pdf_name + '[')
+    for page, needed in zip(pages, later_histos(pages)):
+        draw_page(dict(page, save_name=pdf_name), canvas_size)
+        release_histos(needed)
+    with stage('print'):
+        canvas.Print(pdf_name + ']')
+
+    return pdf_name
+
+def init_page_worker(sources, store_dir, keep, extra_renderers, setup, profile):
+    """ Each worker opens its own inputs, and fits its slices itself. """
+    gROOT.SetBatch(True)
+    stage_timers.forget()
+    if profile:
+        stage_timers.enable()
+    slice_fits.fit_pool = None
+    slice_fits.pending_fits.clear()
+    renderers.update(extra_renderers or {})
+    if setup:
+        setup()
+    for config, path in sources.items():
+        worker_histos[config] = open_histos(path, store_dir=store_dir, keep=keep)
+
+# Workers send their stage timings back with the results.
+def draw_group_worker(args):
+    return draw_group(*args), stage_timers.drain()
+
+def draw_pdf_worker(args):
+    return draw_pdf(*args), stage_timers.drain()
+
+def page_pool(jobs, sources, store_dir, keep, extra_renderers, setup):
+    return multiprocessing.Pool(jobs, initializer=init_page_worker,
+                                initargs=(sources, store_dir, keep, extra_renderers, setup,
+                                          stage_timers.enabled))
+
+def page_key(page, histos, state):
+    """ BuildState key of a page: the page itself and the digests
+    of the histograms it draws (None for missing ones). """
+    digests = []
+    for config, name in sorted(page_histos(page)):
+        digests.append(histos[config].digest(name) if name in histos[config] else None)
+    return state.key(page, digests)
+
+def run_pages(pages, histos, sources, output_prefix, store_dir=None, jobs=1,
+              canvas_size=(1100, 800), extra_renderers=None, keep=True, setup=None,
+              state=None):
+    """ Draw every page, in jobs worker processes if more than one.
+
+    histos are the inputs already open in this process, used when
+    drawing here.  Workers open sources ({config: path}) themselves,
+    keep as in open_histos, and call setup (e.g. to set the style)
+    first.  With a BuildState, groups of pages whose outputs are all
+    up to date are skipped.  Returns the names of the saved files.
+    """
+
+    renderers.update(extra_renderers or {})
+    canvas_size = tuple(canvas_size)
+
+    groups = page_groups(pages)
+    if state is not None:
+        keys = dict((id(page), page_key(page, histos, state)) for page in pages)
+        groups = [group for group in groups
+                  if not all(state.is_current(output, keys[id(page)])
+                             for page in group for output in page_outputs(page, output_prefix))]
+
+        # Keep the order of the pages left to draw.
+        drawn = set(id(page) for group in groups for page in group)
+        state.skipped += len(pages) - len(drawn)
+        pages = [page for page in pages if id(page) in drawn]
+
+    if jobs <= 1 or len(groups) <= 1:
+        worker_histos.update(histos)
+        saved = draw_group(pages, output_prefix, canvas_size)
+    else:
+        # Largest groups first so that the short ones fill in the gaps.
+        groups.sort(key=len, reverse=True)
+        pool = page_pool(min(jobs, len(groups)), sources, store_dir, keep, extra_renderers, setup)
+        try:
+            saved = []
+            for names, events in pool.imap_unordered(draw_group_worker,
+                                                     [(g, output_prefix, canvas_size) for g in groups]):
+                saved += names
+                stage_timers.merge(events)
+        finally:
+            pool.terminate()
+
+    if state is not None:
+        for page in pages:
+            for output in page_outputs(page, output_prefix):
+                state.record(output, keys[id(page)])
+        state.built += len(pages)
+
+    return saved
+
+def pdf_merger():
+    """ Command joining PDF files in order without redrawing them,
+    as a function of (parts, output), or None if there is none. """
+    if which('pdfunite'):
+        return lambda parts, output: ['pdfunite'] + parts + [output]
+    if which('qpdf'):
+        return lambda parts, output: ['qpdf', '--empty', '--pages'] + parts + ['--', output]
+    return None
+
+def run_pdf(pages, histos, sources, pdf_name, store_dir=None, jobs=1,
+            canvas_size=(1100, 800), extra_renderers=None, keep=True, setup=None,
+            state=None):
+    """ Print every page into the PDF pdf_name, in the order given.
+
+    With jobs > 1 the pages are split into runs (twice as many as
+    workers, so a slow run does not hold up the rest) that workers
+    print into part files, joined at the end.  Without a tool to
+    join them the pages are printed here.  The PDF is one output
+    for a BuildState, redrawn whole if any page changed.  Other
+    arguments as for run_pages.
+    """
+
+    renderers.update(extra_renderers or {})
+    canvas_size = tuple(canvas_size)
+
+    if state is not None:
+        key = state.key([page_key(page, histos, state) for page in pages])
+        if state.is_current(pdf_name, key):
+            state.skipped += len(pages)
+            return pdf_name
+
+    draw_pages_pdf(pages, histos, sources, pdf_name, store_dir, jobs, canvas_size,
+                   extra_renderers, keep, setup)
+
+    if state is not None:
+        state.record(pdf_name, key)
+        state.built += len(pages)
+
+    return pdf_name
+
+def draw_pages_pdf(pages, histos, sources, pdf_name, store_dir, jobs, canvas_size,
+                   extra_renderers, keep, setup):
+    """ The drawing part of run_pdf. """
+
+    ranges = page_ranges(pages, 2 * jobs)
+    merger = pdf_merger()
+    if jobs > 1 and len(ranges) > 1 and merger is None:
+        print('No pdfunite or qpdf to join the parts, printing {} here'.format(pdf_name))
+
+    if jobs <= 1 or len(ranges) <= 1 or merger is None:
+        worker_histos.update(histos)
+        draw_pdf(pages, pdf_name, canvas_size)
+        return
+
+    base = os.path.splitext(pdf_name)[0]
+    parts = ['{}.part{}.pdf'.format(base, i) for i in range(len(ranges))]
+
+    pool = page_pool(min(jobs, len(ranges)), sources, store_dir, keep, extra_renderers, setup)
+    try:
+        for _, events in pool.map(draw_pdf_worker, [(r, part, canvas_size)
+                                                    for r, part in zip(ranges, parts)], 1):
+            stage_timers.merge(events)
+    finally:
+        pool.terminate()
+
+    with stage('merge_pdf'):
+        subprocess.check_call(merger(parts, pdf_name))
+    for part in parts:
+        os.remove(part)
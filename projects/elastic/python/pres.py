@@ -6,13 +6,8 @@ from ROOT import (TH1F, TH2F, TF1, TFile, TCanvas,
                   gPad, gStyle, TLatex, TLine, TGraphErrors,
                   TVector)
 
-
-def load_histos(file):
-    ''' Use the ROOT file structure to load a dictionary of histograms. '''
-    h = {}
-    for k in file.GetListOfKeys():
-        h[k.GetName()] = file.Get(k.GetName())
-    return h
+from lazy_histos import LazyHistos
+from slice_projector import SliceProjector
 
 def setup_global_options():
     gStyle.SetOptTitle(0)
@@ -223,6 +218,7 @@ def plot_theta_p(canvas, histos, save_name, label,
     canvas.Print(save_name)
 
 def fit_slices(histo, x_range, x_bin_step):
+    projector = SliceProjector.from_histo(histo)
     x_start = histo.GetXaxis().FindBin(x_range[0])
     x_stop =  histo.GetXaxis().FindBin(x_range[1])
 
@@ -230,7 +226,7 @@ def fit_slices(histo, x_range, x_bin_step):
     slices = [] 
     fits = [] 
     for i, x_bin in enumerate(range(x_start, x_stop + 1, x_bin_step)):
-        projec = histo.ProjectionY(histo.GetTitle() + '_proj{}'.format(i) , x_bin, x_bin + x_bin_step)
+        projec = projector.histogram(histo.GetTitle() + '_proj{}'.format(i), x_bin, x_bin + x_bin_step, histo.GetTitle())
         fit = TF1(histo.GetTitle()+'_fit{}'.format(i), 'gaus')
 
         projec.Fit(fit)
@@ -335,7 +331,7 @@ if __name__ == '__main__':
     input_rootfile = args.input_file
     output_pdfname = args.output_prefix + '.pdf'
     rootfile = TFile(input_rootfile)
-    histos = load_histos(rootfile)
+    histos = LazyHistos(rootfile)
         
     setup_global_options() 
 
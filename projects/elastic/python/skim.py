@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+""" Columnar skims of the elastic e-p candidates, written on the farm
+by skim-candidates.groovy (or here by SkimWriter) and memory-mapped
+for re-histogramming.
+
+A skim is a directory (name.skim) holding one raw little endian file
+per column (ele_p.bin, ...) and index.json with the dtype of each
+column, the number of rows and the rows added by each write (chunks).
+
+    skim = Skim('skim8_5032.skim')
+    p_ctof = skim['pro_p'][skim['ctof'] == 1]
+
+    python skim.py -i=skim8_5032.skim
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+from collections import OrderedDict
+
+import numpy as np
+
+from histo_store import swap_dir
+
+skim_version = 1
+
+# Columns of skim-candidates.groovy.  Angles are in degrees, dc hits
+# (x, y of the last layer of each region) nan when missing.
+candidate_columns = OrderedDict(
+    [(particle + '_' + v, '<f4') for particle in ['ele', 'pro']
+     for v in ['px', 'py', 'pz', 'p', 'theta', 'phi']] +
+    [('sector', '<i1'), ('ctof', '<i1'), ('chi2pid', '<f4')] +
+    [('dc{}_{}'.format(region, v), '<f4') for region in [1, 2, 3] for v in ['x', 'y']]
+)
+
+class SkimWriter(object):
+    """ Writes columns chunk by chunk, the index on close. """
+
+    def __init__(self, path, columns=candidate_columns):
+        self.path = path
+        self.columns = OrderedDict((name, np.dtype(dtype).str) for name, dtype in columns.items())
+        self.chunks = []
+
+        # Written next to the target and swapped in on close.
+        self.tmp_path = '{}.{}.tmp'.format(path.rstrip('/'), os.getpid())
+        if os.path.isdir(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(self.tmp_path)
+        self.files = dict((name, open(os.path.join(self.tmp_path, name + '.bin'), 'wb'))
+                          for name in self.columns)
+
+    def append(self, chunk):
+        """ Add rows, chunk holding an array for every column. """
+        sizes = set(len(chunk[name]) for name in self.columns)
+        if len(sizes) != 1:
+            raise ValueError('Columns of a chunk differ in length: {}'.format(sorted(sizes)))
+
+        rows = sizes.pop()
+        if rows == 0:
+            return
+        for name, dtype in self.columns.items():
+            self.files[name].write(np.ascontiguousarray(chunk[name], dtype=dtype).tobytes())
+        self.chunks.append(rows)
+
+    def close(self):
+        for column_file in self.files.values():
+            column_file.close()
+
+        with open(os.path.join(self.tmp_path, 'index.json'), 'w') as index_file:
+            json.dump({'version':skim_version, 'rows':sum(self.chunks), 'chunks':self.chunks,
+                       'columns':self.columns}, index_file, indent=1)
+
+        swap_dir(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            for column_file in self.files.values():
+                column_file.close()
+            shutil.rmtree(self.tmp_path)
+        return False
+
+class Skim(object):
+    """ Read-only columns of a skim, each mapped when first used. """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'index.json')) as index_file:
+            index = json.load(index_file, object_pairs_hook=OrderedDict)
+        self.rows = index['rows']
+        self.chunk_sizes = index['chunks']
+        self.dtypes = OrderedDict((name, np.dtype(dtype)) for name, dtype in index['columns'].items())
+        self.mapped = {}
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, name):
+        return name in self.dtypes
+
+    def keys(self):
+        return list(self.dtypes)
+
+    def __getitem__(self, name):
+        if name not in self.mapped:
+            if name not in self.dtypes:
+                raise KeyError(name)
+            if self.rows == 0:
+                self.mapped[name] = np.zeros(0, dtype=self.dtypes[name])
+            else:
+                self.mapped[name] = np.memmap(os.path.join(self.path, name + '.bin'), mode='r',
+                                              dtype=self.dtypes[name], shape=(self.rows,))
+        return self.mapped[name]
+
+    def chunks(self, chunk_size=None, columns=None):
+        """ Dicts of column slices, chunk_size rows at a time, or as
+        the chunks were written. """
+        columns = self.keys() if columns is None else columns
+        if chunk_size is None:
+            bounds = np.concatenate([[0], np.cumsum(self.chunk_sizes)]).astype(int)
+        else:
+            bounds = list(range(0, self.rows, chunk_size)) + [self.rows]
+
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            yield dict((name, self[name][start:stop]) for name in columns)
+
+def skim_chunks(path, chunk_size):
+    """ Reader of event_loop. """
+    return Skim(path).chunks(chunk_size)
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-i', '--input_skims', nargs='+', required=True)
+    args = ap.parse_args()
+
+    for path in args.input_skims:
+        skim = Skim(path)
+        size = sum(os.path.getsize(os.path.join(path, name + '.bin')) for name in skim.keys())
+        print('{}: {} rows in {} chunks, {:.1f} MB'.format(path, len(skim), len(skim.chunk_sizes), size / 1e6))
+        for name in skim.keys():
+            print('  {0:12s} {1}'.format(name, skim.dtypes[name].str))
@@ -0,0 +1,567 @@
+#!/usr/bin/env python
+
+""" Gaussian fits to the y-slices of sector histograms, shared by
+es.py, data_sim.py and data_sim_rad.py. """
+
+import atexit
+import multiprocessing
+import os
+import numpy as np
+
+from collections import namedtuple
+
+# Trick for docker install to run headless
+# and never use plt.show() 
+import matplotlib
+matplotlib.use('agg')
+import matplotlib.pyplot as plt 
+
+from ROOT import (TH1, TH2F, TF1, TCanvas, TLatex, SetOwnership,
+                  gROOT)
+
+from fit_cache import FitCache
+from gaus_fit import (estimate_gaussians, fast_fit_gaussians, status_empty,
+                      status_not_converged, status_ok)
+from histo_utils import axis_edges, bin_buffers
+from slice_projector import SliceProjector, adaptive_slices
+from stage_timers import count, stage
+
+default_histo2d = TH2F('default_slices', '', 100, 0, 1, 100, 0, 1)
+
+# Results are shared between plot_fits_mpl and output_slice_pdf
+# in memory, and kept between runs if given a cache_dir.
+fit_cache = FitCache()
+
+# Either 'root' (TF1 fit of each slice), 'ordered' (TF1 fits
+# moving out from the fullest slice, see run_ordered_fits) or
+# 'numpy' (gaus_fit of all slices of all sectors together).
+fit_method = 'root'
+
+# The ordered method leaves slices with fewer entries than this in
+# the fit range alone, and retries failed fits over a range wider
+# by this fraction of the fit range on each side.
+min_slice_entries = 20
+retry_widening = 0.5
+
+# Slices are x_bin_step x-bins wide, unless slice_entries (or
+# slice_precision, the error on the mean each slice should give)
+# is set.  Then they hold about that many entries each, see
+# slice_projector.adaptive_slices.
+slice_entries = None
+slice_precision = None
+
+# What fit_slices returns, x_width being the width of each slice.
+# mu and sigma are nan for slices whose status is not status_ok.
+SliceFits = namedtuple('SliceFits', ['x', 'mu', 'sigma', 'slices', 'fits', 'status', 'x_width'])
+
+# Worker processes for the root method, the process that started
+# them, and the fits they are working on keyed like the cache.
+fit_pool = None
+fit_pool_pid = None
+pending_fits = {}
+
+def setup_slice_fits(cache_dir=None, method='root', jobs=1, entries=None, precision=None):
+    """ Apply the command line options of the calling script. """
+    global fit_method, fit_pool, fit_pool_pid, slice_entries, slice_precision
+    fit_cache.cache_dir = cache_dir
+    fit_method = method
+    slice_entries = entries
+    slice_precision = precision
+
+    # Start the workers early, while there is little to fork.
+    if jobs > 1 and fit_pool is None:
+        fit_pool = multiprocessing.Pool(jobs, initializer=init_worker)
+        fit_pool_pid = os.getpid()
+        atexit.register(fit_pool.terminate)
+
+def fit_workers():
+    """ The fit pool, None in processes forked after it was started
+    (page workers), which fit their slices themselves. """
+    return fit_pool if fit_pool_pid == os.getpid() else None
+
+def slicing():
+    """ The adaptive slicing settings, None for fixed steps. """
+    if slice_entries is None and slice_precision is None:
+        return None
+    return {'entries':slice_entries, 'precision':slice_precision}
+
+def slice_bounds(projectors, x_range, x_bin_step, y_fit_range, adaptive=None):
+    """ (first x-bins, last x-bins, centers, widths) of the slices
+    of each projector, adaptive ones if given the slicing(). """
+    if adaptive is not None:
+        return adaptive_slices(projectors, x_range, adaptive['entries'],
+                               adaptive['precision'], y_fit_range)
+
+    bounds = []
+    for projector in projectors:
+        x_bins, x_values = projector.slices(x_range, x_bin_step)
+        widths = np.array([projector.bin_center(b + x_bin_step) - projector.bin_center(b)
+                           for b in x_bins])
+        bounds.append((x_bins, x_bins + x_bin_step, x_values, widths))
+    return bounds
+
+def fit_slices(histo, x_range, x_bin_step, y_fit_range, cache=None, method=None):
+    """ Fit a gaussian to the y-projection of every x_bin_step x-bins,
+    or of adaptive slices (see slice_entries), returning SliceFits.
+    Repeated calls with the same histogram content and settings
+    are served from the cache instead of being refit. """
+    return fit_slices_batch([histo], x_range, x_bin_step, y_fit_range, cache, method)[0]
+
+def fit_slices_batch(histos, x_range, x_bin_step, y_fit_range, cache=None, method=None):
+    """ fit_slices for a list of histograms.  With the numpy method
+    every histogram not already cached is fit in a single call. """
+
+    with stage('fit_slices'):
+        if cache is None:
+            cache = fit_cache
+        if method is None:
+            method = fit_method
+
+        adaptive = slicing()
+        keys = [cache.key(h, x_range, x_bin_step, y_fit_range, method, adaptive) for h in histos]
+        results = [cache.get(key) for key in keys]
+        records = [cache.load(key) if result is None else None for key, result in zip(keys, results)]
+
+        # Records that are new and still need to go to disk.
+        fresh = [i for i in range(len(histos)) if results[i] is None and records[i] is None]
+
+        # Wait for the ones already sent to the workers.
+        for i in fresh:
+            if fit_workers() is not None and keys[i] in pending_fits:
+                records[i] = pending_fits.pop(keys[i]).get()
+
+        # Slices of everything to fit or rebuild, found in one go.
+        work = [i for i in range(len(histos)) if results[i] is None]
+        projectors = dict((i, SliceProjector.from_histo(histos[i])) for i in work)
+        bounds = dict(zip(work, slice_bounds([projectors[i] for i in work], x_range,
+                                             x_bin_step, y_fit_range, adaptive)))
+
+        todo = [i for i in fresh if records[i] is None]
+        if method == 'numpy' and todo:
+            fitted = numpy_slice_records([projectors[i] for i in todo], [bounds[i] for i in todo],
+                                         y_fit_range)
+            for i, record in zip(todo, fitted):
+                records[i] = record
+
+        for i, histo in enumerate(histos):
+            if results[i] is not None:
+                continue
+
+            # The key goes into the object names, data and sim histograms
+            # share titles and ROOT would otherwise reuse the projections.
+            suffix = '_' + keys[i][:8]
+            if records[i] is None:
+                results[i] = run_slice_fits(projectors[i], histo.GetTitle(), bounds[i], y_fit_range,
+                                            suffix, method)
+                records[i] = slice_record(results[i])
+            else:
+                results[i] = restore_slice_fits(projectors[i], histo.GetTitle(), bounds[i], y_fit_range,
+                                                records[i], suffix)
+
+            cache.put(keys[i], results[i], records[i] if i in fresh else None)
+
+        # Slices fit by this call, here or by the workers.
+        count('fits', sum(len(records[i]['x']) for i in fresh))
+        return results
+
+def prefetch_slice_fits(histos, x_range, x_bin_step, y_fit_range, cache=None, method=None):
+    """ Start fitting histograms that fit_slices will be asked for.
+    With worker processes the fits run in the background, and
+    fit_slices only waits for the one it needs.  Otherwise they are
+    all done now, in one call for the numpy method. """
+
+    if cache is None:
+        cache = fit_cache
+    if method is None:
+        method = fit_method
+
+    # The numpy fit of every slice at once is already faster
+    # than shipping the histograms to other processes.
+    pool = fit_workers()
+    if pool is None or method == 'numpy':
+        fit_slices_batch(histos, x_range, x_bin_step, y_fit_range, cache, method)
+        return
+
+    adaptive = slicing()
+    for histo in histos:
+        key = cache.key(histo, x_range, x_bin_step, y_fit_range, method, adaptive)
+        if key in pending_fits or cache.get(key) is not None or cache.has_record(key):
+            continue
+
+        # Workers get plain arrays, never ROOT objects.
+        pending_fits[key] = pool.apply_async(
+            fit_slices_worker, (histo_arrays(histo), x_range, x_bin_step, y_fit_range, method, adaptive))
+
+def init_worker():
+    gROOT.SetBatch(True)
+
+    # The worker histograms are private, keep them out of
+    # gDirectory so that reusing their names is quiet.
+    TH1.AddDirectory(False)
+
+def histo_arrays(histo):
+    """ What a worker needs to project the slices of a TH2. """
+    values, sumw2 = bin_buffers(histo)
+    return {
+        'title':histo.GetTitle(),
+        'values':np.array(values, dtype=np.float64),
+        'sumw2':np.array(sumw2, dtype=np.float64),
+        'x_edges':np.array(axis_edges(histo.GetXaxis())),
+        'y_edges':np.array(axis_edges(histo.GetYaxis())),
+        'uniform_x':histo.GetXaxis().GetXbins().GetSize() == 0
+    }
+
+def fit_slices_worker(arrays, x_range, x_bin_step, y_fit_range, method='root', adaptive=None):
+    """ Runs in a worker: the record of run_slice_fits on
+    the histogram described by histo_arrays. """
+
+    projector = SliceProjector(arrays['values'], arrays['sumw2'], arrays['x_edges'],
+                               arrays['y_edges'], uniform_x=arrays['uniform_x'])
+    bounds = slice_bounds([projector], x_range, x_bin_step, y_fit_range, adaptive)[0]
+    return slice_record(run_slice_fits(projector, arrays['title'], bounds, y_fit_range, method=method))
+
+def run_slice_fits(projector, title, bounds, y_fit_range, suffix='', method='root'):
+    run = run_ordered_fits if method == 'ordered' else run_projector_fits
+    return run(projector, title, bounds, y_fit_range, suffix)
+
+def run_projector_fits(projector, title, bounds, y_fit_range, suffix=''):
+    """ Fit a TF1 gaus to each slice (see slice_bounds) in ROOT. """
+
+    x_bins, x_lasts, x_values, x_widths = bounds
+
+    slices = []
+    fits = []
+    status = []
+    for i, (x_bin, x_last) in enumerate(zip(x_bins, x_lasts)):
+        projec = projector.histogram(title + '_proj{}'.format(i) + suffix, x_bin, x_last, title)
+
+        fit = TF1(title + '_fit{}'.format(i) + suffix, 'gaus')
+        fit.SetTitle(title + '_fit{}'.format(i))
+        fit.SetName(title + '_fit{}'.format(i) + suffix)
+
+        if y_fit_range:
+            fit.SetParameter(1, 0.5 * (y_fit_range[0] + y_fit_range[1]))
+
+        if projec.Integral(projec.FindBin(y_fit_range[0]), projec.FindBin(y_fit_range[1])) <= 0:
+            status.append(status_empty)
+        elif int(projec.Fit(fit, 'R', '',  y_fit_range[0], y_fit_range[1])) == 0:
+            status.append(status_ok)
+        else:
+            status.append(status_not_converged)
+
+        slices.append(projec)
+        fits.append(fit)
+
+    status = np.array(status, dtype=int)
+    means, stds = fit_points([[f.GetParameter(p) for p in range(3)] for f in fits], status)
+    return SliceFits(np.array(x_values), means, stds, slices, fits, status, np.array(x_widths))
+
+def run_ordered_fits(projector, title, bounds, y_fit_range, suffix=''):
+    """ Fit a TF1 gaus to each slice in ROOT, starting with the slice
+    with the most entries in y_fit_range and moving out both ways.
+    mu and sigma change slowly with x, so each fit starts from the
+    last good fit next to it (the first one from estimate_gaussians),
+    and converges in few steps.
+
+    Slices with fewer than min_slice_entries are not fit and get
+    status_empty.  A fit that fails is tried once more from scratch
+    over a wider range before it gets status_not_converged.
+    """
+
+    x_bins, x_lasts, x_values, x_widths = bounds
+    counts, errors = projector.project(x_bins, x_lasts)
+    y_centers = projector.y_centers
+    in_range = (y_centers >= y_fit_range[0]) & (y_centers <= y_fit_range[1])
+    entries = counts[:, in_range].sum(axis=-1)
+    estimates, good = estimate_gaussians(y_centers, counts, errors, fit_range=y_fit_range)
+
+    slices = []
+    fits = []
+    for i, (x_bin, x_last) in enumerate(zip(x_bins, x_lasts)):
+        slices.append(projector.histogram(title + '_proj{}'.format(i) + suffix, x_bin, x_last, title))
+
+        fit = TF1(title + '_fit{}'.format(i) + suffix, 'gaus', y_fit_range[0], y_fit_range[1])
+        fit.SetTitle(title + '_fit{}'.format(i))
+        fits.append(fit)
+
+    # (slice, neighbour it starts from), outwards from the fullest.
+    start = int(np.argmax(entries)) if len(x_bins) else 0
+    order = ([(start, None)] + [(i, i - 1) for i in range(start + 1, len(x_bins))]
+             + [(i, i + 1) for i in range(start - 1, -1, -1)])
+
+    status = np.full(len(x_bins), status_empty, dtype=int)
+    seeds = {}
+    for i, neighbour in order:
+        seed = seeds.get(neighbour)
+        if seed is None and good[i]:
+            seed = estimates[i]
+
+        if entries[i] >= min_slice_entries:
+            if fit_ordered_slice(slices[i], fits[i], seed, y_fit_range, projector.y_edges):
+                status[i] = status_ok
+                seed = [fits[i].GetParameter(p) for p in range(3)]
+            else:
+                status[i] = status_not_converged
+
+        # Failed and skipped slices pass their own start along.
+        seeds[i] = seed
+
+    means, stds = fit_points([[f.GetParameter(p) for p in range(3)] for f in fits], status)
+    return SliceFits(np.array(x_values), means, stds, slices, fits, status, np.array(x_widths))
+
+def fit_ordered_slice(projec, fit, seed, y_fit_range, y_edges):
+    """ Fit one slice for run_ordered_fits, starting from seed
+    (amplitude, mu, sigma) if given.  True if the fit converged
+    with mu inside the range it was fit over. """
+
+    low, high = y_fit_range
+    for attempt in range(2):
+        if attempt > 0:
+            widening = retry_widening * (high - low)
+            low, high = max(low - widening, y_edges[0]), min(high + widening, y_edges[-1])
+            seed = None
+            count('retries')
+
+        if seed is None:
+            fit.SetParameters(projec.GetMaximum(), 0.5 * (low + high), 0.25 * (high - low))
+        else:
+            fit.SetParameters(projec.GetMaximum(), seed[1], abs(seed[2]))
+
+        fit.SetRange(low, high)
+        if (int(projec.Fit(fit, 'RQ', '', low, high)) == 0 and fit.GetParameter(2) != 0
+            and low <= fit.GetParameter(1) <= high):
+            return True
+
+    return False
+
+def slice_record(result):
+    """ The numbers from a fit_slices result, as plain lists
+    that survive json. """
+
+    fits = result.fits
+    return {
+        'x':list(result.x),
+        'x_width':list(result.x_width),
+        'params':[[f.GetParameter(p) for p in range(3)] for f in fits],
+        'errors':[[f.GetParError(p) for p in range(3)] for f in fits],
+        'chi2':[f.GetChisquare() for f in fits],
+        'ndf':[f.GetNDF() for f in fits],
+        'status':[int(s) for s in result.status]
+    }
+
+def numpy_slice_records(projectors, bounds, y_fit_range):
+    """ Records (see slice_record) for the slices (see slice_bounds)
+    of each projector, fit with gaus_fit.  Histograms that share the y
+    binning and slice count (like the six sectors of data and sim) go
+    into the same batched fit. """
+
+    arrays = []
+    for projector, (x_bins, x_lasts, x_values, x_widths) in zip(projectors, bounds):
+        counts, errors = projector.project(x_bins, x_lasts)
+        arrays.append((x_values, projector.y_centers, counts, errors, x_widths))
+
+    groups = {}
+    for i, (x, y_centers, counts, errors, _) in enumerate(arrays):
+        groups.setdefault((counts.shape, y_centers.tobytes()), []).append(i)
+
+    records = [None] * len(projectors)
+    for members in groups.values():
+        y_centers = arrays[members[0]][1]
+        counts = np.array([arrays[i][2] for i in members])
+        errors = np.array([arrays[i][3] for i in members])
+        fit = fast_fit_gaussians(y_centers, counts, errors, fit_range=y_fit_range)
+
+        # Failed fits are kept as zero, like a TF1 that never moved,
+        # their points become nan again in restore_slice_fits.
+        params = np.nan_to_num(np.stack([fit.amplitude, fit.mu, fit.sigma], axis=-1))
+        param_errors = np.nan_to_num(np.stack([fit.amplitude_err, fit.mu_err, fit.sigma_err], axis=-1))
+        chi2 = np.nan_to_num(fit.chi2)
+
+        for j, i in enumerate(members):
+            records[i] = {
+                'x':np.asarray(arrays[i][0]).tolist(),
+                'x_width':np.asarray(arrays[i][4]).tolist(),
+                'params':params[j].tolist(),
+                'errors':param_errors[j].tolist(),
+                'chi2':chi2[j].tolist(),
+                'ndf':np.maximum(fit.ndf[j], 0).tolist(),
+                'status':fit.status[j].tolist()
+            }
+
+    return records
+
+def restore_slice_fits(projector, title, bounds, y_fit_range, record, suffix=''):
+    """ Rebuild the slices and fit functions of a record, without fitting. """
+
+    x_bins, x_lasts, x_values, x_widths = bounds
+
+    slices = []
+    fits = []
+    for i, (x_bin, x_last) in enumerate(zip(x_bins, x_lasts)):
+        projec = projector.histogram(title + '_proj{}'.format(i) + suffix, x_bin, x_last, title)
+
+        fit = TF1(title + '_fit{}'.format(i) + suffix, 'gaus', y_fit_range[0], y_fit_range[1])
+        fit.SetTitle(title + '_fit{}'.format(i))
+        for p in range(3):
+            fit.SetParameter(p, record['params'][i][p])
+            fit.SetParError(p, record['errors'][i][p])
+        fit.SetChisquare(record['chi2'][i])
+        fit.SetNDF(record['ndf'][i])
+
+        # Fit() would have attached a copy for drawing, the
+        # histogram owns (and deletes) the copy.
+        drawn = fit.Clone()
+        SetOwnership(drawn, False)
+        projec.GetListOfFunctions().Add(drawn)
+
+        slices.append(projec)
+        fits.append(fit)
+
+    status = np.array(record['status'], dtype=int)
+    means, stds = fit_points(record['params'], status)
+    return SliceFits(np.array(x_values), means, stds, slices, fits, status, np.array(record['x_width']))
+
+def fit_points(params, status):
+    """ mu and sigma of each (amplitude, mu, sigma) in params, nan
+    where the fit is empty or did not converge, so that a failed fit
+    is never read as a peak at 0. """
+    params = np.array(params, dtype=np.float64).reshape(-1, 3)
+    params[np.asarray(status) != status_ok] = np.nan
+    return params[:, 1], params[:, 2]
+
+def plot_fits_mpl(histos1, histos2, config1, config2,
+                  x_range, x_bin_step, title_formatter, y_fit_range,
+                  save_name, y_range=None, title=None,
+                  xtitle=None, ytitle=None, max_errorbar=0.5,
+                  hline=None, x_shift=None, slice_prefix=None):
+    
+    fig = plt.figure(figsize=(16,12))
+
+    # Plot options for each type. 
+    opts1 = {'marker':'o', 'linestyle':'', 'color':'k'}
+    opts2 = {'marker':'o', 'linestyle':'', 'color':'red'}
+    
+    # Start on all sectors of both inputs up front, the loop below
+    # then draws each sector as soon as its fits are ready.
+    print('Fitting: ', title_formatter)
+    prefetch_slice_fits([sector_histo(histos1, title_formatter, i) for i in range(1,7)] +
+                     [sector_histo(histos2, title_formatter, i) for i in range(1,7)],
+                     x_range, x_bin_step, y_fit_range)
+
+    for i in range(1,7):
+
+        ax = fig.add_subplot(2, 3, i)
+
+        # Get histogram slices for plotting. 
+        fits1 = fit_slices(sector_histo(histos1, title_formatter, i), x_range, x_bin_step, y_fit_range)
+        fits2 = fit_slices(sector_histo(histos2, title_formatter, i), x_range, x_bin_step, y_fit_range)
+
+        x1, mu1, sig1, xerr1 = slice_points(fits1, max_errorbar)
+        x2, mu2, sig2, xerr2 = slice_points(fits2, max_errorbar)
+
+        if x_shift:
+            x2 += 0.5 * (x2[1]-x2[0])
+        
+        label1 = 'Sector {} ({})'.format(i, config1)
+        label2 = 'Sector {} ({})'.format(i, config2)
+
+        # Draw things 
+        ax.errorbar(x1, mu1, sig1, xerr1, label=label1, **opts1)
+        ax.errorbar(x2, mu2, sig2, xerr2, label=label2, **opts2)
+
+        if y_range:
+            ax.set_ylim(y_range)
+
+        # Add center line
+        if hline:
+            ax.axhline(hline, linestyle='--', linewidth=1, color='k', alpha=0.85)
+
+        # Add a grid
+        ax.grid(alpha=0.2)
+
+        # Legend
+        ax.legend(frameon=False)
+        
+        if title:
+            ax.set_title(title)
+
+        if xtitle:
+            ax.set_xlabel(xtitle)
+
+        if ytitle:
+            ax.set_ylabel(ytitle)
+            
+    fig.tight_layout()
+    with stage('print'):
+        fig.savefig(save_name, bbox_inches='tight')
+
+    output_slice_pdf(histos1, title_formatter, 'data', x_range, x_bin_step, y_fit_range, slice_prefix)
+    output_slice_pdf(histos2, title_formatter, 'sim', x_range, x_bin_step, y_fit_range, slice_prefix)
+
+def sector_histo(histos, title_formatter, sector):
+    """ Sector histogram from either a dictionary of histograms
+    (looked up with title_formatter) or a list of six. """
+
+    # Somebody passed actual histograms, should be six of them 
+    if isinstance(histos, list):
+        return histos[sector - 1]
+
+    # Somebody wants that we should get the histograms ourselves
+    return histos.get(title_formatter.format(sector), default_histo2d)
+
+def slice_pdf_name(prefix, sub_title):
+    return prefix + '_' + sub_title + '_slices.pdf'
+
+def output_slice_pdf(histos, title_formatter, sub_title, x_range, x_bin_step, y_fit_range,
+                     slice_prefix=None):
+    """ Debugging of the fits for slices, into <slice_prefix>_<sub_title>_slices.pdf,
+    the prefix being the title_formatter up to its '_{}' if not given. """
+
+    lab = TLatex()
+    lab.SetNDC()
+    lab.SetTextSize(0.03)
+    
+    slice_can = TCanvas('slice_can', 'slice_can', 1200, 1600)
+    slice_pdfname = slice_pdf_name(slice_prefix or title_formatter.split('_{}')[0], sub_title)
+    with stage('print'):
+        slice_can.Print(slice_pdfname + '[')
+    for i in range(1,7):
+        result = fit_slices(sector_histo(histos, title_formatter, i), x_range, x_bin_step, y_fit_range)
+
+        nrows = 5
+        ncols = int(np.ceil(len(result.slices) / nrows) + 1)
+        slice_can.Clear()
+        slice_can.Divide(ncols, nrows)
+        for j, (s,f) in enumerate(zip(result.slices, result.fits)):
+            slice_can.cd(j+1)
+            s.Draw()
+            lab.DrawLatex(0.15, 0.88, '#mu = {0:6.4f}, #sigma = {1:6.4f}'.format(f.GetParameter(1), f.GetParameter(2)))
+
+        with stage('print'):
+            slice_can.Print(slice_pdfname)
+    with stage('print'):
+        slice_can.Print(slice_pdfname + ']')
+    
+    
+def slice_points(result, max_errorbar):
+    """ (x, mu, sigma, x errors) of the good fits in result, the x
+    errors being half the slice widths when slicing is adaptive. """
+    x, mu, sig = remove_bad_points(result.x, result.mu, result.sigma, max_errorbar, result.status)
+    if slicing() is None:
+        return x, mu, sig, None
+    with np.errstate(invalid='ignore'):
+        good = np.logical_and(result.status == status_ok, result.sigma < max_errorbar)
+    return x, mu, sig, 0.5 * result.x_width[good]
+
+def remove_bad_points(x, mu, sig, max_errorbar, status=None):
+    """ The points with sig below max_errorbar whose fits worked,
+    by their status if given, else by mu being a number other than
+    exactly 0. """
+    with np.errstate(invalid='ignore'):
+        if status is None:
+            condition = np.logical_and(np.isfinite(mu) & (mu != 0), sig < max_errorbar)
+        else:
+            condition = np.logical_and(status == status_ok, sig < max_errorbar)
+    idx = np.where(condition)[0]
+    return x[idx], mu[idx], sig[idx]
+
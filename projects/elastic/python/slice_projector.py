@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+""" y-projections of x-bin ranges of a TH2, from cumulative sums. """
+
+import numpy as np
+
+from histo_utils import axis_edges, bin_buffers
+from stage_timers import count
+
+class SliceProjector(object):
+    """ Sums over any range of x-bins of a TH2 without ROOT.
+
+    The contents and sum of squared weights are summed along x once,
+    after which each projection is the difference of two rows, O(ny)
+    whatever the range.  Bin numbers follow ROOT: 0 is the underflow,
+    nx + 1 the overflow, and ranges include both end bins like
+    ProjectionY(name, first, last).
+    """
+
+    def __init__(self, values, sumw2, x_edges, y_edges, uniform_x=True):
+        values = np.asarray(values, dtype=np.float64)
+        sumw2 = np.asarray(sumw2, dtype=np.float64)
+
+        # Row k holds the sum of x-bins 0..k-1, y flow bins included.
+        shape = (values.shape[0] + 1, values.shape[1])
+        self.cum_values = np.zeros(shape)
+        self.cum_sumw2 = np.zeros(shape)
+        np.cumsum(values, axis=0, out=self.cum_values[1:])
+        np.cumsum(sumw2, axis=0, out=self.cum_sumw2[1:])
+
+        self.x_edges = np.asarray(x_edges, dtype=np.float64)
+        self.y_edges = np.asarray(y_edges, dtype=np.float64)
+        self.uniform_x = uniform_x
+        self.nx = len(self.x_edges) - 1
+        self.y_centers = 0.5 * (self.y_edges[1:] + self.y_edges[:-1])
+
+    @classmethod
+    def from_histo(cls, histo):
+        values, sumw2 = bin_buffers(histo)
+        x_axis = histo.GetXaxis()
+        return cls(values, sumw2, axis_edges(x_axis), axis_edges(histo.GetYaxis()),
+                   uniform_x=x_axis.GetXbins().GetSize() == 0)
+
+    def find_bin(self, x):
+        """ TAxis::FindBin on the x axis. """
+        if x < self.x_edges[0]:
+            return 0
+        if not x < self.x_edges[-1]:
+            return self.nx + 1
+        if self.uniform_x:
+            width = self.x_edges[-1] - self.x_edges[0]
+            return 1 + int(self.nx * (x - self.x_edges[0]) / width)
+        return int(np.searchsorted(self.x_edges, x, side='right'))
+
+    def bin_center(self, x_bin):
+        """ TAxis::GetBinCenter on the x axis, extrapolated
+        uniformly outside 1..nx like ROOT does. """
+        if self.uniform_x or x_bin < 1 or x_bin > self.nx:
+            width = (self.x_edges[-1] - self.x_edges[0]) / self.nx
+            return self.x_edges[0] + (x_bin - 0.5) * width
+        return 0.5 * (self.x_edges[x_bin - 1] + self.x_edges[x_bin])
+
+    def clip(self, first, last):
+        """ Range ProjectionY would use for first, last. """
+        first = np.maximum(first, 0)
+        last = np.minimum(last, self.nx + 1)
+        return first, last
+
+    def project(self, first, last, flow=False):
+        """ Contents and errors of the projection of x-bins first..last.
+        first and last may also be arrays of the same length, giving
+        (slices, y bins) arrays.  The y flow bins are left out unless
+        flow is set. """
+
+        first, last = self.clip(np.asarray(first), np.asarray(last))
+        count('projections', first.size)
+        counts = self.cum_values[last + 1] - self.cum_values[first]
+        sumw2 = self.cum_sumw2[last + 1] - self.cum_sumw2[first]
+
+        if not flow:
+            counts, sumw2 = counts[..., 1:-1], sumw2[..., 1:-1]
+        return counts, np.sqrt(np.abs(sumw2))
+
+    def slices(self, x_range, x_bin_step):
+        """ First x-bin of every x_bin_step wide slice of x_range, and
+        the slice centers, as the fit_slices functions lay them out. """
+
+        x_start = self.find_bin(x_range[0])
+        x_stop = self.find_bin(x_range[1])
+        x_bins = np.arange(x_start, x_stop + 1, x_bin_step)
+        x_values = np.array([0.5 * (self.bin_center(b) + self.bin_center(b + x_bin_step))
+                             for b in x_bins])
+        return x_bins, x_values
+
+    def x_counts(self, y_range=None):
+        """ Entries of every x-bin, flow bins included, summed over
+        the y-bins with centers in y_range (all of them if None). """
+        keep = np.ones(len(self.y_centers) + 2, dtype=bool)
+        if y_range is not None:
+            keep[1:-1] = (self.y_centers >= y_range[0]) & (self.y_centers <= y_range[1])
+            keep[[0, -1]] = False
+        return np.diff(self.cum_values[:, keep].sum(axis=1))
+
+    def slice_target(self, x_range, entries=None, precision=None, y_range=None):
+        """ Entries a slice needs: entries, or as many as bring the
+        error on the mean, rms / sqrt(n) with the rms of y over all
+        of x_range, down to precision.  The smaller if both are given. """
+        targets = [] if entries is None else [float(entries)]
+        if precision is not None:
+            counts, _ = self.project(self.find_bin(x_range[0]), self.find_bin(x_range[1]))
+            if y_range is not None:
+                counts = np.where((self.y_centers >= y_range[0]) & (self.y_centers <= y_range[1]),
+                                  counts, 0.0)
+            total = max(counts.sum(), 1e-300)
+            mean = np.sum(counts * self.y_centers) / total
+            rms = np.sqrt(np.sum(counts * (self.y_centers - mean)**2) / total)
+            targets.append((rms / precision)**2)
+        return max(min(targets), 1.0)
+
+    def adaptive_slices(self, x_range, entries=None, precision=None, y_range=None):
+        """ Slices of x_range holding about the same number of entries,
+        see adaptive_slices below. """
+        return adaptive_slices([self], x_range, entries, precision, y_range)[0]
+
+    def bounds_centers(self, first, last):
+        """ Centers and widths of the x-bin ranges first..last. """
+        first, last = self.clip(np.asarray(first), np.asarray(last))
+        low = np.array([self.bin_center(b) for b in first]) - 0.5 * self.bin_width(first)
+        high = np.array([self.bin_center(b) for b in last]) + 0.5 * self.bin_width(last)
+        return 0.5 * (low + high), high - low
+
+    def bin_width(self, x_bins):
+        x_bins = np.clip(np.asarray(x_bins), 1, self.nx)
+        if self.uniform_x:
+            return np.full(x_bins.shape, (self.x_edges[-1] - self.x_edges[0]) / self.nx)
+        return self.x_edges[x_bins] - self.x_edges[x_bins - 1]
+
+    def histogram(self, name, first, last, title=None):
+        """ The projection as a TH1D, in place of ProjectionY.  It is
+        not attached to any directory, so names never clash. """
+        from ROOT import TH1D
+
+        histo = TH1D(name, title or name, len(self.y_edges) - 1, self.y_edges)
+        histo.SetDirectory(0)
+        histo.Sumw2()
+
+        counts, errors = self.project(first, last, flow=True)
+        values, sumw2 = bin_buffers(histo)
+        values[...] = counts
+        sumw2[...] = errors**2
+
+        histo.ResetStats()
+        return histo
+
+def equal_stat_bounds(x_counts, start, stop, target):
+    """ First x-bin of each slice of the bins start..stop, for every
+    row of x_counts (..., nx+2), cutting where the cumulative count
+    passes a multiple of target (broadcast to the rows).  Slices
+    hold about target entries each, a short last one is joined to
+    the one before.  Returns one array per row, rows flattened. """
+
+    counts = np.asarray(x_counts, dtype=np.float64)[..., start:stop + 1]
+    target = np.broadcast_to(np.asarray(target, dtype=np.float64), counts.shape[:-1]).reshape(-1)
+    counts = counts.reshape(-1, counts.shape[-1])
+
+    # Each bin goes to the slice given by the entries before it.
+    before = np.cumsum(counts, axis=-1) - counts
+    ids = np.floor(before / target[:, None])
+    new = np.ones(ids.shape, dtype=bool)
+    new[:, 1:] = ids[:, 1:] != ids[:, :-1]
+    totals = counts.sum(axis=-1)
+
+    bounds = []
+    for row, starts in enumerate(new):
+        starts = np.flatnonzero(starts)
+        if len(starts) > 1 and totals[row] - before[row, starts[-1]] < target[row]:
+            starts = starts[:-1]
+        bounds.append(start + starts)
+    return bounds
+
+def adaptive_slices(projectors, x_range, entries=None, precision=None, y_range=None):
+    """ (first, last, centers, widths) of equal statistics slices of
+    x_range for each projector, holding about entries each, or the
+    number giving precision on the mean (see slice_target).  Only
+    entries with y in y_range count.  Projectors that share their
+    x binning, like the six sectors, are sliced together. """
+
+    groups = {}
+    for i, projector in enumerate(projectors):
+        groups.setdefault(projector.x_edges.tobytes(), []).append(i)
+
+    results = [None] * len(projectors)
+    for members in groups.values():
+        first = projectors[members[0]]
+        start, stop = first.find_bin(x_range[0]), first.find_bin(x_range[1])
+
+        x_counts = np.array([projectors[i].x_counts(y_range) for i in members])
+        targets = [projectors[i].slice_target(x_range, entries, precision, y_range) for i in members]
+        for i, starts in zip(members, equal_stat_bounds(x_counts, start, stop, targets)):
+            lasts = np.append(starts[1:] - 1, stop)
+            centers, widths = projectors[i].bounds_centers(starts, lasts)
+            results[i] = (starts, lasts, centers, widths)
+
+    return results
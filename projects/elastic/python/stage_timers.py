@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+""" Named timers around the stages of a report (opening files,
+reading histograms, fitting, drawing, printing), for --profile.
+
+    with stage('fit_slices'):
+        ...
+        count('fits', len(slices))
+
+Stages nest, a stage is known by its stack ('draw;fits;fit_slices').
+Counts go to the innermost open stage.  Nothing is recorded until
+enable() is called, so the timers can stay in the code.
+
+Workers start with forget(), then send their events back with
+drain(), and the parent adds them with merge().  write_report writes
+the events as a trace (json, for chrome://tracing or Perfetto) with a
+summary per stack, and the self time per stack in the collapsed
+format of flamegraph.pl.
+"""
+
+import json
+import os
+import time
+
+enabled = False
+origin = None
+
+# Finished stages, and the ones open in this process.
+events = []
+open_stages = []
+
+def enable():
+    global enabled, origin
+    enabled = True
+    if origin is None:
+        origin = time.time()
+
+class stage(object):
+    """ Times the with block as the stage name. """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if enabled:
+            open_stages.append({'name':self.name, 'start':time.time(), 'children':0.0, 'counts':{}})
+        return self
+
+    def __exit__(self, *exc):
+        if not enabled or not open_stages:
+            return False
+
+        current = open_stages.pop()
+        duration = time.time() - current['start']
+        if open_stages:
+            open_stages[-1]['children'] += duration
+
+        events.append({
+            'name':current['name'],
+            'stack':';'.join([s['name'] for s in open_stages] + [current['name']]),
+            'pid':os.getpid(),
+            'start':current['start'],
+            'duration':duration,
+            'self':duration - current['children'],
+            'counts':current['counts']
+        })
+        return False
+
+def count(name, n=1):
+    """ Add n things done (fits, pages, ...) to the current stage. """
+    if enabled and open_stages:
+        counts = open_stages[-1]['counts']
+        counts[name] = counts.get(name, 0) + n
+
+def drain():
+    """ The events recorded so far, which are then forgotten. """
+    drained = list(events)
+    del events[:]
+    return drained
+
+def forget():
+    """ Drop the events and open stages, those a forked worker
+    inherited from its parent, which the parent keeps itself. """
+    del events[:]
+    del open_stages[:]
+
+def merge(new_events):
+    events.extend(new_events)
+
+def summary():
+    """ {stack: calls, total and self seconds, counts}. """
+    stacks = {}
+    for event in events:
+        entry = stacks.setdefault(event['stack'], {'calls':0, 'total':0.0, 'self':0.0, 'counts':{}})
+        entry['calls'] += 1
+        entry['total'] += event['duration']
+        entry['self'] += event['self']
+        for name, n in event['counts'].items():
+            entry['counts'][name] = entry['counts'].get(name, 0) + n
+    return stacks
+
+def write_report(prefix):
+    """ Write prefix.profile.json and prefix.folded, return their names. """
+
+    start = origin if origin is not None else min([e['start'] for e in events] or [0.0])
+    trace = [{'name':e['name'], 'cat':e['stack'], 'ph':'X', 'pid':e['pid'], 'tid':e['pid'],
+              'ts':1e6 * (e['start'] - start), 'dur':1e6 * e['duration'], 'args':e['counts']}
+             for e in sorted(events, key=lambda e: e['start'])]
+
+    json_name = prefix + '.profile.json'
+    with open(json_name, 'w') as json_file:
+        json.dump({'traceEvents':trace, 'displayTimeUnit':'ms',
+                   'wall':time.time() - start, 'stages':summary()}, json_file, indent=1)
+
+    # flamegraph.pl wants integer sample counts, microseconds here.
+    folded_name = prefix + '.folded'
+    with open(folded_name, 'w') as folded_file:
+        for stack, entry in sorted(summary().items()):
+            folded_file.write('{} {}\n'.format(stack, int(round(1e6 * entry['self']))))
+
+    return json_name, folded_name
+
+def print_summary():
+    """ Time per stack, slowest first. """
+    stacks = sorted(summary().items(), key=lambda item: -item[1]['total'])
+    for stack, entry in stacks:
+        counts = ' '.join('{}={}'.format(k, v) for k, v in sorted(entry['counts'].items()))
+        print('{0:50s} {1:6d} {2:10.2f} s {3:10.2f} s  {4}'.format(
+            stack, entry['calls'], entry['total'], entry['self'], counts))
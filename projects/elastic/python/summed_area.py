@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+""" Yields of rectangular cuts on 2D histograms (w_angle_ep,
+w_theta_sum_pass_angle, ...) from their summed-area tables: the
+cumulative sum over both axes, built once, gives the contents and
+error of any rectangle from four of its entries.  A stack of
+histograms with the same binning (the sectors, CTOF and FTOF) is
+done at once, so are whole grids of windows.
+
+    area = SummedArea.from_histos([histos['histos_w_angle_ep_' + tof] for tof in ['CTOF', 'FTOF']])
+    counts, errors = area.yields(0.8, 1.15, 178, 180)
+
+Cuts go to the nearest bin edge.  Only the bins inside the axes are
+counted, the flow bins never.
+
+    python summed_area.py -d=es-rga.root -s=es-sim.root -n=histos_w_angle_ep_{} -g CTOF FTOF
+"""
+
+import argparse
+import os
+
+from collections import namedtuple
+
+import numpy as np
+
+from histo_store import HistoStore, convert
+
+Window = namedtuple('Window', ['x_low', 'x_high', 'y_low', 'y_high', 'score'])
+
+def histo_arrays(histo):
+    """ Edges, contents and sumw2 (flow bins included) of a StoredHisto,
+    ArrayHisto or ROOT TH2. """
+    if hasattr(histo, 'edges'):
+        return histo.edges, histo.values, histo.sumw2
+
+    from histo_utils import axis_edges, bin_buffers
+    values, sumw2 = bin_buffers(histo)
+    return [axis_edges(histo.GetXaxis()), axis_edges(histo.GetYaxis())], values, sumw2
+
+def summed_table(values):
+    """ table[..., i, j] is the sum of values[..., :i, :j]. """
+    values = np.asarray(values, dtype=np.float64)
+    table = np.zeros(values.shape[:-2] + (values.shape[-2] + 1, values.shape[-1] + 1))
+    table[..., 1:, 1:] = values.cumsum(axis=-2).cumsum(axis=-1)
+    return table
+
+def rectangle(table, i1, i2, j1, j2):
+    """ Sum of the bins [i1, i2) x [j1, j2) from a summed table. """
+    return table[..., i2, j2] - table[..., i1, j2] - table[..., i2, j1] + table[..., i1, j1]
+
+class SummedArea(object):
+    """ Summed tables of the contents and sumw2 of a stack of 2D
+    histograms, shaped (histograms, nx + 1, ny + 1). """
+
+    def __init__(self, x_edges, y_edges, values, sumw2):
+        self.x_edges = np.asarray(x_edges, dtype=np.float64)
+        self.y_edges = np.asarray(y_edges, dtype=np.float64)
+        self.values = summed_table(values)
+        self.sumw2 = summed_table(sumw2)
+
+    @classmethod
+    def from_histos(cls, histos):
+        """ The tables of 2D histograms with the same binning. """
+        arrays = [histo_arrays(histo) for histo in histos]
+        x_edges, y_edges = arrays[0][0]
+        for edges, _, _ in arrays[1:]:
+            if not (np.array_equal(edges[0], x_edges) and np.array_equal(edges[1], y_edges)):
+                raise ValueError('Histograms of a SummedArea must have the same binning')
+
+        inner = (slice(1, -1), slice(1, -1))
+        return cls(x_edges, y_edges, np.stack([values[inner] for _, values, _ in arrays]),
+                   np.stack([sumw2[inner] for _, _, sumw2 in arrays]))
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def edge_index(self, cuts, axis):
+        """ Index of the bin edge nearest to each cut. """
+        edges = self.x_edges if axis == 0 else self.y_edges
+        return np.searchsorted(0.5 * (edges[:-1] + edges[1:]), cuts)
+
+    def bin_yields(self, i1, i2, j1, j2):
+        """ Contents and errors of the bins [i1, i2) x [j1, j2). """
+        return (rectangle(self.values, i1, i2, j1, j2),
+                np.sqrt(np.abs(rectangle(self.sumw2, i1, i2, j1, j2))))
+
+    def yields(self, x_low, x_high, y_low, y_high):
+        """ Contents and errors of x_low < x < x_high, y_low < y <
+        y_high for each histogram, shaped (histograms, ...) for cuts
+        broadcasting to (...).  Empty when low >= high. """
+        i1, i2 = self.edge_index(x_low, 0), self.edge_index(x_high, 0)
+        j1, j2 = self.edge_index(y_low, 1), self.edge_index(y_high, 1)
+        return self.bin_yields(i1, np.maximum(i1, i2), j1, np.maximum(j1, j2))
+
+    def window_grid(self, x_cuts, y_cuts):
+        """ Contents and errors of every window between the cuts,
+        shaped (histograms, x_low, x_high, y_low, y_high), nan where
+        a low cut is not below the high one. """
+        i = self.edge_index(x_cuts, 0)
+        j = self.edge_index(y_cuts, 1)
+        i1, i2 = i[:, None, None, None], i[None, :, None, None]
+        j1, j2 = j[None, None, :, None], j[None, None, None, :]
+
+        valid = (i1 < i2) & (j1 < j2)
+        counts, errors = self.bin_yields(i1, np.maximum(i1, i2), j1, np.maximum(j1, j2))
+        return np.where(valid, counts, np.nan), np.where(valid, errors, np.nan)
+
+def best_windows(score, x_cuts, y_cuts, n=10):
+    """ The n windows of a (x_low, x_high, y_low, y_high) score with
+    the highest values, best first.  nan is never picked. """
+    flat = np.where(np.isfinite(score), score, -np.inf).ravel()
+    n = min(n, int(np.isfinite(flat).sum()))
+    best = np.argsort(flat)[::-1][:n]
+
+    windows = []
+    for index, (a, b, c, d) in zip(best, zip(*np.unravel_index(best, score.shape))):
+        windows.append(Window(x_cuts[a], x_cuts[b], y_cuts[c], y_cuts[d], flat[index]))
+    return windows
+
+def significance(signal, background, x_cuts, y_cuts, min_signal=0.0):
+    """ s / sqrt(s + b) of every window, summed over the histograms
+    of each (SummedArea) stack. """
+    s, _ = signal.window_grid(x_cuts, y_cuts)
+    b, _ = background.window_grid(x_cuts, y_cuts)
+    s, b = s.sum(axis=0), b.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        score = s / np.sqrt(s + b)
+    return np.where(s >= min_signal, score, np.nan)
+
+def agreement(data, sim, x_cuts, y_cuts, min_counts=0.0):
+    """ How alike the data/sim ratio is across the histograms (the
+    sectors, CTOF and FTOF) in every window: minus the chi2/ndf of
+    the ratios about their weighted mean, so higher is better. """
+    d, d_err = data.window_grid(x_cuts, y_cuts)
+    s, s_err = sim.window_grid(x_cuts, y_cuts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = d / s
+        ratio_err = np.abs(ratio) * np.sqrt((d_err / d)**2 + (s_err / s)**2)
+        weights = np.where(ratio_err > 0, 1.0 / ratio_err**2, 0.0)
+        mean = np.sum(weights * ratio, axis=0) / np.sum(weights, axis=0)
+        chi2 = np.sum(weights * (ratio - mean)**2, axis=0)
+
+    ndf = max(len(data) - 1, 1)
+    enough = np.all(d >= min_counts, axis=0) & np.all(s >= min_counts, axis=0)
+    return np.where(enough, -chi2 / ndf, np.nan)
+
+def cut_values(edges, cuts=None, max_cuts=40):
+    """ Candidate cuts: np.arange(*cuts) if given, otherwise every
+    few bin edges, at most max_cuts. """
+    if cuts is not None:
+        return np.arange(*cuts)
+    stride = max(1, int(np.ceil(len(edges) / float(max_cuts))))
+    return np.unique(np.append(edges[::stride], edges[-1]))
+
+def open_store(path, store_dir):
+    """ The HistoStore of an array store directory, or of a ROOT
+    file converted once into store_dir. """
+    if os.path.isdir(path):
+        return HistoStore(path)
+
+    store_path = os.path.join(store_dir, os.path.splitext(os.path.basename(path))[0])
+    convert(path, store_path)
+    return HistoStore(store_path)
+
+def stack(path, store_dir, name, groups):
+    histos = open_store(path, store_dir)
+    return SummedArea.from_histos([histos[name.format(group)] for group in groups])
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-d', '--data_file', required=True, help='ROOT file or array store')
+    ap.add_argument('-s', '--sim_file', default=None, help='Simulation, for agreement and significance')
+    ap.add_argument('-b', '--background_file', default=None,
+                    help='Background simulation, scores s / sqrt(s + b) with the sim as s')
+    ap.add_argument('-n', '--name', default='histos_w_angle_ep_{}',
+                    help='Histogram name, {} replaced by each group')
+    ap.add_argument('-g', '--groups', nargs='+', default=['CTOF', 'FTOF'])
+    ap.add_argument('-x', '--x_cuts', nargs=3, type=float, default=None, help='low high step')
+    ap.add_argument('-y', '--y_cuts', nargs=3, type=float, default=None, help='low high step')
+    ap.add_argument('-m', '--min_counts', default=100.0, type=float)
+    ap.add_argument('-t', '--top', default=10, type=int)
+    ap.add_argument('-c', '--store_dir', default='.stores')
+    args = ap.parse_args()
+
+    data = stack(args.data_file, args.store_dir, args.name, args.groups)
+    x_cuts = cut_values(data.x_edges, args.x_cuts)
+    y_cuts = cut_values(data.y_edges, args.y_cuts)
+    print('{} x {} cuts, {} windows per histogram'.format(len(x_cuts), len(y_cuts),
+                                                           (len(x_cuts) * len(y_cuts))**2))
+
+    if args.sim_file and args.background_file:
+        title = 's / sqrt(s + b)'
+        score = significance(stack(args.sim_file, args.store_dir, args.name, args.groups),
+                             stack(args.background_file, args.store_dir, args.name, args.groups),
+                             x_cuts, y_cuts, args.min_counts)
+    elif args.sim_file:
+        title = '-chi2/ndf of data/sim over ' + ' '.join(args.groups)
+        score = agreement(data, stack(args.sim_file, args.store_dir, args.name, args.groups),
+                          x_cuts, y_cuts, args.min_counts)
+    else:
+        title = 'data counts'
+        counts, _ = data.window_grid(x_cuts, y_cuts)
+        score = counts.sum(axis=0)
+
+    print('{0:>10s} {1:>10s} {2:>10s} {3:>10s} {4:>14s}'.format('x_low', 'x_high', 'y_low', 'y_high', title))
+    for window in best_windows(score, x_cuts, y_cuts, args.top):
+        counts, errors = data.yields(window.x_low, window.x_high, window.y_low, window.y_high)
+        print('{0:10.4g} {1:10.4g} {2:10.4g} {3:10.4g} {4:14.4g}   '.format(*window) +
+              ' '.join('{}: {:.0f} +- {:.0f}'.format(group, c, e)
+                       for group, c, e in zip(args.groups, counts, errors)))
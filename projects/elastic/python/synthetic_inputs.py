@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+""" Stand-ins for the farm outputs the reports are made from
+(es-rga.root, rga.root, rga-rad.root, ...), filled with gaussian
+peaks on a flat background.
+
+The histogram names, and roughly their axes, come from the page lists
+of the scripts themselves, so the files hold every key the scripts ask
+for.  Each histogram gets the same binning on every axis.
+
+    python synthetic_inputs.py -o=synthetic -n=200 -e=200000
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+# Pages of pres.py, which draws without a page list.
+pres_pages = [
+    {'kind':'fits', 'inputs':[('data', 'histos_theta_electron_delta_p_electron_{}')],
+     'x_range':[7.0, 11.0], 'y_range':[-0.2, 0.2]},
+    {'kind':'fits', 'inputs':[('data', 'histos_theta_proton_delta_p_proton_{}')],
+     'x_range':[40.0, 55.0], 'y_range':[-0.2, 0.2]},
+    {'kind':'single', 'inputs':[('data', 'histos_de_beam_de_beam_from_angles{}')],
+     'x_range':[-1.2, 1.2], 'y_range':[-1.2, 1.2]},
+    {'kind':'single', 'inputs':[('data', 'histos_phi_electron_delta_vz')]},
+    {'kind':'sector', 'inputs':[('data', 'histos_de_beam_{}')]},
+    {'kind':'sector', 'inputs':[('data', 'histos_de_beam_from_angles{}')]},
+    {'kind':'sector', 'inputs':[('data', 'histos_w_in_ctof')], 'x_range':[0.7, 1.3]},
+    {'kind':'sector', 'inputs':[('data', 'histos_w_pass_angle_in_ctof')], 'x_range':[0.7, 1.3]},
+    {'kind':'sector', 'inputs':[('data', 'histos_angle_ep')], 'x_range':[170.0, 180.0]},
+    {'kind':'sector', 'inputs':[('data', 'histos_angle_ep_pass_w_in_ctof')], 'x_range':[170.0, 180.0]},
+    {'kind':'sector', 'inputs':[('data', 'histos_theta_p_combined')], 'x_range':[10.0, 70.0]},
+    {'kind':'sector', 'inputs':[('data', 'histos_theta_p_ctof')], 'x_range':[10.0, 70.0]},
+    {'kind':'sector', 'inputs':[('data', 'histos_theta_p_tof_1')], 'x_range':[10.0, 70.0]},
+    {'kind':'sector', 'inputs':[('data', 'histos_theta_p_tof_2')], 'x_range':[10.0, 70.0]},
+    {'kind':'sector', 'inputs':[('data', 'histos_theta_p_tof_3')], 'x_range':[10.0, 70.0]}
+]
+
+# Page kinds that draw 2D histograms.
+kinds_2d = set(['fits', 'root_fits', 'single', 'sector_single'])
+
+# Same cuts as es.py, they only move lines on the pages.
+es_cuts = {
+    'w':[1.25, 6.0],
+    'angle_ep':[178.0, 180.0],
+    'theta_gamma':[0.0, 3.0],
+    'missing_mass':[-0.4, 0.4]
+}
+
+def report_pages():
+    """ {file name: [(pages, config)]}, the pages drawn from each
+    input file under the config they are read as. """
+
+    import data_sim
+    import data_sim_rad
+    import es
+    import mon
+    import monrad
+
+    monitor = mon.monitor_pages() + mon.landscape_pages()
+    monitor_rad = monrad.monitor_pages() + monrad.landscape_pages()
+    return {
+        'es-rga.root':[(es.es_pages(es_cuts), 'data')],
+        'es-esepp.root':[(es.es_pages(es_cuts), 'sim')],
+        'rga.root':[(monitor, 'data'), (data_sim.data_sim_pages(), 'data'), (pres_pages, 'data')],
+        'esepp.root':[(monitor, 'data'), (data_sim.data_sim_pages(), 'sim')],
+        'rga-rad.root':[(monitor_rad, 'data'), (data_sim_rad.data_sim_rad_pages(), 'data')],
+        'esepp-rad.root':[(monitor_rad, 'data'), (data_sim_rad.data_sim_rad_pages(), 'sim')]
+    }
+
+def widen(limits, fraction=0.1):
+    width = limits[1] - limits[0]
+    return (limits[0] - fraction * width, limits[1] + fraction * width)
+
+def histo_spec(dim, page):
+    """ Axes of a histogram drawn on page, from its plot ranges.  1D
+    pages fit along x in y_fit_range, 2D ones along y. """
+
+    default = (-1.0, 1.0)
+    if dim == 1:
+        x = page.get('x_range') or page.get('y_fit_range') or default
+        return {'dim':1, 'x':widen(x)}
+
+    x = page.get('x_range') or default
+    y = page.get('y_range') or page.get('y_fit_range') or default
+    return {'dim':2, 'x':widen(x), 'y':widen(y)}
+
+def page_specs(page):
+    """ (config, name, spec) of every histogram a page draws. """
+
+    specs = []
+    if page['kind'] == 'pads':
+        for pad in page['pads']:
+            for config, name, _ in pad.get('fill', []):
+                specs.append((config, name, histo_spec(1, {})))
+            if 'colz' in pad:
+                config, name = pad['colz']
+                specs.append((config, name, histo_spec(2, {})))
+        return specs
+
+    # The monitoring sector pages draw maps when they have a y title.
+    dim = 2 if page['kind'] in kinds_2d or (page['kind'] == 'sector' and 'ytitle' in page) else 1
+    for config, formatter in page.get('inputs', []):
+        for name in sorted(set(formatter.format(sector) for sector in range(1,7))):
+            specs.append((config, name, histo_spec(dim, page)))
+    return specs
+
+def file_specs(entries):
+    """ {name: spec} for one file, from its [(pages, config)].  A
+    histogram drawn both ways is made 2D. """
+
+    specs = {}
+    for pages, config in entries:
+        for page in pages:
+            for page_config, name, spec in page_specs(page):
+                if page_config != config:
+                    continue
+                if name not in specs or spec['dim'] > specs[name]['dim']:
+                    specs[name] = spec
+    return specs
+
+def fill_counts(spec, bins, entries, rng):
+    """ Contents without flow bins: a gaussian peak (drifting along x
+    for 2D) on a background of a fifth of the entries. """
+
+    peak = entries - entries // 5
+    x_lo, x_hi = spec['x']
+    if spec['dim'] == 1:
+        center, width = 0.5 * (x_lo + x_hi), (x_hi - x_lo) / 12.0
+        x = np.concatenate([rng.normal(center, width, peak),
+                            rng.uniform(x_lo, x_hi, entries - peak)])
+        return np.histogram(x, bins=bins, range=spec['x'])[0]
+
+    y_lo, y_hi = spec['y']
+    x = rng.uniform(x_lo, x_hi, entries)
+    center, width = 0.5 * (y_lo + y_hi), (y_hi - y_lo) / 12.0
+    drift = 0.1 * width * (x[:peak] - x_lo) / (x_hi - x_lo)
+    y = np.concatenate([rng.normal(center + drift, width),
+                        rng.uniform(y_lo, y_hi, entries - peak)])
+    return np.histogram2d(x, y, bins=bins, range=[spec['x'], spec['y']])[0]
+
+def write_file(path, specs, bins, entries, seed=0):
+    """ Write one TH1F/TH2F per spec into a new ROOT file. """
+    from ROOT import TFile, TH1F, TH2F
+    from histo_utils import bin_buffers
+
+    rng = np.random.RandomState(seed)
+    rootfile = TFile(path, 'RECREATE')
+    for name in sorted(specs):
+        spec = specs[name]
+        if spec['dim'] == 1:
+            histo = TH1F(name, name, bins, spec['x'][0], spec['x'][1])
+        else:
+            histo = TH2F(name, name, bins, spec['x'][0], spec['x'][1],
+                         bins, spec['y'][0], spec['y'][1])
+
+        values, _ = bin_buffers(histo)
+        values[(slice(1, -1),) * spec['dim']] = fill_counts(spec, bins, entries, rng)
+        histo.SetEntries(entries)
+        histo.Write()
+
+    rootfile.Close()
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-o', '--output_dir', default='synthetic')
+    ap.add_argument('-n', '--bins', default=200, type=int,
+                    help='Bins on every axis of every histogram')
+    ap.add_argument('-e', '--entries', default=200000, type=int,
+                    help='Entries in each histogram')
+    ap.add_argument('-x', '--extra', default=0, type=int,
+                    help='Histograms no script reads, added to each file')
+    ap.add_argument('-s', '--seed', default=0, type=int)
+    args = ap.parse_args()
+
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    for i, (file_name, entries) in enumerate(sorted(report_pages().items())):
+        specs = file_specs(entries)
+        for j in range(args.extra):
+            specs['histos_extra_{}'.format(j)] = histo_spec(2, {})
+
+        path = os.path.join(args.output_dir, file_name)
+        write_file(path, specs, args.bins, args.entries, seed=args.seed + i)
+        print('{}: {} histograms'.format(path, len(specs)))
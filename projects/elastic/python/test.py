@@ -3,12 +3,7 @@
 from ROOT import (TH1F, TH2F, TF1, TFile, TCanvas,
                   gPad, gStyle, TLatex)
 
-def load_histos(file):
-    ''' Use the ROOT file structure to load a dictionary of histograms. '''
-    h = {} 
-    for k in file.GetListOfKeys():
-        h[k.GetName()] = file.Get(k.GetName())
-    return h 
+from lazy_histos import LazyHistos
 
 def plot_sector_momreso(histos, can, lab, tex, tit):
     ''' Plot the results of fitting the resolution '''
@@ -105,7 +100,7 @@ if __name__ == '__main__':
     
     input_filename = 'histos.root'
     input_file = TFile(input_filename)
-    histos = load_histos(input_file)
+    histos = LazyHistos(input_file)
     print(histos.keys())
 
     gStyle.SetOptStat(0)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+""" ArrayHisto against numpy's histograms and TAxis::FindBin. """
+
+import unittest
+
+import numpy as np
+
+from array_histo import ArrayHisto, merge_histos
+
+class FillTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(5)
+        self.x = rng.normal(1.0, 1.0, 10000)
+        self.y = rng.normal(2.0, 0.5, 10000)
+        self.weights = rng.uniform(0.5, 2.0, 10000)
+
+    def test_1d(self):
+        histo = ArrayHisto.uniform('h', [(50, 0.0, 2.0)])
+        histo.fill(self.x)
+        counts, _ = np.histogram(self.x, bins=histo.edges[0])
+
+        # numpy closes the last bin, ROOT sends the high edge to the overflow.
+        np.testing.assert_array_equal(histo.values[1:-1], counts)
+        self.assertEqual(histo.values[0], np.sum(self.x < 0.0))
+        self.assertEqual(histo.values[-1], np.sum(self.x >= 2.0))
+        self.assertEqual(histo.entries, len(self.x))
+
+    def test_2d_weights(self):
+        histo = ArrayHisto('h', [np.linspace(-1, 3, 21), [0.0, 1.0, 1.5, 2.0, 2.5, 4.0]])
+        histo.fill((self.x, self.y), self.weights)
+        values, _, _ = np.histogram2d(self.x, self.y, bins=histo.edges, weights=self.weights)
+        sumw2, _, _ = np.histogram2d(self.x, self.y, bins=histo.edges, weights=self.weights**2)
+        np.testing.assert_allclose(histo.values[1:-1, 1:-1], values)
+        np.testing.assert_allclose(histo.sumw2[1:-1, 1:-1], sumw2)
+        self.assertAlmostEqual(histo.values.sum(), self.weights.sum())
+
+    def test_find_bins(self):
+        for histo in [ArrayHisto.uniform('h', [(4, 0.0, 2.0)]), ArrayHisto('h', [[0.0, 0.5, 1.0, 1.5, 2.0]])]:
+            bins = histo.find_bins([-0.1, 0.0, 0.25, 0.5, 1.99, 2.0, np.nan])
+            np.testing.assert_array_equal(bins, [0, 1, 1, 2, 4, 5, 5])
+
+    def test_merge(self):
+        binning = [(40, -2.0, 4.0), (10, 0.0, 4.0)]
+        whole = ArrayHisto.uniform('h', binning).fill((self.x, self.y), self.weights)
+
+        parts = []
+        for part in np.array_split(np.arange(len(self.x)), 4):
+            parts.append({'h':ArrayHisto.uniform('h', binning).fill((self.x[part], self.y[part]),
+                                                                    self.weights[part])})
+        merged = merge_histos(merge_histos(parts[3], parts[0]), merge_histos(parts[2], parts[1]))['h']
+
+        np.testing.assert_allclose(merged.values, whole.values)
+        np.testing.assert_allclose(merged.sumw2, whole.sumw2)
+        self.assertEqual(merged.entries, whole.entries)
+
+        # The inputs are left as they are.
+        self.assertEqual(parts[0]['h'].entries, 2500)
+
+    def test_merge_binning(self):
+        a = ArrayHisto.uniform('a', [(10, 0.0, 1.0)])
+        with self.assertRaises(ValueError):
+            a.merge(ArrayHisto.uniform('b', [(20, 0.0, 1.0)]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+""" CutFlow masks and tables against the cuts applied one by one. """
+
+import unittest
+
+import numpy as np
+
+from array_histo import ArrayHisto
+from cut_flow import Cut, CutFlow, cut_flow_table
+
+cuts = [Cut('w', 'w', 0.8, 1.15), Cut('angle', 'angle', 178, None),
+        Cut('theta_gamma', 'theta_gamma', None, 3), Cut('p_ele', 'p_ele', 1.5, None)]
+
+def random_values(n=20000, seed=11):
+    rng = np.random.RandomState(seed)
+    values = {'w':rng.uniform(0.5, 1.5, n), 'angle':rng.uniform(170, 180, n),
+              'theta_gamma':rng.uniform(0, 6, n), 'p_ele':rng.uniform(0, 10, n)}
+    values['w'][::97] = np.nan
+    return values
+
+def brute_force(values, names):
+    passed = np.ones(len(values['w']), dtype=bool)
+    for cut in cuts:
+        if cut.name not in names:
+            continue
+        column = values[cut.variable]
+        passed &= np.isfinite(column)
+        with np.errstate(invalid='ignore'):
+            if cut.low is not None:
+                passed &= column > cut.low
+            if cut.high is not None:
+                passed &= column < cut.high
+    return passed
+
+class CutFlowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.flow = CutFlow(cuts)
+        self.values = random_values()
+        self.mask = self.flow.evaluate(self.values)
+
+    def test_bits(self):
+        self.assertEqual(self.mask.dtype, np.uint8)
+        for i, cut in enumerate(cuts):
+            np.testing.assert_array_equal((self.mask >> i) & 1, brute_force(self.values, [cut.name]))
+
+    def test_passes(self):
+        for names in [['w'], ['w', 'angle'], ['angle', 'p_ele', 'theta_gamma'], self.flow.names()]:
+            np.testing.assert_array_equal(self.flow.passes(self.mask, names), brute_force(self.values, names))
+
+    def test_table(self):
+        patterns = self.flow.pattern_builder()('cut_patterns')
+        patterns.fill(self.mask.astype(np.float64) + 0.5)
+
+        selection = ['w', 'angle', 'theta_gamma']
+        for i, row in enumerate(cut_flow_table(self.flow, patterns, selection)):
+            others = [name for name in selection if name != row['cut']]
+            self.assertEqual(row['cumulative'], brute_force(self.values, selection[:i + 1]).sum())
+            self.assertEqual(row['alone'], brute_force(self.values, [row['cut']]).sum())
+            self.assertEqual(row['n_minus_1'], brute_force(self.values, others).sum())
+
+    def test_others(self):
+        self.assertEqual(self.flow.others(['w', 'angle'], 'w'), ['angle'])
+
+    def test_limits(self):
+        with self.assertRaises(KeyError):
+            self.flow.required(['missing_mass'])
+        with self.assertRaises(ValueError):
+            CutFlow([Cut(str(i), 'w', None, i) for i in range(65)])
+        self.assertEqual(CutFlow([Cut(str(i), 'w', None, i) for i in range(9)]).dtype, np.uint16)
+        with self.assertRaises(ValueError):
+            CutFlow([Cut(str(i), 'w', None, i) for i in range(17)]).pattern_builder()
+
+    def test_pattern_histogram(self):
+        self.assertIsInstance(self.flow.pattern_builder()('p'), ArrayHisto)
+
+if __name__ == '__main__':
+    unittest.main()
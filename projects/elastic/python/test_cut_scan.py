@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+""" CutScan variations against each combination of windows applied
+on its own, and the fitted W peaks of a scan histogram. """
+
+import itertools
+import unittest
+
+import numpy as np
+
+from cut_scan import CutScan, ScanCut, scan_builder, scan_results, w_binning
+
+grid = [ScanCut('angle', 'angle', [(178, 180), (177, None)]),
+        ScanCut('theta_gamma', 'theta_gamma', [(None, 3), (None, 2), (None, 4)]),
+        ScanCut('missing_mass', 'missing_mass', [(-0.4, 0.4)])]
+
+def window_passes(column, window):
+    low, high = window
+    with np.errstate(invalid='ignore'):
+        passed = np.isfinite(column)
+        if low is not None:
+            passed &= column > low
+        if high is not None:
+            passed &= column < high
+    return passed
+
+class CutScanTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(13)
+        n = 5000
+        self.values = {'angle':rng.uniform(175, 180, n), 'theta_gamma':rng.uniform(0, 5, n),
+                       'missing_mass':rng.normal(0, 0.3, n)}
+        self.values['angle'][::53] = np.nan
+        self.scan = CutScan(grid)
+
+    def test_passes(self):
+        passed = self.scan.passes(self.values)
+        windows = list(itertools.product(*[cut.windows for cut in grid]))
+        self.assertEqual(passed.shape, (len(windows), 5000))
+
+        for i, combination in enumerate(windows):
+            expected = np.ones(5000, dtype=bool)
+            for cut, window in zip(grid, combination):
+                expected &= window_passes(self.values[cut.variable], window)
+            np.testing.assert_array_equal(passed[i], expected)
+            self.assertEqual([tuple(w) for w in self.scan.variation(i).values()], list(combination))
+
+    def test_find(self):
+        self.assertEqual(self.scan.find({}), 0)
+        index = self.scan.find({'angle':(177, None), 'theta_gamma':(None, 4)})
+        self.assertEqual(self.scan.variation(index)['theta_gamma'], [None, 4])
+        self.assertIsNone(self.scan.find({'angle':(179, 180)}))
+
+    def test_results(self):
+        rng = np.random.RandomState(17)
+        histo = scan_builder(self.scan)('w_scan')
+        variation = np.repeat(np.arange(len(self.scan)), 20000)
+        mu = 0.93 + 0.002 * variation
+        histo.fill((variation + 0.5, rng.normal(mu, 0.03)))
+
+        results = scan_results(histo)
+        self.assertTrue(np.all(results['fit_ok']))
+        np.testing.assert_allclose(results['mu'], 0.93 + 0.002 * np.arange(len(self.scan)), atol=1e-3)
+        np.testing.assert_allclose(results['sigma'], 0.03, rtol=0.05)
+        self.assertEqual(len(results['yield']), len(self.scan))
+        self.assertEqual(w_binning[0], histo.values.shape[1] - 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+""" elastic_kinematics against exact elastic events and against the
+formulas of event-selection.groovy and monitor.groovy, ported here
+one event at a time.
+
+    python -m pytest -q test_elastic_kinematics.py
+"""
+
+import math
+import unittest
+
+import numpy as np
+
+from elastic_kinematics import (electron_mass, elastic_events, predict_beam_energy,
+                                predict_electron, predict_proton, proton_kinematics,
+                                proton_mass)
+
+beam_energy = 10.646
+
+class Vector(object):
+    """ The little of LorentzVector the groovy uses. """
+
+    def __init__(self, px, py, pz, mass=None, energy=None):
+        self.p3 = [px, py, pz]
+        self.e = energy if energy is not None else math.sqrt(px**2 + py**2 + pz**2 + mass**2)
+
+    def add(self, other, sign=1):
+        return Vector(*[a + sign * b for a, b in zip(self.p3, other.p3)], energy=self.e + sign * other.e)
+
+    def mass2(self):
+        return self.e**2 - sum(a**2 for a in self.p3)
+
+    def mass(self):
+        m2 = self.mass2()
+        return -math.sqrt(-m2) if m2 < 0 else math.sqrt(m2)
+
+    def p(self):
+        return math.sqrt(sum(a**2 for a in self.p3))
+
+    def theta(self):
+        return math.acos(self.p3[2] / self.p())
+
+def cross(a, b):
+    return [a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]]
+
+def angle(a, b):
+    cos = sum(x * y for x, y in zip(a, b)) / math.sqrt(sum(x * x for x in a) * sum(x * x for x in b))
+    return math.degrees(math.acos(max(-1.0, min(1.0, cos))))
+
+def get_pkin(ele, pro):
+    """ getPKin of event-selection.groovy. """
+    beam = Vector(0, 0, beam_energy, electron_mass)
+    missing = beam.add(Vector(0, 0, 0, energy=proton_mass)).add(ele, -1)
+    w = missing.mass()
+    missing = missing.add(pro, -1)
+    q = beam.add(ele, -1)
+    q2, nu = -q.mass2(), beam.e - ele.e
+    zaxis = [0, 0, 1]
+    return {'x':q2 / (2 * nu * proton_mass), 'y':nu / beam.e, 'w':w, 'nu':nu, 'q2':q2,
+            'angle':angle(cross(ele.p3, zaxis), cross(pro.p3, zaxis)),
+            'missing_mass':missing.mass2(), 'missing_energy':missing.e,
+            'missing_pt':math.hypot(missing.p3[0], missing.p3[1]),
+            'theta_gamma':math.degrees(missing.theta()), 'theta_egamma':angle(missing.p3, ele.p3)}
+
+def predict_proton_groovy(ele):
+    p, th = ele.p(), ele.theta()
+    beam = p / (1 + p / proton_mass * (math.cos(th) - 1))
+    beta = math.atan(p * math.sin(th) / (beam - p * math.cos(th)))
+    return p * math.sin(th) / math.sin(beta), beta
+
+def predict_electron_groovy(pro):
+    p, th = pro.p(), pro.theta()
+    num = proton_mass * (p + (-proton_mass + math.sqrt(proton_mass**2 + p**2)) * math.cos(th))
+    den = 2 * proton_mass * math.cos(th) - p * math.sin(th)**2
+    alpha = math.atan2(p * math.sin(-th), num / den - p * math.cos(th))
+    return p * math.sin(-th) / math.sin(alpha), alpha
+
+def predict_beam_energy_groovy(ele, pro):
+    th_e, th_p = ele.theta(), pro.theta()
+    from_electron = ele.p() / (1 + (ele.p() / proton_mass) * (math.cos(th_e) - 1))
+    a0 = 1 - 1 / (math.cos(th_e) - math.sin(th_e) / math.tan(-th_p))
+    a1 = math.sin(th_e) / math.sin(th_e + th_p)
+    return from_electron, 2 * proton_mass * a0 / (a1**2 - a0**2)
+
+def smeared_events(n, seed=1):
+    rng = np.random.RandomState(seed)
+    ele, pro = elastic_events(beam_energy, rng.uniform(0.1, 0.6, n), rng.uniform(-np.pi, np.pi, n))
+    return ele * rng.normal(1, 0.02, ele.shape), pro * rng.normal(1, 0.02, pro.shape)
+
+class ElasticEventsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(2)
+        self.ele, self.pro = elastic_events(beam_energy, rng.uniform(0.1, 0.6, 50),
+                                            rng.uniform(-np.pi, np.pi, 50))
+
+    def test_exact_elastic(self):
+        kin = proton_kinematics(beam_energy, self.ele, self.pro)
+        np.testing.assert_allclose(kin['w'], proton_mass, atol=1e-6)
+        np.testing.assert_allclose(kin['angle'], 180, atol=1e-4)
+        np.testing.assert_allclose(kin['missing_mass'], 0, atol=1e-6)
+
+    def test_predictions_invert(self):
+        pro_p, pro_theta = predict_proton(self.ele)
+        np.testing.assert_allclose(pro_p, np.linalg.norm(self.pro, axis=-1), rtol=1e-6)
+        np.testing.assert_allclose(pro_theta, np.arccos(self.pro[:, 2] / pro_p), rtol=1e-6)
+
+        ele_p, ele_theta = predict_electron(self.pro)
+        np.testing.assert_allclose(ele_p, np.linalg.norm(self.ele, axis=-1), rtol=1e-6)
+        np.testing.assert_allclose(-ele_theta, np.arccos(self.ele[:, 2] / ele_p), rtol=1e-6)
+
+        for energy in predict_beam_energy(self.ele, self.pro):
+            np.testing.assert_allclose(energy, beam_energy, rtol=1e-6)
+
+class GroovyFormulasTest(unittest.TestCase):
+
+    def test_against_groovy(self):
+        ele, pro = smeared_events(200)
+        kin = proton_kinematics(beam_energy, ele, pro)
+        predictions = {'proton':predict_proton(ele), 'electron':predict_electron(pro),
+                       'beam_energy':predict_beam_energy(ele, pro)}
+
+        for i in range(len(ele)):
+            e, p = Vector(*ele[i], mass=electron_mass), Vector(*pro[i], mass=proton_mass)
+            for key, value in get_pkin(e, p).items():
+                self.assertAlmostEqual(kin[key][i], value, delta=1e-7 * max(1, abs(value)), msg=key)
+
+            groovy = {'proton':predict_proton_groovy(e), 'electron':predict_electron_groovy(p),
+                      'beam_energy':predict_beam_energy_groovy(e, p)}
+            for key, values in groovy.items():
+                for got, value in zip(predictions[key], values):
+                    self.assertAlmostEqual(got[i], value, delta=1e-7 * max(1, abs(value)), msg=key)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+""" gaus_fit on stacks of toy peaks with known parameters. """
+
+import unittest
+
+import numpy as np
+
+from gaus_fit import (estimate_gaussians, fast_fit_gaussians, fit_gaussians, gaussian,
+                      status_empty, status_not_converged, status_ok)
+
+x = np.linspace(-5, 5, 81)
+
+def toy_peaks(n=40, seed=3):
+    """ Poisson counts of n gaussians, (counts, (amplitude, mu, sigma)). """
+    rng = np.random.RandomState(seed)
+    truth = np.stack([rng.uniform(200, 2000, n), rng.uniform(-1, 1, n), rng.uniform(0.5, 1.5, n)], axis=-1)
+    counts = rng.poisson(gaussian(x, *[truth[:, i, None] for i in range(3)])).astype(np.float64)
+    return counts, truth
+
+class FitGaussiansTest(unittest.TestCase):
+
+    def test_recovers_toys(self):
+        counts, truth = toy_peaks()
+        fit = fit_gaussians(x, counts)
+        self.assertTrue(np.all(fit.status == status_ok))
+
+        pulls = (fit.mu - truth[:, 1]) / fit.mu_err
+        self.assertGreater(np.mean(np.abs(pulls) < 3), 0.9)
+        np.testing.assert_allclose(fit.sigma, truth[:, 2], rtol=0.1)
+
+    def test_batch_shape(self):
+        counts, _ = toy_peaks(12)
+        fit = fit_gaussians(x, counts.reshape(3, 4, -1))
+        self.assertEqual(fit.mu.shape, (3, 4))
+        np.testing.assert_allclose(fit.mu.ravel(), fit_gaussians(x, counts).mu, rtol=1e-6)
+
+    def test_empty(self):
+        counts = np.zeros((2, len(x)))
+        counts[1, 40] = 5
+        fit = fit_gaussians(x, counts)
+        self.assertTrue(np.all(fit.status == status_empty))
+        self.assertTrue(np.all(np.isnan(fit.mu)))
+
+    def test_mu_outside_range(self):
+        # A falling exponential has its best gaussian far below the range.
+        edges = np.linspace(0, 5, 50)
+        fit = fit_gaussians(edges, 1000 * np.exp(-edges), np.ones(50), fit_range=(1, 4))
+        self.assertEqual(fit.status, status_not_converged)
+
+    def test_range_per_fit(self):
+        counts, _ = toy_peaks(2)
+        counts[:, :20] += 500
+        low, high = np.array([[-3.0], [-2.5]]), np.array([[3.0], [2.5]])
+        fit = fit_gaussians(x, counts, fit_range=(low, high))
+        for i in range(2):
+            alone = fit_gaussians(x, counts[i], fit_range=(low[i, 0], high[i, 0]))
+            self.assertAlmostEqual(fit.mu[i], alone.mu, places=6)
+
+    def test_fixed(self):
+        counts, truth = toy_peaks(4)
+        fixed = np.array([True, False, True, False])
+        fit = fit_gaussians(x, counts, p0=truth, fixed=fixed)
+        np.testing.assert_array_equal(fit.mu[fixed], truth[fixed, 1])
+        self.assertTrue(np.all(np.isfinite(fit.mu_err)))
+        self.assertTrue(np.all(fit.status == status_ok))
+
+class EstimateTest(unittest.TestCase):
+
+    def test_exact_peak(self):
+        p, good = estimate_gaussians(x, gaussian(x, 1000.0, 0.3, 0.8), np.ones_like(x))
+        np.testing.assert_allclose(p, [1000.0, 0.3, 0.8], rtol=1e-6)
+        self.assertTrue(good)
+
+    def test_fast_fit_agrees(self):
+        counts, _ = toy_peaks()
+        fit = fit_gaussians(x, counts)
+        fast = fast_fit_gaussians(x, counts)
+        self.assertTrue(np.all(fast.status == status_ok))
+
+        # The estimate only sees the peak, so it is a little looser.
+        distance = np.abs(fast.mu - fit.mu) / fit.mu_err
+        self.assertLess(np.median(distance), 1.0)
+        self.assertLess(np.max(distance), 4.0)
+
+if __name__ == '__main__':
+    unittest.main()
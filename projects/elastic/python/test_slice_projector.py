@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+""" SliceProjector against sums over the bins of the 2D histogram. """
+
+import unittest
+
+import numpy as np
+
+from array_histo import ArrayHisto
+from slice_projector import SliceProjector, adaptive_slices
+
+def projector_of(histo):
+    return SliceProjector(histo.values, histo.sumw2, histo.edges[0], histo.edges[1])
+
+class ProjectTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        x = rng.exponential(1.5, 50000)
+        self.histo = ArrayHisto.uniform('h', [(60, 0.0, 6.0), (40, -2.0, 2.0)])
+        self.histo.fill((x, rng.normal(0.0, 0.2 + 0.1 * x)), rng.uniform(0.5, 1.5, len(x)))
+        self.projector = projector_of(self.histo)
+
+    def test_project(self):
+        for first, last in [(1, 1), (0, 61), (5, 17), (40, 70), (-3, 2)]:
+            counts, errors = self.projector.project(first, last)
+            bins = slice(max(first, 0), min(last, 61) + 1)
+            np.testing.assert_allclose(counts, self.histo.values[bins, 1:-1].sum(axis=0))
+            np.testing.assert_allclose(errors, np.sqrt(self.histo.sumw2[bins, 1:-1].sum(axis=0)))
+
+    def test_project_arrays(self):
+        first, last = np.array([1, 10, 20]), np.array([9, 19, 60])
+        counts, _ = self.projector.project(first, last, flow=True)
+        self.assertEqual(counts.shape, (3, 42))
+        for i in range(3):
+            single, _ = self.projector.project(first[i], last[i], flow=True)
+            np.testing.assert_allclose(counts[i], single)
+
+    def test_find_bin(self):
+        for x in [-1.0, 0.0, 0.05, 0.1, 3.33, 5.999, 6.0, 7.0]:
+            self.assertEqual(self.projector.find_bin(x), self.histo.find_bins(x))
+
+    def test_adaptive_slices(self):
+        first, last, centers, widths = self.projector.adaptive_slices((0.0, 5.0), entries=2000)
+        np.testing.assert_array_equal(first[1:], last[:-1] + 1)
+        self.assertEqual(first[0], self.projector.find_bin(0.0))
+        self.assertEqual(last[-1], self.projector.find_bin(5.0))
+
+        x_counts = self.projector.x_counts()
+        sums = np.array([x_counts[f:l + 1].sum() for f, l in zip(first, last)])
+
+        # Every slice but the last closes once it has the entries,
+        # the last has at least as many.
+        self.assertTrue(np.all(sums >= 2000 - x_counts.max()))
+        self.assertGreaterEqual(sums[-1], 2000)
+        np.testing.assert_allclose(centers - 0.5 * widths, self.projector.x_edges[first - 1])
+
+    def test_shared_binning(self):
+        other = projector_of(self.histo.copy())
+        other.cum_values *= 2
+        together = adaptive_slices([self.projector, other], (0.0, 5.0), entries=2000)
+        for projector, slices in zip([self.projector, other], together):
+            alone = projector.adaptive_slices((0.0, 5.0), entries=2000)
+            np.testing.assert_array_equal(slices[0], alone[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+""" SummedArea yields against the bins summed directly. """
+
+import unittest
+
+import numpy as np
+
+from array_histo import ArrayHisto
+from summed_area import SummedArea, best_windows
+
+def filled(name, seed):
+    rng = np.random.RandomState(seed)
+    histo = ArrayHisto.uniform(name, [(40, 0.6, 1.4), (30, 170, 180)])
+    histo.fill((rng.normal(0.94, 0.1, 20000), 180 - rng.exponential(2, 20000)), rng.uniform(0.5, 1.5, 20000))
+    return histo
+
+class SummedAreaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.histos = [filled('CTOF', 1), filled('FTOF', 2)]
+        self.area = SummedArea.from_histos(self.histos)
+
+    def direct(self, x_low, x_high, y_low, y_high):
+        """ Sums over the bins between the edges nearest the cuts. """
+        x_edges, y_edges = self.histos[0].edges
+        i1, i2 = [np.argmin(np.abs(x_edges - cut)) for cut in (x_low, x_high)]
+        j1, j2 = [np.argmin(np.abs(y_edges - cut)) for cut in (y_low, y_high)]
+        inside = (slice(i1 + 1, i2 + 1), slice(j1 + 1, j2 + 1))
+        return (np.array([h.values[inside].sum() for h in self.histos]),
+                np.sqrt([h.sumw2[inside].sum() for h in self.histos]))
+
+    def test_yields(self):
+        self.assertEqual(len(self.area), 2)
+        for cuts in [(0.801, 1.149, 178, 180), (0.6, 1.4, 170, 180),
+                     (0.905, 1.003, 175.4, 179.4), (1.0, 0.9, 170, 180)]:
+            counts, errors = self.area.yields(*cuts)
+            expected, expected_errors = self.direct(*cuts)
+            np.testing.assert_allclose(counts, expected, atol=1e-6)
+            np.testing.assert_allclose(errors, expected_errors, atol=1e-6)
+
+    def test_window_grid(self):
+        x_cuts, y_cuts = np.array([0.7, 0.9, 1.1]), np.array([176.0, 178.0, 180.0])
+        counts, errors = self.area.window_grid(x_cuts, y_cuts)
+        self.assertEqual(counts.shape, (2, 3, 3, 3, 3))
+
+        for a, b, c, d in np.ndindex(3, 3, 3, 3):
+            if a < b and c < d:
+                expected, _ = self.direct(x_cuts[a], x_cuts[b], y_cuts[c], y_cuts[d])
+                np.testing.assert_allclose(counts[:, a, b, c, d], expected, atol=1e-6)
+            else:
+                self.assertTrue(np.all(np.isnan(counts[:, a, b, c, d])))
+
+        best = best_windows(counts.sum(axis=0), x_cuts, y_cuts, n=2)
+        self.assertEqual(tuple(best[0][:4]), (0.7, 1.1, 176.0, 180.0))
+        self.assertGreaterEqual(best[0].score, best[1].score)
+
+    def test_binning(self):
+        with self.assertRaises(ValueError):
+            other = ArrayHisto.uniform('other', [(20, 0.6, 1.4), (30, 170, 180)])
+            SummedArea.from_histos([self.histos[0], other])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import event.Event
+import event.EventConverter
+import groovy.json.JsonOutput
+import groovyx.gpars.GParsPool
+import java.nio.ByteBuffer
+import java.nio.ByteOrder
+import org.jlab.clas.pdg.PDGDatabase
+import org.jlab.clas.physics.Particle
+import org.jlab.clas.physics.Vector3
+import org.jlab.io.hipo.HipoDataSource
+
+// Writes the e-p candidates of event-selection.groovy as a columnar
+// skim (see python/skim.py), one name.skim directory per input file
+// in the directory given by -Dskim_dir (default skims).  Only loose
+// cuts are applied, so the python side can re-cut and re-bin.
+//
+//     run-groovy -Dskim_dir=skims skim-candidates.groovy `cat smallFiles.txt`
+
+def beam = new Particle(11, 0.0, 0.0, 10.646)
+def target = new Particle(2212, 0.0, 0.0, 0.0)
+
+cuts = [
+    p_ele: [1.5, 10.646],
+    w_loose: [0.0, 4.7],
+    angle_loose: [120, 180]
+]
+
+// name: [numpy dtype, bytes], same order as candidate_columns in skim.py
+columns = [
+    ele_px: ['<f4', 4], ele_py: ['<f4', 4], ele_pz: ['<f4', 4],
+    ele_p: ['<f4', 4], ele_theta: ['<f4', 4], ele_phi: ['<f4', 4],
+    pro_px: ['<f4', 4], pro_py: ['<f4', 4], pro_pz: ['<f4', 4],
+    pro_p: ['<f4', 4], pro_theta: ['<f4', 4], pro_phi: ['<f4', 4],
+    sector: ['<i1', 1], ctof: ['<i1', 1], chi2pid: ['<f4', 4],
+    dc1_x: ['<f4', 4], dc1_y: ['<f4', 4], dc2_x: ['<f4', 4],
+    dc2_y: ['<f4', 4], dc3_x: ['<f4', 4], dc3_y: ['<f4', 4]
+]
+
+chunkRows = 100000
+
+// One skim, each column buffered and written chunkRows rows at a time.
+class SkimWriter {
+    def path
+    def columns
+    def chunkRows
+    def buffers = [:]
+    def streams = [:]
+    def chunks = []
+    def rows = 0
+
+    SkimWriter(path, columns, chunkRows) {
+        this.path = path
+        this.columns = columns
+        this.chunkRows = chunkRows
+        new File(path).mkdirs()
+        columns.each { name, type ->
+            buffers[name] = ByteBuffer.allocate(chunkRows * type[1]).order(ByteOrder.LITTLE_ENDIAN)
+            streams[name] = new FileOutputStream(new File(path, name + '.bin'))
+        }
+    }
+
+    def fill(values) {
+        columns.each { name, type ->
+            if (type[1] == 1) {
+                buffers[name].put((byte) values[name])
+            } else {
+                buffers[name].putFloat((float) values[name])
+            }
+        }
+        rows++
+        if (rows == chunkRows) {
+            flush()
+        }
+    }
+
+    def flush() {
+        if (rows == 0) {
+            return
+        }
+        columns.each { name, type ->
+            streams[name].write(buffers[name].array(), 0, buffers[name].position())
+            buffers[name].clear()
+        }
+        chunks << rows
+        rows = 0
+    }
+
+    def close() {
+        flush()
+        streams.values().each { it.close() }
+        def index = [
+            version: 1,
+            rows: chunks.sum() ?: 0,
+            chunks: chunks,
+            columns: columns.collectEntries { name, type -> [name, type[0]] }
+        ]
+        new File(path, 'index.json').text = JsonOutput.prettyPrint(JsonOutput.toJson(index))
+    }
+}
+
+def getPKin(beam, target, electron, proton) {
+
+    def missing = new Particle(beam)
+    missing.combine(target, 1)
+    missing.combine(electron, -1)
+    def w = missing.mass()
+
+    def zaxis = new Vector3(0, 0, 1)
+    def enorm = electron.vector().vect().cross(zaxis)
+    def pnorm = proton.vector().vect().cross(zaxis)
+    def phi = enorm.theta(pnorm)
+
+    return [w: w, angle: phi]
+}
+
+def skimDir = System.getProperty('skim_dir', 'skims')
+
+GParsPool.withPool 16, {
+    args.eachParallel { filename ->
+
+        def name = new File(filename).name.replaceAll(/\.hipo$/, '')
+        def writer = new SkimWriter(new File(skimDir, name + '.skim').path, columns, chunkRows)
+
+        def reader = new HipoDataSource()
+        reader.open(filename)
+
+        while (reader.hasEvent()) {
+            def dataEvent = reader.getNextEvent()
+            def event = EventConverter.convert(dataEvent)
+
+            (0..<event.npart).find {
+                event.pid[it] == 11 && event.status[it] < 0 && event.p[it] > cuts.p_ele[0]
+            }?.each { idx ->
+                def ele = new Particle(11, event.px[idx], event.py[idx], event.pz[idx])
+
+                def hits = [event.dc1.get(idx)?.find { it.layer == 12 },
+                            event.dc2.get(idx)?.find { it.layer == 24 },
+                            event.dc3.get(idx)?.find { it.layer == 36 }]
+
+                (0..<event.npart).findAll { event.pid[it] == 2212 }.each {
+                    def pro = new Particle(2212, event.px[it], event.py[it], event.pz[it])
+                    def pkin = getPKin(beam, target, ele, pro)
+
+                    if (pkin.w < cuts.w_loose[1] && pkin.angle > cuts.angle_loose[0]) {
+                        def values = [
+                            ele_px: ele.px(), ele_py: ele.py(), ele_pz: ele.pz(), ele_p: ele.p(),
+                            ele_theta: Math.toDegrees(ele.theta()), ele_phi: Math.toDegrees(ele.phi()),
+                            pro_px: pro.px(), pro_py: pro.py(), pro_pz: pro.pz(), pro_p: pro.p(),
+                            pro_theta: Math.toDegrees(pro.theta()), pro_phi: Math.toDegrees(pro.phi()),
+                            sector: event.dc_sector[idx], ctof: event.ctof_status.contains(it) ? 1 : 0,
+                            chi2pid: event.chi2pid[it]
+                        ]
+                        hits.eachWithIndex { hit, region ->
+                            values['dc' + (region + 1) + '_x'] = hit ? hit.x : Float.NaN
+                            values['dc' + (region + 1) + '_y'] = hit ? hit.y : Float.NaN
+                        }
+                        writer.fill(values)
+                    }
+                }
+            }
+        }
+
+        writer.close()
+    }
+}
@@ -1,24 +1,187 @@
 #!/usr/bin/env python
 
-import matplotlib.pyplot as plt 
+""" Equal population Q^2 bins from the values dumped by the event loop.
+
+The dump (q2.csv, comma separated, all on one line) is read in chunks
+of a fixed size into a quantile sketch, so memory does not grow with
+the number of events.  Sketches can be saved and combined later,
+without reading the dumps again.
+
+    python find_bins.py ../groovy/q2.csv -n=10
+    python find_bins.py run1/q2.csv -w=run1.npz
+    python find_bins.py -r run1.npz run2.npz -n=10
+"""
+
+import argparse
+
 import numpy as np
 
+class QuantileSketch(object):
+    """ Mergeable sketch of a stream of values (a compactor stack, as
+    in the KLL sketch).  Level h holds values standing for 2**h input
+    values each.  A level over capacity is sorted and every other value
+    (from a random start) goes up a level, which moves the rank of any
+    value by at most 2**h.  The rank error is then at most
+    levels / capacity of the count, and in practice much less. """
+
+    def __init__(self, capacity=2000, seed=None):
+        self.capacity = capacity
+        self.levels = [np.zeros(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.rng = np.random.RandomState(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compact()
+
+    def merge(self, other):
+        """ Add the values seen by another sketch to this one. """
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.zeros(0))
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.compact()
+
+    def compact(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self.capacity:
+                level = np.sort(level)
+
+                # An odd value out stays behind.
+                pairs = len(level) - len(level) % 2
+                promoted = level[self.rng.randint(2):pairs:2]
+                self.levels[h] = level[pairs:]
+
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def rank_error(self):
+        """ Bound on the rank error, as a fraction of the count. """
+        return float(len(self.levels) - 1) / self.capacity
+
+    def weighted(self):
+        """ Sorted values kept, and the number of inputs each stands for. """
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0**h) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='mergesort')
+        return values[order], weights[order]
+
+    def quantiles(self, q):
+        """ Values below which fractions q of the input lie.  0 and 1
+        give the exact minimum and maximum. """
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+
+        values, weights = self.weighted()
+        ranks = np.cumsum(weights) - 0.5 * weights
+        ranks *= self.count / weights.sum()
+        result = np.interp(q * self.count, ranks, values)
+        result = np.where(q <= 0, self.min, result)
+        return np.where(q >= 1, self.max, result)
+
+    def edges(self, bins):
+        """ Edges of bins holding about the same number of entries. """
+        return self.quantiles(np.linspace(0, 1, bins + 1))
+
+    def save(self, path):
+        levels = dict(('level{}'.format(h), level) for h, level in enumerate(self.levels))
+        np.savez(path, capacity=self.capacity, count=self.count,
+                 min=self.min, max=self.max, **levels)
+
+    @classmethod
+    def load(cls, path, seed=None):
+        stored = np.load(path)
+        sketch = cls(int(stored['capacity']), seed)
+        sketch.count = int(stored['count'])
+        sketch.min = float(stored['min'])
+        sketch.max = float(stored['max'])
+        nlevels = len([key for key in stored.files if key.startswith('level')])
+        sketch.levels = [stored['level{}'.format(h)] for h in range(nlevels)]
+        return sketch
+
+def read_values(path, chunk_size=1 << 20):
+    """ Arrays of the values in a comma or space separated dump,
+    chunk_size characters at a time. """
+    with open(path) as input_file:
+        rest = ''
+        while True:
+            chunk = input_file.read(chunk_size)
+            if not chunk:
+                break
+
+            # A number cut at the end of the chunk waits for the next one.
+            text = (rest + chunk).replace(',', ' ')
+            cut = max(text.rfind(' '), text.rfind('\n'))
+            text, rest = text[:cut + 1], text[cut + 1:]
+            if text.strip():
+                yield np.array(text.split(), dtype=np.float64)
+
+        if rest.strip():
+            yield np.array(rest.split(), dtype=np.float64)
+
+def sketch_files(paths, capacity=2000, chunk_size=1 << 20, seed=None):
+    sketch = QuantileSketch(capacity, seed)
+    for path in paths:
+        for values in read_values(path, chunk_size):
+            sketch.update(values)
+    return sketch
+
 if __name__ == '__main__':
 
-    input_filename = '../groovy/q2.csv'
-    with open(input_filename) as input_file:
-        tokens = [float(tok.strip(',')) for tok in input_file.readlines()[0].split()]
-        q2 = np.array(tokens)
+    ap = argparse.ArgumentParser()
+    ap.add_argument('inputs', nargs='*',
+                    help='Dumps of the event loop, ../groovy/q2.csv if none are given')
+    ap.add_argument('-n', '--bins', default=10, type=int)
+    ap.add_argument('-k', '--capacity', default=2000, type=int,
+                    help='Values kept per level of the sketch, more is more precise')
+    ap.add_argument('-c', '--chunk_size', default=1 << 20, type=int,
+                    help='Characters read at a time')
+    ap.add_argument('-r', '--sketches', nargs='+', default=[],
+                    help='Saved sketches to combine with the inputs')
+    ap.add_argument('-w', '--write', default=None,
+                    help='Save the sketch here (.npz)')
+    ap.add_argument('-s', '--seed', default=None, type=int)
+    ap.add_argument('-p', '--plot', action='store_true')
+    args = ap.parse_args()
+
+    inputs = args.inputs
+    if not inputs and not args.sketches:
+        inputs = ['../groovy/q2.csv']
+
+    sketch = sketch_files(inputs, args.capacity, args.chunk_size, args.seed)
+    for path in args.sketches:
+        sketch.merge(QuantileSketch.load(path, args.seed))
 
+    if args.write:
+        sketch.save(args.write)
 
-    q2bins = 10
-    quants = np.linspace(0,1,q2bins+1)
-    edges = [np.quantile(q2,q) for q in quants]
+    edges = sketch.edges(args.bins)
+    print('{} values, rank error below {:.2%}'.format(sketch.count, sketch.rank_error()))
+    print(edges.tolist())
 
-    plt.hist(q2, bins=np.linspace(0,10,100), edgecolor='k', color='orange')
-    for edge in edges:
-        plt.axvline(edge, color='k', linewidth=1)
-    plt.show()
-    
+    if args.plot:
+        import matplotlib.pyplot as plt
 
-    print(edges)
+        values, weights = sketch.weighted()
+        plt.hist(values, weights=weights, bins=np.linspace(0,10,100), edgecolor='k', color='orange')
+        for edge in edges:
+            plt.axvline(edge, color='k', linewidth=1)
+        plt.show()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+""" Equal population bins from histograms that are already filled,
+instead of from every event (see find_bins.py).  The cumulative
+distribution of the contents is inverted, taking the entries to be
+spread evenly inside each bin.
+
+    python histo_bins.py -i=mon.root -H=w_sector1_bin1 -n=10
+    python histo_bins.py -i=mon.root -H=w_q2_sector{} -s -a=y -n=10
+    python histo_bins.py -i=mon.root -H=w_q2_sector{} -s -a=x -n=20 -c=10
+
+The first bins W of sector 1 in the second Q^2 bin of eventLoop.groovy.
+The second sums the six sectors and bins Q^2 (the y axis).  The third
+makes 10 Q^2 bins and then 20 W bins inside each of them.
+"""
+
+import argparse
+
+import numpy as np
+
+def cdf_edges(counts, edges, bins):
+    """ Edges of bins holding the same share of counts, a 1D array
+    with the given edges.  The first and last edges are those of the
+    first and last filled bins.  Negative contents count as empty. """
+
+    counts = np.clip(np.asarray(counts, dtype=np.float64), 0, None)
+    edges = np.asarray(edges, dtype=np.float64)
+    cum = np.concatenate([[0.0], np.cumsum(counts)])
+    if cum[-1] <= 0:
+        return np.full(bins + 1, np.nan)
+
+    # The bin each target falls in, and how far into it.
+    targets = np.linspace(0, cum[-1], bins + 1)
+    index = np.searchsorted(cum[1:], targets, side='left')
+    index[0] = np.searchsorted(cum[1:], 0.0, side='right')
+    index = np.clip(index, 0, len(counts) - 1)
+
+    fraction = (targets - cum[index]) / np.where(counts[index] > 0, counts[index], 1.0)
+    return edges[index] + np.clip(fraction, 0, 1) * np.diff(edges)[index]
+
+def band_weights(edges, lows, highs):
+    """ (bands, bins) share of each bin inside each band, for bands
+    that cut through bins. """
+    low = np.maximum(edges[None, :-1], np.asarray(lows)[:, None])
+    high = np.minimum(edges[None, 1:], np.asarray(highs)[:, None])
+    return np.clip(high - low, 0, None) / np.diff(edges)[None, :]
+
+def axis_edges(counts, x_edges, y_edges, axis, bins):
+    """ Bins of one axis ('x' or 'y') of 2D counts[ix, iy], the
+    other axis summed over. """
+    if axis == 'x':
+        return cdf_edges(counts.sum(axis=1), x_edges, bins)
+    return cdf_edges(counts.sum(axis=0), y_edges, bins)
+
+def conditional_edges(counts, x_edges, y_edges, axis, bins, other_bins):
+    """ other_bins equal population bins of the other axis, then bins
+    of axis inside each of them.  Returns (other edges, [edges of
+    axis in each band]). """
+
+    other = 'y' if axis == 'x' else 'x'
+    outer = axis_edges(counts, x_edges, y_edges, other, other_bins)
+    if other == 'x':
+        bands = band_weights(x_edges, outer[:-1], outer[1:]).dot(counts)
+        inner_edges = y_edges
+    else:
+        bands = counts.dot(band_weights(y_edges, outer[:-1], outer[1:]).T).T
+        inner_edges = x_edges
+
+    return outer, [cdf_edges(band, inner_edges, bins) for band in bands]
+
+def histo_arrays(histo):
+    """ (x edges, y edges, contents[ix, iy]) of a TH2, or (x edges,
+    None, contents) of a TH1, under and overflow left out. """
+
+    def edges(axis):
+        return np.array([axis.GetBinLowEdge(i) for i in range(1, axis.GetNbins() + 2)])
+
+    nx = histo.GetNbinsX()
+    if histo.GetDimension() == 1:
+        values = np.array([histo.GetBinContent(i) for i in range(1, nx + 1)])
+        return edges(histo.GetXaxis()), None, values
+
+    ny = histo.GetNbinsY()
+    values = np.array([[histo.GetBinContent(i, j) for j in range(1, ny + 1)] for i in range(1, nx + 1)])
+    return edges(histo.GetXaxis()), edges(histo.GetYaxis()), values
+
+def load_histos(path, names):
+    """ Arrays (see histo_arrays) of the sum of the named histograms. """
+    from ROOT import TFile
+
+    rootfile = TFile(path)
+    x_edges, y_edges, total = None, None, None
+    for name in names:
+        histo = rootfile.Get(name)
+        if not histo:
+            raise KeyError('{} not found in {}'.format(name, path))
+
+        x_edges, y_edges, values = histo_arrays(histo)
+        total = values if total is None else total + values
+    rootfile.Close()
+    return x_edges, y_edges, total
+
+if __name__ == '__main__':
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-i', '--input_file', required=True)
+    ap.add_argument('-H', '--histos', nargs='+', required=True,
+                    help='Histograms to sum, {} in a name is replaced by the sector with -s')
+    ap.add_argument('-s', '--sectors', action='store_true')
+    ap.add_argument('-a', '--axis', default='x', choices=['x', 'y'],
+                    help='Axis of a 2D histogram to bin')
+    ap.add_argument('-n', '--bins', default=10, type=int)
+    ap.add_argument('-c', '--conditional', default=None, type=int,
+                    help='Bin the other axis into this many bins first, then the axis inside each')
+    args = ap.parse_args()
+
+    names = args.histos
+    if args.sectors:
+        names = [name.format(sector) for name in names for sector in range(1,7)]
+
+    x_edges, y_edges, counts = load_histos(args.input_file, names)
+    if y_edges is None:
+        print(cdf_edges(counts, x_edges, args.bins).tolist())
+    elif args.conditional:
+        outer, inner = conditional_edges(counts, x_edges, y_edges, args.axis,
+                                         args.bins, args.conditional)
+        print(outer.tolist())
+        for low, high, edges in zip(outer[:-1], outer[1:], inner):
+            print('{:.4f} - {:.4f}: {}'.format(low, high, edges.tolist()))
+    else:
+        print(axis_edges(counts, x_edges, y_edges, args.axis, args.bins).tolist())